@@ -17,15 +17,28 @@ if TYPE_CHECKING:
 
 import os
 import useq
-from pymmcore_plus.mda.handlers import OMEZarrWriter, OMETiffWriter, ImageSequenceWriter
+from pymmcore_plus.mda.handlers import OMEZarrWriter, OMETiffWriter
 from pymmcore_plus.mda import mda_listeners_connected
+from mesofield._storage import AsyncFrameWriter, ZarrSink
+from mesofield._metadata import FrameMetadataRecorder, frame_metadata_path
+from mesofield._telemetry import AcquisitionTelemetry, TelemetryWidget
+from mesofield._dff import OnlineDeltaF
+from mesofield._hemo import OnlineHemodynamicCorrection, pattern_from_states
+from mesofield._binning import Binner
+from mesofield._compression import CompressedZarrSink
+from mesofield._multicam import CameraPipeline, CoreSource, MultiCameraSession
+from mesofield._pupil import PupilTracker
+from napari.utils.notifications import show_error
+from mesofield._trigger import AcquisitionTrigger, KeyboardTrigger, SerialTrigger, SoftwareTrigger
 
 PSYCHOPY_PATH = r'C:\sipefield\sipefield-gratings\PsychoPy\Gratings_vis_stim_devSB-JG_v0.6.psyexp'
 JSON_PATH = r'C:\sipefield\napari-mesofield\prototyping\camk2-gcamp8.json'
 SAVE_DIR = r'D:\jgronemeyer'
 DHYANA_CONFIG = r'C:/Program Files/Micro-Manager-2.0/mm-sipefield.cfg'
 THOR_CONFIG = r'C:/Program Files/Micro-Manager-2.0/ThorCam.cfg'
+USE_PUPIL_CAMERA = True
 PUPIL_JSON = r'C:\sipefield\napari-mesofield\prototyping\camk2-gcamp8_pupil.json'
+ARDUINO_SEQUENCE = ['4', '4', '2', '2']
 
 experimental_config = {'save_dir': '/path/to/save/directory',
                             'num_frames': 5000,
@@ -36,7 +49,6 @@ experimental_config = {'save_dir': '/path/to/save/directory',
 
 from magicgui.widgets import Container, CheckBox, create_widget
 import json
-import keyboard
 class ExperimentConfig():
     def __init__(self, json_path: str):
         self._config = self._load_json_config(json_path)
@@ -100,11 +112,18 @@ class ExperimentConfig():
 
 
 class AcquisitionEngine(Container):
-    def __init__(self, viewer: "napari.viewer.Viewer", mmc: pymmcore_plus.CMMCorePlus, config_path: str = JSON_PATH):
+    def __init__(self, viewer: "napari.viewer.Viewer", mmc: pymmcore_plus.CMMCorePlus, config_path: str = JSON_PATH,
+                 pupil_mmc: pymmcore_plus.CMMCorePlus = None):
         super().__init__()
         self._viewer = viewer
         self._mmc = mmc
+        # optional second core (ThorCam pupil camera), run on its own pipeline
+        self._pupil_mmc = pupil_mmc
         self.config = ExperimentConfig(config_path)        
+        self.telemetry = AcquisitionTelemetry()
+        # fire from PsychoPy or the console to start an armed acquisition
+        self._software_trigger = SoftwareTrigger()
+        self._trigger = None
         
         self._gui_json_directory = create_widget(
             label='JSON Config Path:', widget_type='FileEdit', value=JSON_PATH
@@ -145,23 +164,115 @@ class AcquisitionEngine(Container):
     
     def run_sequence(self):
         n_frames = self.config.num_frames
+        if self._trigger is not None:
+            # a second Record click replaces the waiting acquisition instead
+            # of arming another one on the same core
+            self._trigger.disarm()
         
         self.config.sequence = useq.MDASequence(
             time_plan={"interval":0, "loops": n_frames}, 
         )
         
+        # spatial/temporal binning from the experiment JSON, before writing;
+        # with hardware sequencing frames carry no channel, so the Arduino
+        # excitation sequence keeps blue and violet in separate bins
+        binner = Binner.from_config(
+            self.config, pattern=pattern_from_states(ARDUINO_SEQUENCE)
+        )
+        # one chunked Zarr container per session, written from its own thread
+        # through a bounded queue instead of one TIFF file per frame; chunks
+        # are Blosc/zstd compressed on all cores, at a lower level whenever
+        # the queue backs up
+        writer = AsyncFrameWriter(
+            CompressedZarrSink(self.config.sub_dir, num_frames=binner.output_frames(n_frames)),
+            max_queue=512,
+            telemetry=self.telemetry,
+        )
+        # per-channel dF/F with a fixed-memory baseline, saved as it streams
+        dff = OnlineDeltaF(
+            method="percentile",
+            window=500,
+            outputs=[AsyncFrameWriter(ZarrSink(self.config.sub_dir + '_dff'))],
+        )
+        # violet-regressed blue dF/F, split by the Arduino excitation sequence
+        hemo = OnlineHemodynamicCorrection(
+            outputs=[AsyncFrameWriter(ZarrSink(self.config.sub_dir + '_hemo'))],
+            # the binned frames' pattern, not the raw excitation sequence
+            pattern=binner.output_pattern,
+            as_dff=True,
+        )
+        binner.outputs = [writer, dff, hemo]
+        session = frame_metadata = None
+        if self._pupil_mmc is None:
+            # single camera: the stages listen to the widefield core directly
+            frame_metadata = FrameMetadataRecorder(
+                frame_metadata_path(self.config.sub_dir), capacity=n_frames
+            )
+        else:
+            # each camera gets its own MDA thread, queue and writer; frames of
+            # both are stamped against one session clock
+            pupil_config = ExperimentConfig(PUPIL_JSON)
+            pupil_sequence = useq.MDASequence(
+                time_plan={"interval": 0, "loops": pupil_config.num_frames},
+            )
+            session = MultiCameraSession([
+                CameraPipeline(
+                    'widefield', CoreSource(self._mmc, self.config.sequence),
+                    metadata_path=frame_metadata_path(self.config.sub_dir),
+                    listeners=[self.telemetry, binner],
+                ),
+                CameraPipeline(
+                    'pupil', CoreSource(self._pupil_mmc, pupil_sequence),
+                    metadata_path=frame_metadata_path(self.config.sub_dir + '_pupil'),
+                    # diameter/center traces for every frame, raw video
+                    # only for every 10th frame
+                    listeners=[PupilTracker(
+                        path=self.config.sub_dir + '_pupil_traces.npz',
+                        save_every=10,
+                        outputs=[AsyncFrameWriter(ZarrSink(self.config.sub_dir + '_pupil'))],
+                    )],
+                ),
+            ])
+
+        def acquire():
+            if session is None:
+                with mda_listeners_connected(self.telemetry, frame_metadata, binner):
+                    self._mmc.mda.run(self.config.sequence)
+            else:
+                print(session.run())
+            print(writer.metrics)
+            if trigger is not None:
+                t0 = session.clock.t0 if session is not None else None
+                self.telemetry.update_counters({'trigger': trigger.to_dict(t0)})
+            self.telemetry.save(self.config.sub_dir + '_telemetry.json')
+
+        trigger = None
         if self.config.start_on_trigger:
-            print("Press spacebar to start recording...")
-            keyboard.wait('space')
-            
-        with mda_listeners_connected(ImageSequenceWriter(self.config.sub_dir)):
-            self._mmc.mda.run(self.config.sequence)
-            
+            # the trigger thread starts the acquisition; the viewer stays
+            # responsive while waiting, and the trigger time is recorded on
+            # the frames' host_time clock
+            sources = [KeyboardTrigger('space'), self._software_trigger]
+            if self.config.trigger_port:
+                sources.append(SerialTrigger(self.config.trigger_port, b'TTL'))
+            trigger = AcquisitionTrigger(
+                sources,
+                on_error=lambda error: show_error(f'Acquisition failed: {error}'),
+            )
+            trigger.arm(
+                acquire,
+                prepare=lambda: self._mmc.prepareSequenceAcquisition(
+                    self._mmc.getCameraDevice()
+                ),
+            )
+            self._trigger = trigger
+            print("Waiting for trigger (spacebar, serial TTL or software)...")
+        else:
+            acquire()
         return
 
 @magicgui(call_button='load arduino', mmc={'bind': pymmcore_plus.CMMCorePlus.instance()})   
 def load_mmc_params(mmc):
-    mmc.getPropertyObject('Arduino-Switch', 'State').loadSequence(['4', '4', '2', '2'])
+    mmc.getPropertyObject('Arduino-Switch', 'State').loadSequence(ARDUINO_SEQUENCE)
     mmc.mda.engine.use_hardware_sequencing = True
     mmc.setProperty('Arduino-Switch', 'Sequence', 'On')
     mmc.setProperty('Arduino-Shutter', 'OnOff', '1')
@@ -182,48 +293,29 @@ def stop_led(mmc):
 def launch_psychopy():
     os.startfile(PSYCHOPY_PATH)
 
-# @magicgui(call_button='Record', viewer={'bind': napari.current_viewer()})
-# def pupil_sequence(mesofield: AcquisitionEngine):
-    
-#     sequence = useq.MDASequence(
-#         time_plan={"interval":0, "loops": n_frames}, 
-#     )
-    
-#     if mesofield.config.start_on_trigger:
-#         print("Press spacebar to start recording...")
-#         keyboard.wait('space')
-#         with mda_listeners_connected(ImageSequenceWriter(mesofield.config.sub_dir)):
-#             mesofield._mmc.mda.run(mesofield.config.sequence)
-#     else:
-#         with mda_listeners_connected(ImageSequenceWriter(mesofield.config.sub_dir)):
-#             mesofield._mmc.mda.run(mesofield.config.sequence)
-#     return
-
-# @magicgui(call_button='Launch Pupil Camera')
-# def pupil_cam(mesofield: ExperimentConfig):
-#     n_frames = mesofield.config.num_frames
-#     mmc2 = pymmcore_plus.CMMCorePlus()
-#     mmc2.loadSystemConfiguration(THOR_CONFIG)
-#     mmc2.setROI("ThorCam", 440, 305, 509, 509)
-#     viewer2 = napari.view_image(mmc2.snap(), name='pupil_viewer')
-#     viewer2.window.add_dock_widget([pupil_sequence], area='right')
-
 def start_napari():
     
     print("launching interface...")
     mmc = pymmcore_plus.CMMCorePlus.instance()
     mmc.loadSystemConfiguration(DHYANA_CONFIG)
-    #pupil_mmc = pymmcore_plus.CMMCorePlus()
-    #pupil_mmc.loadSystemConfiguration(THOR_CONFIG)
+    # the ThorCam pupil camera is optional; without it only the widefield
+    # camera is recorded
+    pupil_mmc = None
+    if USE_PUPIL_CAMERA:
+        try:
+            pupil_mmc = pymmcore_plus.CMMCorePlus()
+            pupil_mmc.loadSystemConfiguration(THOR_CONFIG)
+            pupil_mmc.setROI("ThorCam", 440, 305, 509, 509)
+        except (RuntimeError, OSError) as error:
+            print(f"pupil camera unavailable ({error}), recording widefield only")
+            pupil_mmc = None
     viewer = napari.Viewer()
-    #pupil_viewer = napari.Viewer()
-    #pupil_cam = AcquisitionEngine(viewer, pupil_mmc, PUPIL_JSON)
-    mesofield = AcquisitionEngine(viewer, mmc)
-    #pupil_viewer.window.add_plugin_dock_widget('napari-micromanager')
-    #pupil_viewer.window.add_dock_widget([pupil_cam], area='right')
+    mesofield = AcquisitionEngine(viewer, mmc, pupil_mmc=pupil_mmc)
     viewer.window.add_plugin_dock_widget('napari-micromanager')
     viewer.window.add_dock_widget([mesofield, load_mmc_params, launch_psychopy, stop_led], 
                                   area='right')
+    viewer.window.add_dock_widget(TelemetryWidget(mesofield.telemetry),
+                                  name='Telemetry', area='right')
 
     print("interface launched.")
 
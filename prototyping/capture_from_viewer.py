@@ -7,9 +7,13 @@ from napari_micromanager import MainWindow
 from magicgui import magicgui
 from magicgui.tqdm import tqdm
 from magicgui.widgets import Table  
+from mesofield._buffer import DROP_OLDEST, FrameRingBuffer, feed_from_core
+from mesofield._liveview import LiveView
+from mesofield._telemetry import AcquisitionTelemetry, TelemetryWidget
 
 import pathlib
 import datetime
+import threading
 
 import pandas as pd
 import os
@@ -70,9 +74,30 @@ def load_json_file(json_path: pathlib.Path) -> Table:
     # return config_table
     load_json_config(json_path)
 
+# the telemetry dock, live view and start handler of the recording are
+# created once per viewer; each click on Record only starts new workers
+_recording = {}
+
+def _recording_view(viewer, mmc):
+    if _recording.get('viewer') is not viewer:
+        telemetry = AcquisitionTelemetry()
+        viewer.window.add_dock_widget(TelemetryWidget(telemetry), name='Telemetry')
+        # the newest frame is redrawn at 20 Hz at most, however fast frames come
+        live_view = LiveView(viewer, name="recording", display_hz=20,
+                             projections=("mean", "max"), telemetry=telemetry)
+        sequence_started = threading.Event()
+
+        @mmc.events.continuousSequenceAcquisitionStarted.connect
+        def read_mmc_event():
+            print('Psychopy detected the start of mmc event')
+            sequence_started.set()
+
+        _recording.update(viewer=viewer, telemetry=telemetry,
+                          live_view=live_view, sequence_started=sequence_started)
+    return _recording['telemetry'], _recording['live_view'], _recording['sequence_started']
+
 @magicgui(call_button='Record', 
-          mmc={'bind': pymmcore_plus.CMMCorePlus.instance()},
-          auto_call=True,)
+          mmc={'bind': pymmcore_plus.CMMCorePlus.instance()})
 def record_from_buffer(mmc: pymmcore_plus.CMMCorePlus, 
                        trigger: bool = experiment_config['start_on_trigger'],
                        save_directory=pathlib.Path(SAVE_DIR),
@@ -84,35 +109,38 @@ def record_from_buffer(mmc: pymmcore_plus.CMMCorePlus,
 ):
     """Update viewer with the latest image from the circular buffer."""
     viewer = napari.current_viewer()
-    def save_image_to_disk(frame: tuple) -> np.array:
-        image, metadata = frame
-        print('recieved:', image, 'with MD', metadata)
-        try:
-            recorded = viewer.layers["recording"]
-            recorded.append(frame[0])
-        except KeyError:
-            recorded = viewer.add_image(image, name="recording")
+    telemetry, live_view, sequence_started = _recording_view(viewer, mmc)
+    telemetry.reset()
+    live_view.reset()
+    sequence_started.clear()
+    live_view.start()
 
-    
 
-    @thread_worker(connect={'yielded': save_image_to_disk})
+    # frames go from the core's circular buffer into a preallocated ring
+    # buffer; both sides block instead of spinning while they wait
+    buffer = FrameRingBuffer(capacity=256, overflow=DROP_OLDEST)
+
+    @thread_worker(start_thread=True)
+    def feed_ring_buffer():
+        if trigger:
+            sequence_started.wait()
+        feed_from_core(mmc, buffer)
+
+    @thread_worker(connect={'returned': lambda _: live_view.stop()})
     def grab_frame_from_buffer() -> np.array:
-        while not trigger:
-            pass
+        if trigger:
+            sequence_started.wait()
         with tqdm() as pbar:
-            while mmc.isSequenceRunning():
-                while mmc.getRemainingImageCount() == 0:
-                    pass
-                try:
-                    yield mmc.popNextImageAndMD()
-                except (RuntimeError, IndexError):
-                    # circular buffer empty
-                    pass
-
-    @mmc.events.continuousSequenceAcquisitionStarted.connect             
-    def read_mmc_event():
-        print('Psychopy detected the start of mmc event')
-
+            for frames, metadata in buffer.batches(max_frames=32):
+                for meta in metadata:
+                    telemetry.frameReady(None, None, meta)
+                live_view.update_batch(frames)
+                pbar.update(len(frames))
+        print('dropped frames:', buffer.dropped)
+        telemetry.update_counters({'ring_buffer_dropped': buffer.dropped})
+        telemetry.save(os.path.join(save_directory, f'{date}_telemetry.json'))
+
+    feed_ring_buffer()
     grab_frame_from_buffer()
 
 @magicgui(call_button='Record2', viewer={'bind': napari.current_viewer()})
@@ -1,8 +1,8 @@
 import pymmcore_plus
 import useq
-import numpy as np
 from pymmcore_plus.mda.handlers import OMEZarrWriter, OMETiffWriter, ImageSequenceWriter
 from pymmcore_plus.mda import mda_listeners_connected
+from mesofield._metadata import FrameMetadataRecorder, frame_metadata_path
 
 mmc = pymmcore_plus.CMMCorePlus()
 mmc.loadSystemConfiguration(r'C:\Program Files\Micro-Manager-2.0\mm-sipefield.cfg')
@@ -15,13 +15,10 @@ mmc.setProperty('Dhyana', 'Gain', 'HDR')
 mmc.setChannelGroup('Channel')
 mmc.setProperty('Arduino-Switch', 'State', 'Blue')
 
-@mmc.mda.events.frameReady.connect 
-def on_frame(image: np.ndarray, event: useq.MDAEvent):
-    # do what you want with the data
-    print(
-        f"received frame: {image.shape}, {image.dtype} "
-        f"@ index {event.index}, z={event.z_pos}"
-    )
+# per-frame metadata goes into one columnar table, saved once per session
+# next to the data it describes (tiff_frame_metadata.parquet)
+OUTPUT = r'C:\dev\Output\tiff'
+frame_metadata = FrameMetadataRecorder(frame_metadata_path(OUTPUT), capacity=120)
 
 sequence = useq.MDASequence(
     time_plan={"interval":0, "loops": 120},
@@ -36,5 +33,5 @@ sequence = useq.MDASequence(
 # with mda_listeners_connected(zarr_writer):
 #     mmc.mda.run(sequence)
 
-with mda_listeners_connected(ImageSequenceWriter(r'C:\dev\Output\tiff')):
+with mda_listeners_connected(ImageSequenceWriter(OUTPUT), frame_metadata):
     mmc.mda.run(sequence)
@@ -4,8 +4,9 @@ import numpy as np
 import os
 import matplotlib.pyplot as plt
 import json
-from tifffile import imread
 from tqdm import tqdm
+from mesofield._analysis import load_session, map_chunks
+from mesofield._catalog import SessionCatalog
 
 DATA_DIR = r'D:\jgronemeyer'
 PROTOCOL = r'Camkii-gcamp8'
@@ -13,36 +14,41 @@ SUBJECT = r'gs18'
 SESSION = r'ses-3'
 BEHAVIOR = r'wheel_df.csv'
 
+# Index of every session on the data drive; only directories changed since
+# the last run are re-listed
+catalog = SessionCatalog(DATA_DIR)
+catalog.scan()
+records = catalog.find(subject=SUBJECT, session=SESSION.replace('ses-', ''))
+for record in records:
+    print(record['timestamp'], record['product'], record['frames'], record['shape'], record['path'])
+
 # Load the data
-# Construct the file path
-beh_path = os.path.join(DATA_DIR, PROTOCOL, SUBJECT, SESSION, 'beh')
-anat_path = os.path.join(DATA_DIR, PROTOCOL, SUBJECT, SESSION, 'anat')
-
-# Load the tiff files
-tiff_files = []
-for folder in os.listdir(anat_path):
-    folder_path = os.path.join(anat_path, folder)
-    if os.path.isdir(folder_path) and folder.startswith(f'sub-{SUBJECT}_{SESSION}_'):
-        for file in os.listdir(folder_path):
-            if file.endswith('.tiff'):
-                file_path = os.path.join(folder_path, file)
-                tiff_files.append(file_path)
-
-# Load the metadata from the json file
-# metadata_file = os.path.join(anat_path, '_frame_metadata.json')
-# with open(metadata_file, 'r') as f:
-#     metadata = json.load(f)
-
-# Read the tiff files using imread
-tiff_data = []
-for file_path in tiff_files:
-    tiff_data.append(imread(file_path))
+# The session folders are <protocol>-<subject>/ses-<session>/{anat,beh}; take
+# them from the catalog rather than rebuilding the path by hand
+anat_path = os.path.dirname(records[0]['path'])
+beh_path = os.path.join(os.path.dirname(anat_path), 'beh')
+
+# Load every acquisition of the session in parallel (threads decompress the
+# OME-Zarr chunks or decode the TIFFs straight into one array per
+# acquisition), each with its per-frame metadata table
+# (<acquisition>_frame_metadata.parquet: frame_index, timestamps, channel, ...)
+tiff_data, metadata = load_session(anat_path, SUBJECT, SESSION)
+
+
+def frame_means(chunk):
+    return chunk.mean(axis=(1, 2))
+
+
+# Per-frame mean fluorescence of each acquisition, chunk by chunk on all cores
+# (NumPy releases the GIL, so threads are enough here; pure-Python steps can
+# use processes=True from under an ``if __name__ == '__main__':`` guard)
+traces = [map_chunks(frame_means, data, processes=False) for data in tiff_data]
 
 # Display the tiff data with progress bar
-for i, data in tqdm(enumerate(tiff_data), total=len(tiff_data), desc='Loading TIFF files'):
+for i, data in tqdm(enumerate(tiff_data), total=len(tiff_data), desc='Plotting sessions'):
     plt.subplot(len(tiff_data), 1, i+1)
-    plt.imshow(data)
-    plt.title(f'TIFF File {i+1}')
+    plt.imshow(data.mean(0))
+    plt.title(f'Acquisition {i+1}')
     plt.axis('off')
 
 # Adjust the layout
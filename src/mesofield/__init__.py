@@ -3,17 +3,21 @@ try:
 except ImportError:
     __version__ = "unknown"
 
-from pymmcore_widgets import InstallWidget
-
-from ._reader import napari_get_reader
-from ._sample_data import make_sample_data
-from ._widget import (
-    ExampleQWidget,
-    ImageThreshold,
-    threshold_autogenerate_widget,
-    threshold_magic_widget,
-)
-from ._writer import write_multiple, write_single_image
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pymmcore_widgets import InstallWidget
+
+    from ._catalog import SessionCatalogWidget
+    from ._reader import napari_get_reader
+    from ._sample_data import make_sample_data
+    from ._widget import (
+        ExampleQWidget,
+        ImageThreshold,
+        threshold_autogenerate_widget,
+        threshold_magic_widget,
+    )
+    from ._writer import write_multiple, write_single_image
 
 __all__ = (
     "napari_get_reader",
@@ -25,4 +29,36 @@ __all__ = (
     "threshold_autogenerate_widget",
     "threshold_magic_widget",
     "InstallWidget",
+    "SessionCatalogWidget",
 )
+
+# napari imports this package to resolve every manifest contribution, so
+# the public names are only imported (with their Qt, magicgui and
+# pymmcore dependencies) when first accessed
+_LAZY = {
+    "napari_get_reader": "._reader",
+    "write_single_image": "._writer",
+    "write_multiple": "._writer",
+    "make_sample_data": "._sample_data",
+    "ExampleQWidget": "._widget",
+    "ImageThreshold": "._widget",
+    "threshold_autogenerate_widget": "._widget",
+    "threshold_magic_widget": "._widget",
+    "InstallWidget": "pymmcore_widgets",
+    "SessionCatalogWidget": "._catalog",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,295 @@
+"""
+Parallel loading and chunked processing of saved sessions.
+
+The acquisitions of a session are found with the same naming rules as the
+`SessionCatalog`, so every product it lists (OME-Zarr stores, TIFF files
+and folders of per-frame TIFFs) can be loaded, each with the frame
+metadata table saved next to it. TIFFs are loaded by `load_frames`: the
+file headers are read first to size a single preallocated array,
+optionally a ``.npy`` memory map for sessions larger than memory, and the
+files are then decoded on a pool of workers straight into their slot of
+that array. Zarr stores are read chunk by chunk on a pool by `load_zarr`.
+`map_chunks` runs a per-chunk function over a (t, ...) array on threads or
+processes and writes the results back in order. All of them keep at most
+a fixed number of files or chunks in flight, so memory stays bounded
+however long the session is.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+
+from ._catalog import RAW, SessionCatalog, session_stem
+from ._metadata import METADATA_SUFFIX, load_frame_metadata
+from ._sequence import list_tiffs, parse_sequence
+
+# frames per chunk in `map_chunks`
+CHUNK_FRAMES = 256
+
+
+def session_records(
+    anat_dir: str, subject: str, session: str, product: str = RAW
+) -> List[Dict[str, Any]]:
+    """`SessionCatalog` records of one product of a subject's session.
+
+    Acquisitions are the ``sub-<subject>_ses-<session>_<timestamp>`` data
+    products in the BIDS ``anat`` directory, sorted by name; ``session``
+    may be given with or without its ``ses-`` prefix. ``product`` selects
+    the raw data or a derived product such as ``"dff"`` or ``"pupil"``.
+    """
+    if session.startswith("ses-"):
+        session = session[len("ses-") :]
+    catalog = SessionCatalog(anat_dir, max_depth=0)
+    catalog.scan(save=False)
+    return [
+        record
+        for record in catalog.find(subject, session, product=product)
+        if record["kind"] is not None
+    ]
+
+
+def session_files(
+    anat_dir: str, subject: str, session: str, product: str = RAW
+) -> List[List[str]]:
+    """Files of every acquisition of a subject's session.
+
+    One list per record of `session_records`: the frame files of a folder
+    of per-frame TIFFs in frame order, otherwise the TIFF file or Zarr
+    store itself.
+    """
+    return [
+        _record_files(record)
+        for record in session_records(anat_dir, subject, session, product)
+    ]
+
+
+def load_frames(
+    paths: Iterable[str],
+    out: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> np.ndarray:
+    """Load TIFF files into one (t, y, x) array, in parallel.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        Files in frame order; each holds one frame or a stack of frames.
+    out : str, optional
+        Path of a ``.npy`` file to memory map the result to, instead of
+        allocating it in memory.
+    max_workers : int, optional
+        Decoding threads. Defaults to the number of CPUs.
+    max_pending : int, optional
+        Files decoded but not yet copied into the result; bounds the extra
+        memory. Defaults to twice ``max_workers``.
+
+    Returns
+    -------
+    np.ndarray
+        The frames of all files, concatenated along the first axis.
+    """
+    import tifffile
+
+    paths = list(paths)
+    if not paths:
+        raise ValueError("no files to load")
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+    with ThreadPoolExecutor(
+        max_workers, thread_name_prefix="mesofield-load"
+    ) as pool:
+        headers = list(_ordered_map(pool, _tiff_header, paths, max_pending))
+        _, frame_shape, dtype = headers[0]
+        counts = []
+        for path, (n, shape, file_dtype) in zip(paths, headers):
+            if shape != frame_shape or file_dtype != dtype:
+                raise ValueError(
+                    f"{path} holds {shape} {file_dtype} frames, expected "
+                    f"{frame_shape} {dtype}"
+                )
+            counts.append(n)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        shape = (int(offsets[-1]),) + tuple(frame_shape)
+        if out is None:
+            data = np.empty(shape, dtype)
+        else:
+            data = np.lib.format.open_memmap(
+                out, mode="w+", dtype=dtype, shape=shape
+            )
+        frames = _ordered_map(pool, tifffile.imread, paths, max_pending)
+        for start, stop, frame in zip(offsets[:-1], offsets[1:], frames):
+            data[start:stop] = frame.reshape((stop - start,) + frame_shape)
+    if isinstance(data, np.memmap):
+        data.flush()
+    return data
+
+
+def load_zarr(
+    path: str, out: Optional[str] = None, max_workers: Optional[int] = None
+) -> np.ndarray:
+    """Load the full-resolution image of a Zarr store into one array.
+
+    The store is read with `zarr_reader_function` and its chunks are
+    decompressed on ``max_workers`` threads, straight into the result or,
+    with ``out``, into a ``.npy`` memory map at that path.
+    """
+    import dask.array as da
+
+    from ._reader import zarr_reader_function
+
+    data = zarr_reader_function(path)[0][0]
+    if isinstance(data, list):  # multiscale: keep the full resolution
+        data = data[0]
+    max_workers = max_workers or os.cpu_count() or 1
+    if out is None:
+        return data.compute(num_workers=max_workers)
+    target = np.lib.format.open_memmap(
+        out, mode="w+", dtype=data.dtype, shape=data.shape
+    )
+    da.store(data, target, lock=False, num_workers=max_workers)
+    target.flush()
+    return target
+
+
+def load_session(
+    anat_dir: str,
+    subject: str,
+    session: str,
+    out: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    product: str = RAW,
+) -> Tuple[List[np.ndarray], List[Optional[np.ndarray]]]:
+    """Load every acquisition of a session with its frame metadata.
+
+    ``out`` is a directory in which each acquisition is memory mapped as
+    ``<acquisition>.npy``. Returns the acquisitions, in the order of
+    `session_records`, and for each of them its metadata table
+    (``<acquisition>_frame_metadata.{parquet,npz}``), or None if none was
+    saved.
+    """
+    stacks, tables = [], []
+    for record in session_records(anat_dir, subject, session, product):
+        target = None
+        if out is not None:
+            os.makedirs(out, exist_ok=True)
+            target = os.path.join(out, session_stem(record["name"]) + ".npy")
+        if record["kind"] == "zarr":
+            data = load_zarr(record["path"], target, max_workers)
+        else:
+            data = load_frames(_record_files(record), target, max_workers)
+        stacks.append(data)
+        table = record["files"].get(METADATA_SUFFIX.lstrip("_"))
+        tables.append(None if table is None else load_frame_metadata(table))
+    return stacks, tables
+
+
+def map_chunks(
+    func: Callable[[np.ndarray], Any],
+    data: Any,
+    out: Optional[np.ndarray] = None,
+    chunk_frames: int = CHUNK_FRAMES,
+    processes: bool = True,
+    max_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> np.ndarray:
+    """Apply ``func`` to consecutive chunks of frames on all cores.
+
+    Parameters
+    ----------
+    func : callable
+        Takes a (n, ...) chunk and returns an array whose first axis is
+        concatenated across chunks (it need not keep ``n``). With
+        ``processes``, it must be picklable, i.e. a module-level function.
+    data : array-like
+        A (t, ...) array; any sliceable array (memory map, zarr or dask
+        array) works, and only the chunks in flight are read.
+    out : np.ndarray, optional
+        Array (e.g. a memory map) receiving the results in order; by
+        default the results are concatenated in memory.
+    chunk_frames : int
+        Frames per chunk.
+    processes : bool
+        Run ``func`` in a process pool, for pure-Python steps that hold the
+        GIL; otherwise threads are used, which avoids copying the chunks.
+    max_workers : int, optional
+        Pool size. Defaults to the number of CPUs.
+    max_pending : int, optional
+        Chunks in flight; bounds memory. Defaults to twice ``max_workers``.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+    chunks = (
+        np.asarray(data[start : start + chunk_frames])
+        for start in range(0, len(data), chunk_frames)
+    )
+    pool_type = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    results = []
+    position = 0
+    with pool_type(max_workers) as pool:
+        for result in _ordered_map(pool, func, chunks, max_pending):
+            result = np.asarray(result)
+            if out is None:
+                results.append(result)
+            else:
+                out[position : position + len(result)] = result
+            position += len(result)
+    if out is not None:
+        return out
+    return np.concatenate(results) if results else np.empty(0)
+
+
+def _ordered_map(
+    pool: Executor, func: Callable, items: Iterable, max_pending: int
+) -> Iterator[Any]:
+    """``pool.map`` with at most ``max_pending`` items in flight.
+
+    ``Executor.map`` submits every item up front, which for long sessions
+    means reading them all before the first result is consumed.
+    """
+    pending: deque = deque()
+    for item in items:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(pool.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _record_files(record: Dict[str, Any]) -> List[str]:
+    """Files of a catalog record, per-frame TIFFs in frame order."""
+    path = record["path"]
+    if record["kind"] != "sequence":
+        return [path]
+    _, index = parse_sequence(list_tiffs(path))
+    return [os.path.join(path, index[i]) for i in sorted(index)]
+
+
+def _tiff_header(path: str) -> Tuple[int, Tuple[int, ...], np.dtype]:
+    """Frame count, frame shape and dtype of a TIFF file."""
+    import tifffile
+
+    with tifffile.TiffFile(path) as tif:
+        series = tif.series[0]
+        shape = tuple(series.shape)
+        frame_shape = shape[-2:] if len(shape) > 1 else shape
+        n = int(np.prod(shape[:-2])) if len(shape) > 2 else 1
+        return n, frame_shape, np.dtype(series.dtype)
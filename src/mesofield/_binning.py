@@ -0,0 +1,285 @@
+"""
+Spatial and temporal binning at ingest.
+
+`Binner` reduces frames before they reach the writer: ``b x b`` pixel
+blocks are summed or averaged with a reshape-based NumPy reduction, and
+optionally ``n`` consecutive frames of the same channel are combined.
+Channels come from the frame metadata or, with Arduino hardware
+sequencing where frames carry no channel, from the excitation pattern,
+as in `ChannelDemux`; `Binner.output_pattern` is the pattern of the
+binned stream for the stages downstream. The accumulation happens in a wide integer (or float64) type so nothing
+overflows; means are rounded back to the input dtype and sums are stored
+in the smallest dtype that can hold them.
+
+The stage is configured from the experiment JSON with the keys
+``spatial_binning``, ``temporal_binning`` and ``binning_mode``.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ._hemo import ChannelDemux
+from ._metadata import frame_values
+
+MEAN = "mean"
+SUM = "sum"
+
+
+def accumulator_dtype(dtype: Any) -> np.dtype:
+    """Wide dtype used to add up values of ``dtype`` without overflow."""
+    dtype = np.dtype(dtype)
+    if dtype.kind == "u" or dtype.kind == "b":
+        return np.dtype(np.uint64)
+    if dtype.kind == "i":
+        return np.dtype(np.int64)
+    return np.dtype(np.float64)
+
+
+def output_dtype(dtype: Any, mode: str, factor: int) -> np.dtype:
+    """Dtype of binned values.
+
+    Means keep ``dtype``. Sums of integers use the smallest integer dtype of
+    the same signedness that holds ``factor`` times the largest value.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind == "b":
+        dtype = np.dtype(np.uint8)
+    if mode == MEAN or dtype.kind not in "ui" or factor == 1:
+        return dtype
+    info = np.iinfo(dtype)
+    for size in (2, 4, 8):
+        wide = np.dtype(f"{dtype.kind}{max(size, dtype.itemsize)}")
+        wide_info = np.iinfo(wide)
+        if (
+            wide_info.min <= info.min * factor
+            and info.max * factor <= wide_info.max
+        ):
+            return wide
+    return accumulator_dtype(dtype)
+
+
+def bin_spatial(frames: Any, factor: int, mode: str = MEAN) -> np.ndarray:
+    """Bin the last two axes of ``frames`` in ``factor x factor`` blocks.
+
+    Rows and columns that do not fill a whole block are cropped.
+    """
+    frames = np.asarray(frames)
+    if factor == 1:
+        return frames
+    total = _block_sum(frames, factor)
+    return _finish(total, factor * factor, frames.dtype, mode)
+
+
+def bin_stack(
+    stack: Any, spatial: int = 1, temporal: int = 1, mode: str = MEAN
+) -> np.ndarray:
+    """Bin a (t, y, x) stack offline; trailing frames that do not fill a
+    temporal bin are dropped."""
+    stack = np.asarray(stack)
+    n = len(stack) // temporal
+    stack = stack[: n * temporal]
+    acc = accumulator_dtype(stack.dtype)
+    if spatial > 1:
+        h, w = stack.shape[-2] // spatial, stack.shape[-1] // spatial
+        stack = stack[..., : h * spatial, : w * spatial]
+        stack = stack.reshape(
+            (n, temporal) + stack.shape[1:-2] + (h, spatial, w, spatial)
+        )
+        total = stack.sum(axis=(1, -3, -1), dtype=acc)
+    else:
+        total = stack.reshape((n, temporal) + stack.shape[1:]).sum(1, acc)
+    return _finish(total, spatial * spatial * temporal, stack.dtype, mode)
+
+
+class Binner:
+    """Ingest stage binning an MDA frame stream before it is written.
+
+    Parameters
+    ----------
+    spatial : int
+        Side of the square pixel blocks combined into one (1 disables).
+    temporal : int
+        Number of consecutive frames of the same channel combined into one
+        (1 disables). Incomplete bins at the end of a sequence are dropped.
+    mode : {"mean", "sum"}
+        How values are combined (see `output_dtype`).
+    outputs : sequence
+        MDA listeners receiving the binned frames, e.g. an
+        `AsyncFrameWriter`.
+    pattern : sequence of str, optional
+        Excitation sequence (see `pattern_from_states`) assigning channels
+        to frames whose metadata names none. Without it such frames are
+        all binned together, mixing the channels.
+    use_metadata : bool
+        Prefer the channel in the frame metadata over ``pattern``.
+    """
+
+    def __init__(
+        self,
+        spatial: int = 1,
+        temporal: int = 1,
+        mode: str = MEAN,
+        outputs: Sequence[Any] = (),
+        pattern: Optional[Sequence[str]] = None,
+        use_metadata: bool = True,
+    ):
+        if mode not in (MEAN, SUM):
+            raise ValueError(f"mode must be 'mean' or 'sum', not {mode!r}")
+        if spatial < 1 or temporal < 1:
+            raise ValueError("binning factors must be at least 1")
+        self.spatial = int(spatial)
+        self.temporal = int(temporal)
+        self.mode = mode
+        self.outputs = list(outputs)
+        self.pattern = None if pattern is None else tuple(pattern)
+        self._demux = (
+            None
+            if pattern is None
+            else ChannelDemux({}, self.pattern, use_metadata)
+        )
+        self.frames_in = 0
+        self.frames_out = 0
+        # per channel: [running total, frames in it, first event, first meta]
+        self._partial: Dict[Any, list] = {}
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Any,
+        outputs: Sequence[Any] = (),
+        pattern: Optional[Sequence[str]] = None,
+    ) -> Binner:
+        """Build a binner from an experiment config (dict or
+        ``ExperimentConfig``); missing keys disable binning."""
+        return cls(
+            spatial=int(_config_value(config, "spatial_binning") or 1),
+            temporal=int(_config_value(config, "temporal_binning") or 1),
+            mode=_config_value(config, "binning_mode") or MEAN,
+            outputs=outputs,
+            pattern=pattern,
+        )
+
+    @property
+    def reduction(self) -> int:
+        """Factor by which the number of pixels written is reduced."""
+        return self.spatial * self.spatial * self.temporal
+
+    @property
+    def output_pattern(self) -> Optional[Tuple[str, ...]]:
+        """Channel pattern of the binned stream, for the stages after it.
+
+        ``pattern`` describes the raw frames; with temporal binning every
+        channel's bins complete in a different order. E.g. ``temporal=4``
+        on ``('blue', 'blue', 'violet', 'violet')`` gives
+        ``('blue', 'violet')``.
+        """
+        if self.pattern is None or self.temporal == 1:
+            return self.pattern
+        counts: Dict[str, int] = {}
+        binned = []
+        # after len(pattern) * temporal frames every bin is complete
+        for channel in self.pattern * self.temporal:
+            counts[channel] = counts.get(channel, 0) + 1
+            if counts[channel] % self.temporal == 0:
+                binned.append(channel)
+        for period in range(1, len(binned) + 1):
+            if len(binned) % period == 0 and binned == (
+                binned[:period] * (len(binned) // period)
+            ):
+                return tuple(binned[:period])
+        return tuple(binned)
+
+    def output_frames(self, num_frames: int) -> int:
+        """Number of binned frames produced from ``num_frames`` frames."""
+        return num_frames // self.temporal
+
+    def process(self, frame: Any, channel: Any = None) -> Optional[np.ndarray]:
+        """Bin one frame; returns a binned frame when a bin is complete."""
+        return self._process(frame, channel)[0]
+
+    def _process(
+        self, frame: Any, channel: Any = None, event=None, meta=None
+    ) -> Tuple[Optional[np.ndarray], Any, Any]:
+        """Bin one frame; returns the binned frame (or None) and the event
+        and metadata of the first frame in its bin."""
+        self.frames_in += 1
+        frame = np.asarray(frame)
+        if self.temporal == 1:
+            self.frames_out += 1
+            return bin_spatial(frame, self.spatial, self.mode), event, meta
+        summed = _block_sum(frame, self.spatial)
+        partial = self._partial.get(channel)
+        if partial is None:
+            partial = self._partial[channel] = [summed, 0, event, meta]
+        else:
+            partial[0] += summed
+        partial[1] += 1
+        if partial[1] < self.temporal:
+            return None, None, None
+        del self._partial[channel]
+        self.frames_out += 1
+        binned = _finish(partial[0], self.reduction, frame.dtype, self.mode)
+        return binned, partial[2], partial[3]
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self._partial = {}
+        self.frames_in = self.frames_out = 0
+        if self._demux is not None:
+            self._demux.sequenceStarted(sequence, *args)
+        for output in self.outputs:
+            output.sequenceStarted(sequence, *args)
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        if self._demux is None:
+            channel = frame_values(meta, event)["channel"]
+        else:
+            channel = self._demux.channel_of(self.frames_in, meta, event)
+        binned, event, meta = self._process(image, channel, event, meta)
+        if binned is None:
+            return
+        if self._demux is not None and isinstance(meta, (Mapping, type(None))):
+            # name the channel, so the stages downstream need no pattern
+            meta = {**(meta or {}), "channel": channel}
+        for output in self.outputs:
+            output.frameReady(binned, event, meta)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        self._partial = {}
+        for output in self.outputs:
+            output.sequenceFinished(sequence)
+
+
+def _block_sum(frames: np.ndarray, factor: int) -> np.ndarray:
+    """Sums of ``factor x factor`` blocks, in the accumulator dtype."""
+    acc = accumulator_dtype(frames.dtype)
+    if factor == 1:
+        return frames.astype(acc)
+    h, w = frames.shape[-2] // factor, frames.shape[-1] // factor
+    cropped = frames[..., : h * factor, : w * factor]
+    blocks = cropped.reshape(frames.shape[:-2] + (h, factor, w, factor))
+    return blocks.sum(axis=(-3, -1), dtype=acc)
+
+
+def _finish(
+    total: np.ndarray, factor: int, dtype: np.dtype, mode: str
+) -> np.ndarray:
+    """Turn accumulated sums into the output dtype."""
+    out = output_dtype(dtype, mode, factor)
+    if mode == SUM:
+        return total.astype(out)
+    if total.dtype.kind in "ui":
+        # round half up, in integer arithmetic
+        return ((total + factor // 2) // factor).astype(out)
+    return (total / factor).astype(out)
+
+
+def _config_value(config: Any, key: str) -> Any:
+    if isinstance(config, Mapping):
+        return config.get(key)
+    return getattr(config, key, None)
@@ -0,0 +1,26 @@
+"""
+Helpers for walking large arrays in memory-bounded blocks.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterator, Tuple, Union
+
+import numpy as np
+
+
+def iter_blocks(
+    shape: Tuple[int, ...], dtype: Any, block_bytes: int
+) -> Iterator[Union[slice, Tuple[()]]]:
+    """Yield slices along the first axis covering at most ``block_bytes``.
+
+    Every block holds at least one index of the first axis, even if a single
+    plane is larger than ``block_bytes``. 0-d shapes yield one empty key.
+    """
+    if not shape:
+        yield ()
+        return
+    plane = int(np.prod(shape[1:])) * np.dtype(dtype).itemsize
+    step = max(1, block_bytes // max(plane, 1))
+    for start in range(0, shape[0], step):
+        yield slice(start, min(start + step, shape[0]))
@@ -0,0 +1,263 @@
+"""
+A preallocated ring buffer between the camera and everything downstream.
+
+The acquisition thread (or pymmcore-plus' ``frameReady`` signal) pushes
+frames into a fixed block of memory; consumers block on a condition
+variable until frames arrive and then take them out in batches. Nothing
+spins: an idle consumer sleeps in ``Condition.wait`` and is woken by the
+next push. When consumers fall behind, the overflow policy decides which
+frames are lost, and every loss is counted.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class BufferClosed(Exception):
+    """Raised when pushing into a closed `FrameRingBuffer`."""
+
+
+class FrameRingBuffer:
+    """Fixed-capacity frame queue with batched, blocking reads.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of frames held in memory.
+    frame_shape : tuple of int, optional
+        Shape of a frame. If omitted, the buffer is allocated on the first
+        push from that frame's shape and dtype.
+    dtype : dtype-like, optional
+        Frame dtype; required together with ``frame_shape``.
+    overflow : {"drop_oldest", "drop_newest", "block"}
+        What to do when a frame arrives and the buffer is full: overwrite
+        the oldest unread frame, discard the incoming one, or make the
+        producer wait for space (up to ``block_timeout``, after which the
+        incoming frame is discarded).
+    block_timeout : float, optional
+        Longest a producer waits under the ``"block"`` policy; None waits
+        indefinitely.
+
+    Notes
+    -----
+    The ``sequenceStarted``, ``frameReady`` and ``sequenceFinished`` methods
+    match the pymmcore-plus MDA listener protocol, so a buffer can be
+    connected with ``mmc.mda.events.frameReady.connect(buffer.frameReady)``
+    or registered with ``mmc.mda.run(sequence, output=buffer)``.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        frame_shape: Optional[Tuple[int, ...]] = None,
+        dtype: Any = None,
+        overflow: str = DROP_OLDEST,
+        block_timeout: Optional[float] = None,
+    ):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow must be one of {OVERFLOW_POLICIES}, "
+                f"not {overflow!r}"
+            )
+        self.capacity = capacity
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._frames: Optional[np.ndarray] = None
+        self._meta: List[Any] = [None] * capacity
+        # a shape given here is kept; otherwise every stream sets its own
+        self._fixed_shape = frame_shape is not None
+        if frame_shape is not None:
+            self._allocate(tuple(frame_shape), np.dtype(dtype))
+        self._head = 0  # index of the oldest unread frame
+        self._count = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.pushed = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    @property
+    def closed(self) -> bool:
+        """Whether the producer has finished (see `close`)."""
+        return self._closed
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, image: Any, meta: Any = None) -> bool:
+        """Copy ``image`` into the buffer.
+
+        Returns
+        -------
+        bool
+            False if this frame was discarded because of overflow.
+        """
+        image = np.asarray(image)
+        with self._cond:
+            if self._closed:
+                raise BufferClosed("cannot push into a closed buffer")
+            if self._frames is None:
+                self._allocate(image.shape, image.dtype)
+            self.pushed += 1
+            if self._count == self.capacity:
+                if self.overflow == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.overflow == DROP_OLDEST:
+                    self._head = (self._head + 1) % self.capacity
+                    self._count -= 1
+                    self.dropped += 1
+                else:
+                    has_space = self._cond.wait_for(
+                        lambda: self._count < self.capacity or self._closed,
+                        self.block_timeout,
+                    )
+                    if not has_space or self._closed:
+                        self.dropped += 1
+                        return False
+            slot = (self._head + self._count) % self.capacity
+            self._frames[slot] = image
+            self._meta[slot] = meta
+            self._count += 1
+            self.high_water = max(self.high_water, self._count)
+            self._cond.notify_all()
+        return True
+
+    def drain(
+        self, max_frames: Optional[int] = None, timeout: Optional[float] = None
+    ) -> Tuple[np.ndarray, List[Any]]:
+        """Remove up to ``max_frames`` frames, oldest first.
+
+        Blocks until at least one frame is available, the buffer is closed,
+        or ``timeout`` seconds have passed.
+
+        Returns
+        -------
+        frames : np.ndarray
+            A (n, *frame_shape) copy of the frames; ``n`` is 0 on timeout or
+            once the buffer is closed and empty.
+        metadata : list
+            The metadata pushed with each frame.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._count or self._closed, timeout)
+            n = self._count
+            if max_frames is not None:
+                n = min(n, max_frames)
+            if self._frames is None:
+                return np.empty((0,)), []
+            index = (self._head + np.arange(n)) % self.capacity
+            frames = self._frames[index]
+            metadata = [self._meta[i] for i in index]
+            for i in index:
+                self._meta[i] = None
+            self._head = (self._head + n) % self.capacity
+            self._count -= n
+            self._cond.notify_all()
+        return frames, metadata
+
+    def pop(self, timeout: Optional[float] = None):
+        """Remove the oldest frame; returns ``(frame, meta)`` or None."""
+        frames, metadata = self.drain(1, timeout)
+        if not len(frames):
+            return None
+        return frames[0], metadata[0]
+
+    def batches(
+        self, max_frames: Optional[int] = None, timeout: float = 0.1
+    ) -> Iterator[Tuple[np.ndarray, List[Any]]]:
+        """Yield batches of frames until the buffer is closed and empty."""
+        while True:
+            frames, metadata = self.drain(max_frames, timeout)
+            if len(frames):
+                yield frames, metadata
+            elif self._closed:
+                return
+
+    def close(self) -> None:
+        """Mark the end of the stream and wake every waiting thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reset(self) -> None:
+        """Discard all frames and counters and reopen the buffer.
+
+        Unless the frame shape was given to the constructor, the next frame
+        pushed sets the shape and dtype again.
+        """
+        with self._cond:
+            if not self._fixed_shape:
+                self._frames = None
+            self._head = self._count = 0
+            self._meta = [None] * self.capacity
+            self._closed = False
+            self.pushed = self.dropped = self.high_water = 0
+            self._cond.notify_all()
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self.reset()
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        self.push(image, (event, meta))
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        self.close()
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> None:
+        self._frames = np.empty((self.capacity,) + shape, dtype=dtype)
+
+
+def feed_from_core(
+    core,
+    buffer: FrameRingBuffer,
+    stop: Optional[threading.Event] = None,
+    idle: float = 0.001,
+) -> int:
+    """Move frames from a running core's circular buffer into ``buffer``.
+
+    For continuous sequence acquisitions, which have no per-frame signal.
+    The core is polled, but an empty circular buffer puts the thread to
+    sleep for ``idle`` seconds instead of spinning. Runs until the sequence
+    stops and the circular buffer is empty (or ``stop`` is set), then closes
+    ``buffer``.
+
+    Returns
+    -------
+    int
+        Number of frames moved.
+    """
+    stop = stop or threading.Event()
+    moved = 0
+    try:
+        while not stop.is_set():
+            if core.getRemainingImageCount() == 0:
+                if not core.isSequenceRunning():
+                    break
+                stop.wait(idle)
+                continue
+            try:
+                image, meta = core.popNextImageAndMD()
+            except (RuntimeError, IndexError):
+                # raced with the circular buffer being emptied
+                time.sleep(idle)
+                continue
+            buffer.push(image, meta)
+            moved += 1
+    finally:
+        buffer.close()
+    return moved
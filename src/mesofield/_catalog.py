@@ -0,0 +1,474 @@
+"""
+An index of the sessions saved under a BIDS output tree.
+
+Acquisitions are written as
+``save_dir/<protocol>-<subject>/ses-<session>/anat/sub-<subject>_ses-
+<session>_<timestamp>`` followed by an extension (``.ome.zarr``, ``.tif``,
+or a folder of per-frame TIFFs) and optionally a product suffix
+(``_dff``, ``_hemo``, ``_pupil``). `SessionCatalog` walks the tree once and
+keeps one record per data product (subject, session, timestamp, frame
+count, shape, dtype, size, paths and sidecar files such as the frame
+metadata) in a JSON index next to the data. Later scans re-list only the
+directories whose modification time changed and re-read only the data
+products whose own modification time changed, so refreshing the catalog
+of a large data drive costs one ``stat`` per directory.
+
+`SessionCatalogWidget` lists the catalog in a napari dock and opens the
+selected session.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from magicgui.widgets import (
+    ComboBox,
+    Container,
+    Label,
+    PushButton,
+    create_widget,
+)
+
+from ._sequence import TIFF_EXTENSIONS, list_tiffs
+
+if TYPE_CHECKING:
+    import napari
+
+# kept in a folder of its own, so that rewriting it does not change the
+# modification time of ``root``
+INDEX_NAME = os.path.join(".mesofield", "index.json")
+INDEX_VERSION = 1
+RAW = "raw"
+
+_NAME = re.compile(
+    r"^sub-(?P<subject>[^_]+)_ses-(?P<session>[^_]+)_"
+    r"(?P<timestamp>\d{8}[_-]\d{6})(?P<suffix>(_[A-Za-z]+)*)"
+    r"(?P<ext>\.ome\.zarr|\.zarr|\.ome\.tiff?|\.tiff?|"
+    r"\.parquet|\.npz|\.json|\.csv)?$"
+)
+_DATA_EXTENSIONS = (".ome.zarr", ".zarr") + TIFF_EXTENSIONS
+_SIDECAR_EXTENSIONS = (".parquet", ".npz", ".json", ".csv")
+
+
+def session_stem(name: str) -> str:
+    """Name of a data product without its extension, e.g. ``sub-01_ses-01``
+    for ``sub-01_ses-01.ome.zarr``; its sidecar files start with it."""
+    for ext in _DATA_EXTENSIONS:
+        if name.lower().endswith(ext):
+            return name[: -len(ext)]
+    return name
+
+
+class SessionCatalog:
+    """Incrementally refreshed index of the sessions under ``root``.
+
+    Parameters
+    ----------
+    root : str
+        The ``save_dir`` of the experiment configs.
+    index_path : str, optional
+        Where the index is kept; defaults to ``root/.mesofield/index.json``.
+        An existing index is loaded, so the first `scan` is incremental too.
+    max_depth : int
+        How deep below ``root`` directories are searched for sessions.
+
+    Attributes
+    ----------
+    listed, read : int
+        Directories listed and data products read by the last `scan`.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        index_path: Optional[str] = None,
+        max_depth: int = 6,
+    ):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or os.path.join(self.root, INDEX_NAME)
+        self.max_depth = max_depth
+        self.listed = 0
+        self.read = 0
+        self._directories: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """All data products, ordered by path."""
+        return sorted(
+            (
+                record
+                for directory in self._directories.values()
+                for record in directory["records"]
+            ),
+            key=lambda record: record["path"],
+        )
+
+    def find(
+        self,
+        subject: Optional[str] = None,
+        session: Optional[str] = None,
+        protocol: Optional[str] = None,
+        product: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Records matching all of the given fields."""
+        query = {
+            "subject": subject,
+            "session": session,
+            "protocol": protocol,
+            "product": product,
+        }
+        return [
+            record
+            for record in self.records
+            if all(
+                value is None or record[key] == value
+                for key, value in query.items()
+            )
+        ]
+
+    def scan(self, save: bool = True) -> List[Dict[str, Any]]:
+        """Bring the index up to date with the tree; returns `records`."""
+        self.listed = self.read = 0
+        if save:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        seen: Dict[str, Dict[str, Any]] = {}
+        if os.path.isdir(self.root):
+            self._scan_directory("", 0, seen)
+        self._directories = seen
+        if save:
+            self.save()
+        return self.records
+
+    def save(self) -> str:
+        """Write the index; returns its path."""
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as file:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "root": self.root,
+                    "directories": self._directories,
+                },
+                file,
+            )
+        os.replace(tmp, self.index_path)
+        return self.index_path
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path) as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+        if (
+            index.get("version") == INDEX_VERSION
+            and index.get("root") == self.root
+        ):
+            self._directories = index["directories"]
+
+    def _scan_directory(
+        self, rel: str, depth: int, seen: Dict[str, Dict[str, Any]]
+    ) -> None:
+        path = os.path.join(self.root, rel)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return
+        cached = self._directories.get(rel)
+        if cached is not None and cached["mtime"] == mtime:
+            subdirs = cached["dirs"]
+            previous = {r["name"]: r for r in cached["records"]}
+            names = list(previous) + cached["sidecars"]
+        else:
+            self.listed += 1
+            subdirs, names = [], []
+            previous = (
+                {r["name"]: r for r in cached["records"]} if cached else {}
+            )
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    match = _NAME.match(entry.name)
+                    if match is not None and (
+                        match["ext"] is not None or entry.is_dir()
+                    ):
+                        names.append(entry.name)
+                    elif entry.is_dir():
+                        subdirs.append(entry.name)
+        records, sidecars = [], []
+        for name in sorted(names):
+            if name.lower().endswith(_SIDECAR_EXTENSIONS):
+                sidecars.append(name)
+                continue
+            record = self._record(rel, name, previous.get(name))
+            if record is not None:
+                records.append(record)
+        _attach_sidecars(records, sidecars, path)
+        seen[rel] = {
+            "mtime": mtime,
+            "dirs": sorted(subdirs),
+            "records": records,
+            "sidecars": sidecars,
+        }
+        if depth < self.max_depth:
+            for name in subdirs:
+                self._scan_directory(os.path.join(rel, name), depth + 1, seen)
+
+    def _record(
+        self, rel: str, name: str, previous: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """The record of one data product, re-read only if it changed."""
+        path = os.path.join(self.root, rel, name)
+        try:
+            mtime = _data_mtime(path)
+        except OSError:
+            return None
+        if previous is not None and previous["mtime"] == mtime:
+            return previous
+        self.read += 1
+        match = _NAME.match(name)
+        try:
+            info = _describe(path)
+        except Exception:  # noqa: BLE001
+            # unreadable or half-written data: index it without details
+            info = _info(None, None, None)
+        if info["kind"] is None and not name.lower().endswith(
+            _DATA_EXTENSIONS
+        ):
+            return None
+        parts = os.path.normpath(rel).split(os.sep)
+        return {
+            "name": name,
+            "path": path,
+            "subject": match["subject"],
+            "session": match["session"],
+            "protocol": _protocol(parts, match["subject"]),
+            "timestamp": match["timestamp"],
+            "product": match["suffix"].lstrip("_") or RAW,
+            **info,
+            "size_bytes": _size(path),
+            "mtime": mtime,
+            "files": {},
+        }
+
+
+class SessionCatalogWidget(Container):
+    """Dock widget listing the sessions of a `SessionCatalog`.
+
+    The saved index is shown immediately; *Refresh* rescans the changed
+    directories in a worker thread and *Open* adds the selected data
+    product to the viewer.
+    """
+
+    def __init__(self, viewer: napari.viewer.Viewer, root: str = ""):
+        super().__init__()
+        self._viewer = viewer
+        self.catalog: Optional[SessionCatalog] = None
+        self._root = create_widget(
+            label="Data directory:",
+            widget_type="FileEdit",
+            value=root,
+            options={"mode": "d"},
+        )
+        self._sessions = ComboBox(label="Session:", choices=self._choices)
+        self._info = Label()
+        self._refresh_button = PushButton(text="Refresh")
+        self._open_button = PushButton(text="Open")
+
+        self._scanning: Optional[SessionCatalog] = None
+
+        self._root.changed.connect(self._load_catalog)
+        self._sessions.changed.connect(self._show_info)
+        self._refresh_button.changed.connect(self.refresh)
+        self._open_button.changed.connect(self.open_selected)
+        self.extend(
+            [
+                self._root,
+                self._sessions,
+                self._info,
+                self._refresh_button,
+                self._open_button,
+            ]
+        )
+        if root:
+            self._load_catalog()
+
+    def refresh(self) -> None:
+        """Rescan the tree in the background and update the list."""
+        if self.catalog is None:
+            self._load_catalog()
+        else:
+            self._start_scan()
+
+    def open_selected(self) -> None:
+        """Open the selected data product in the viewer."""
+        record = self._sessions.value
+        if record is not None:
+            self._viewer.open(record["path"])
+
+    def _load_catalog(self) -> None:
+        root = str(self._root.value)
+        if not root or not os.path.isdir(root):
+            self.catalog = None
+        else:
+            # the saved index is shown right away; only scanning is slow
+            self.catalog = SessionCatalog(root)
+        self._sessions.reset_choices()
+        if self.catalog is not None and not self.catalog.records:
+            self._start_scan()
+
+    def _start_scan(self) -> None:
+        """Scan off the Qt thread; a large drive would freeze napari."""
+        from napari.qt.threading import thread_worker
+
+        catalog = self.catalog
+        if catalog is None or self._scanning is catalog:
+            return
+        self._scanning = catalog
+        self._refresh_button.enabled = False
+        self._info.value = "Scanning..."
+        worker = thread_worker(catalog.scan)()
+        worker.returned.connect(lambda _: self._scanned(catalog))
+        worker.finished.connect(lambda: self._scan_finished(catalog))
+        worker.start()
+
+    def _scanned(self, catalog: SessionCatalog) -> None:
+        if catalog is not self.catalog:
+            return  # the data directory changed meanwhile
+        self._sessions.reset_choices()
+        self._info.value = (
+            f"{len(catalog.records)} products "
+            f"({catalog.listed} directories rescanned)"
+        )
+
+    def _scan_finished(self, catalog: SessionCatalog) -> None:
+        if self._scanning is catalog:
+            self._scanning = None
+            self._refresh_button.enabled = True
+
+    def _choices(self, widget=None):
+        if self.catalog is None:
+            return []
+        return [(_label(record), record) for record in self.catalog.records]
+
+    def _show_info(self, record) -> None:
+        if record is None:
+            self._info.value = ""
+            return
+        size = (record["size_bytes"] or 0) / 2**30
+        self._info.value = (
+            f"{record['frames']} frames {record['shape']} {record['dtype']}, "
+            f"{size:.2f} GiB"
+        )
+
+
+def _label(record: Dict[str, Any]) -> str:
+    protocol = f"{record['protocol']} " if record["protocol"] else ""
+    return (
+        f"{protocol}sub-{record['subject']} ses-{record['session']} "
+        f"{record['timestamp']} {record['product']}"
+    )
+
+
+def _protocol(parts: List[str], subject: str) -> Optional[str]:
+    """``protocol`` from a ``<protocol>-<subject>/ses-*/anat`` path."""
+    for part in parts:
+        if part.endswith(f"-{subject}"):
+            return part[: -len(subject) - 1]
+    return None
+
+
+def _attach_sidecars(
+    records: List[Dict[str, Any]], sidecars: List[str], directory: str
+) -> None:
+    """Attach metadata/telemetry files to the record they belong to.
+
+    ``<stem>_frame_metadata.npz`` belongs to ``<stem>``, and
+    ``<stem>_pupil_frame_metadata.npz`` to the ``pupil`` product.
+    """
+    stems = sorted(
+        ((session_stem(record["name"]), record) for record in records),
+        key=lambda item: -len(item[0]),
+    )
+    for name in sidecars:
+        for stem, record in stems:
+            if name.startswith((stem + "_", stem + ".")):
+                key = name[len(stem) :].lstrip("_").split(".")[0]
+                record["files"][key] = os.path.join(directory, name)
+                break
+
+
+def _data_mtime(path: str) -> float:
+    """Modification time of a data product.
+
+    Zarr arrays are resized in place, so their array metadata is checked
+    as well as the directory itself.
+    """
+    mtime = os.stat(path).st_mtime
+    zarray = os.path.join(path, "0", ".zarray")
+    if os.path.exists(zarray):
+        mtime = max(mtime, os.stat(zarray).st_mtime)
+    return mtime
+
+
+def _describe(path: str) -> Dict[str, Any]:
+    """Kind, frame count, shape and dtype of a data product."""
+    zarray = os.path.join(path, "0", ".zarray")
+    if os.path.exists(zarray):
+        with open(zarray) as file:
+            meta = json.load(file)
+        shape = list(meta["shape"])
+        return _info("zarr", shape, meta["dtype"])
+    if os.path.isdir(path):
+        names = list_tiffs(path)
+        if not names:
+            return _info(None, None, None)
+        frame = _tiff_shape(os.path.join(path, names[0]))
+        return _info("sequence", [len(names)] + frame[0][-2:], frame[1])
+    shape, dtype = _tiff_shape(path)
+    return _info("tiff", shape, dtype)
+
+
+def _info(
+    kind: Optional[str], shape: Optional[List[int]], dtype: Any
+) -> Dict[str, Any]:
+    import numpy as np
+
+    if shape is None:
+        return {"kind": kind, "frames": None, "shape": None, "dtype": None}
+    return {
+        "kind": kind,
+        "frames": int(shape[0]) if len(shape) > 2 else 1,
+        "shape": [int(n) for n in shape],
+        "dtype": np.dtype(dtype).name,
+    }
+
+
+def _tiff_shape(path: str):
+    import tifffile
+
+    with tifffile.TiffFile(path) as tif:
+        series = tif.series[0]
+        return list(series.shape), series.dtype
+
+
+def _size(path: str) -> int:
+    """Bytes used by a file or, recursively, a directory."""
+    if not os.path.isdir(path):
+        return os.stat(path).st_size
+    total = 0
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+    return total
@@ -0,0 +1,224 @@
+"""
+Parallel, adaptive compression of Zarr chunks on ingest.
+
+`CompressedZarrSink` is a `ZarrSink` that does not compress in the writer
+thread. Every full chunk is handed to a pool of worker threads. Each worker
+encodes the chunk with Blosc/zstd and byte-shuffle and writes the result
+straight to the chunk's file in the Zarr v2 store. Blosc releases the GIL,
+so the pool scales with the number of cores. The level used for each
+chunk comes from an `AdaptiveLevel`, based on how full the writer queue
+and the pool backlog are. When the disk or the CPUs fall behind, chunks
+are compressed faster (down to level 0, a plain copy) instead of the
+acquisition being throttled. Every Blosc chunk records how it was
+compressed, so chunks at different levels read back transparently.
+
+The compression ratio, throughput and level histogram of a session are
+reported by `CompressedZarrSink.stats`, which `AsyncFrameWriter` adds to
+its metrics.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ._storage import ZarrSink
+from ._zarr import blosc
+
+
+class AdaptiveLevel:
+    """Compression level chosen from a queue fill fraction.
+
+    Parameters
+    ----------
+    levels : sequence of int
+        Blosc levels from the preferred one down to the fastest.
+    start : float
+        Fill fraction (0-1) below which the preferred level is used; the
+        remaining levels split the range above it evenly.
+    """
+
+    def __init__(self, levels: Sequence[int] = (3, 1, 0), start=0.25):
+        if not levels:
+            raise ValueError("at least one compression level is needed")
+        self.levels = tuple(int(level) for level in levels)
+        self.start = start
+
+    def level(self, fill: float) -> int:
+        """The level for a queue that is ``fill`` full."""
+        if fill < self.start or len(self.levels) == 1:
+            return self.levels[0]
+        steps = len(self.levels) - 1
+        i = 1 + int((fill - self.start) / (1 - self.start) * steps)
+        return self.levels[min(i, steps)]
+
+
+class CompressedZarrSink(ZarrSink):
+    """`ZarrSink` compressing and writing chunks on a worker pool.
+
+    Parameters
+    ----------
+    path, num_frames, chunk_frames
+        As for `ZarrSink`.
+    levels : sequence of int
+        Blosc/zstd levels, preferred first, that `AdaptiveLevel` steps
+        down through as the backlog grows. The first must be above 0.
+    max_workers : int, optional
+        Compression threads. Defaults to the number of CPUs.
+    max_pending : int, optional
+        Chunks being compressed before `write` waits. Defaults to twice
+        ``max_workers``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_frames: Optional[int] = None,
+        chunk_frames: Optional[int] = None,
+        levels: Sequence[int] = (3, 1, 0),
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        if not levels or levels[0] <= 0:
+            raise ValueError("the preferred compression level must be > 0")
+        super().__init__(path, num_frames, chunk_frames, clevel=levels[0])
+        self.policy = AdaptiveLevel(levels)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self._codecs = {level: blosc(level) for level in self.policy.levels}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending: Deque[Future] = deque()
+        self._chunks = 0
+        self._backlog: Callable[[], float] = lambda: 0.0
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def watch_queue(self, fill: Callable[[], float]) -> None:
+        """Also lower the level as ``fill()`` (0-1), e.g. the fill of the
+        writer's frame queue, rises."""
+        self._backlog = fill
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Compression ratio, throughput and chunks per level so far."""
+        with self._lock:
+            elapsed = (
+                (self._stopped or time.perf_counter()) - self._opened
+                if self._opened
+                else 0
+            )
+            return {
+                "chunks": sum(self._levels.values()),
+                "bytes_in": self._bytes_in,
+                "bytes_out": self._bytes_out,
+                "ratio": (
+                    self._bytes_in / self._bytes_out
+                    if self._bytes_out
+                    else None
+                ),
+                "compress_seconds": self._seconds,
+                "mb_per_s": (
+                    self._bytes_in / 2**20 / elapsed if elapsed else None
+                ),
+                "levels": dict(self._levels),
+            }
+
+    def open(self, frame_shape, dtype) -> None:
+        super().open(frame_shape, dtype)
+        self._reset_stats()
+        self._opened = time.perf_counter()
+        self._chunks = 0
+        self._pool = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="mesofield-compress"
+        )
+
+    def close(self) -> List[str]:
+        """Write the last chunk, wait for the workers and trim the array."""
+        if self._array is None:
+            return [self.path]
+        try:
+            self._flush()
+            while self._pending:
+                self._collect(self._pending.popleft())
+            if self._array.shape[0] != self.frames_written:
+                shape = (self.frames_written,) + self._array.shape[1:]
+                self._array.resize(shape)
+        finally:
+            # after a failed close the sink is closed all the same, so a
+            # second close does not hide the first error
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+            self._pool = None
+            self._pending.clear()
+            self._array = None
+            self._stopped = time.perf_counter()
+        return [self.path]
+
+    def _flush(self) -> None:
+        if not self._staged:
+            return
+        start = self.frames_written
+        stop = start + self._staged
+        if stop > self._array.shape[0]:
+            length = max(stop, 2 * self._array.shape[0])
+            self._array.resize((length,) + self._array.shape[1:])
+        chunk = self._staging.copy()
+        # the tail of a partial last chunk lies outside the array
+        chunk[self._staged :] = 0
+        key = ".".join([str(self._chunks)] + ["0"] * (self._staging.ndim - 1))
+        path = os.path.join(self.path, "0", key)
+        while len(self._pending) >= self.max_pending:
+            self._collect(self._pending.popleft())
+        level = self.policy.level(max(self._pool_fill(), self._backlog()))
+        self._pending.append(
+            self._pool.submit(_encode, self._codecs[level], chunk, path)
+        )
+        with self._lock:
+            self._levels[level] = self._levels.get(level, 0) + 1
+        self._chunks += 1
+        self.frames_written = stop
+        self._staged = 0
+        # harvest finished chunks so their errors surface early
+        while self._pending and self._pending[0].done():
+            self._collect(self._pending.popleft())
+
+    def _pool_fill(self) -> float:
+        """Fill (0-1) of the pool backlog.
+
+        Only chunks waiting for a free worker count: the ones being
+        compressed, or finished but not collected yet, are no backlog.
+        """
+        waiting = sum(not future.done() for future in self._pending)
+        waiting -= self.max_workers
+        return max(0, waiting) / max(1, self.max_pending - self.max_workers)
+
+    def _collect(self, future: Future) -> None:
+        bytes_in, bytes_out, seconds = future.result()
+        with self._lock:
+            self._bytes_in += bytes_in
+            self._bytes_out += bytes_out
+            self._seconds += seconds
+
+    def _reset_stats(self) -> None:
+        with self._lock:
+            self._bytes_in = 0
+            self._bytes_out = 0
+            self._seconds = 0.0
+            self._levels: Dict[int, int] = {}
+            self._opened = 0.0
+            self._stopped = 0.0
+
+
+def _encode(codec, chunk: np.ndarray, path: str):
+    """Compress one chunk and write it to its file in the store."""
+    start = time.perf_counter()
+    data = codec.encode(chunk)
+    with open(path, "wb") as file:
+        file.write(data)
+    return chunk.nbytes, len(data), time.perf_counter() - start
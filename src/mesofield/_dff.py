@@ -0,0 +1,217 @@
+"""
+Online ΔF/F during acquisition.
+
+`OnlineDeltaF` sits in the MDA frame stream, keeps a per-pixel baseline F0
+in fixed memory and turns every frame into ``(F - F0) / F0``. The ΔF/F
+frames are forwarded to any MDA listeners given as outputs, e.g. a
+`LiveView` for display and an `AsyncFrameWriter` to save them, so the
+ΔF/F product is complete on disk when ``mmc.mda.run`` returns.
+
+Two baselines are available:
+
+``"mean"``
+    An exponential moving average with a time constant of ``window``
+    frames (a plain running mean until ``window`` frames have been seen).
+``"percentile"``
+    A windowed, approximate percentile: frames are averaged in blocks of
+    ``window // n_blocks``, the last ``n_blocks`` block means are kept, and
+    F0 is their ``percentile``-th percentile, recomputed as each block
+    completes. Memory is ``n_blocks`` frames regardless of ``window``.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from ._buffer import BLOCK, BufferClosed, FrameRingBuffer
+from ._metadata import frame_values
+
+MEAN = "mean"
+PERCENTILE = "percentile"
+
+
+class _MeanBaseline:
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0
+        self.value: Optional[np.ndarray] = None
+
+    def update(self, frame: np.ndarray) -> np.ndarray:
+        self.count += 1
+        if self.value is None:
+            self.value = frame.copy()
+        else:
+            alpha = 1.0 / min(self.count, self.window)
+            self.value += alpha * (frame - self.value)
+        return self.value
+
+
+class _PercentileBaseline:
+    def __init__(self, window: int, percentile: float, n_blocks: int):
+        self.block_len = max(1, window // n_blocks)
+        self.n_blocks = n_blocks
+        self.percentile = percentile
+        self.history: Optional[np.ndarray] = None
+        self.filled = 0
+        self.head = 0
+        self.block_sum: Optional[np.ndarray] = None
+        self.block_count = 0
+        self.value: Optional[np.ndarray] = None
+
+    def update(self, frame: np.ndarray) -> np.ndarray:
+        if self.history is None:
+            self.history = np.empty((self.n_blocks,) + frame.shape, np.float32)
+            self.block_sum = np.zeros(frame.shape, np.float64)
+        self.block_sum += frame
+        self.block_count += 1
+        if self.block_count == self.block_len:
+            np.divide(
+                self.block_sum, self.block_count, out=self.history[self.head]
+            )
+            self.head = (self.head + 1) % self.n_blocks
+            self.filled = min(self.filled + 1, self.n_blocks)
+            self.block_sum[:] = 0
+            self.block_count = 0
+            self.value = np.percentile(
+                self.history[: self.filled], self.percentile, axis=0
+            ).astype(np.float32)
+        elif self.filled == 0:
+            # no complete block yet: the mean so far
+            self.value = (self.block_sum / self.block_count).astype(np.float32)
+        return self.value
+
+
+class OnlineDeltaF:
+    """Per-pixel ΔF/F of a live frame stream.
+
+    Parameters
+    ----------
+    method : {"mean", "percentile"}
+        How the baseline F0 is estimated (see the module docstring).
+    window : int
+        Baseline window, in frames of one channel.
+    percentile : float
+        Percentile used by the ``"percentile"`` baseline.
+    n_blocks : int
+        Number of block means kept by the ``"percentile"`` baseline.
+    outputs : sequence
+        MDA listeners (``sequenceStarted``, ``frameReady``,
+        ``sequenceFinished``) that receive the ΔF/F frames as float32.
+    by_channel : bool
+        Keep a separate baseline for every channel found in the frame
+        metadata, as needed for interleaved blue/violet acquisitions.
+    threaded : bool
+        Compute in a worker thread fed through a bounded queue, so the MDA
+        thread only copies frames. ``sequenceFinished`` waits for the queue
+        to drain before finishing the outputs.
+    max_queue : int
+        Capacity of that queue, in frames.
+    eps : float
+        Lower bound on F0, avoiding divisions by zero in dark pixels.
+    """
+
+    def __init__(
+        self,
+        method: str = MEAN,
+        window: int = 500,
+        percentile: float = 10.0,
+        n_blocks: int = 16,
+        outputs: Sequence[Any] = (),
+        by_channel: bool = True,
+        threaded: bool = True,
+        max_queue: int = 64,
+        eps: float = 1.0,
+    ):
+        if method not in (MEAN, PERCENTILE):
+            raise ValueError(f"unknown baseline method {method!r}")
+        self.method = method
+        self.window = window
+        self.percentile = percentile
+        self.n_blocks = n_blocks
+        self.outputs = list(outputs)
+        self.by_channel = by_channel
+        self.threaded = threaded
+        self.eps = eps
+        self._queue = FrameRingBuffer(max_queue, overflow=BLOCK)
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._baselines: Dict[Any, Any] = {}
+
+    def reset(self) -> None:
+        """Forget all baselines."""
+        self._baselines = {}
+
+    def baseline(self, channel: Any = None) -> Optional[np.ndarray]:
+        """The current F0 of ``channel``, if any frames were seen."""
+        estimator = self._baselines.get(channel if self.by_channel else None)
+        return None if estimator is None else estimator.value
+
+    def process(self, frame: Any, channel: Any = None) -> np.ndarray:
+        """Update the baseline with ``frame`` and return its ΔF/F."""
+        frame = np.asarray(frame, dtype=np.float32)
+        key = channel if self.by_channel else None
+        estimator = self._baselines.get(key)
+        if estimator is None:
+            if self.method == MEAN:
+                estimator = _MeanBaseline(self.window)
+            else:
+                estimator = _PercentileBaseline(
+                    self.window, self.percentile, self.n_blocks
+                )
+            self._baselines[key] = estimator
+        f0 = np.maximum(estimator.update(frame), self.eps)
+        dff = frame - f0
+        dff /= f0
+        return dff
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self.reset()
+        for output in self.outputs:
+            output.sequenceStarted(sequence, *args)
+        if self.threaded:
+            self._queue.reset()
+            self._error = None
+            self._thread = threading.Thread(
+                target=self._run, name="mesofield-dff", daemon=True
+            )
+            self._thread.start()
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        if self._thread is not None:
+            # a closed queue means the worker failed; sequenceFinished
+            # raises its error
+            with contextlib.suppress(BufferClosed):
+                self._queue.push(image, (event, meta))
+        else:
+            self._emit(image, event, meta)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        if self._thread is not None:
+            self._queue.close()
+            self._thread.join()
+            self._thread = None
+        for output in self.outputs:
+            output.sequenceFinished(sequence)
+        if self._error is not None:
+            raise self._error
+
+    def _emit(self, image: Any, event: Any, meta: Any) -> None:
+        channel = frame_values(meta, event)["channel"]
+        dff = self.process(image, channel)
+        for output in self.outputs:
+            output.frameReady(dff, event, meta)
+
+    def _run(self) -> None:
+        try:
+            for frames, items in self._queue.batches():
+                for frame, (event, meta) in zip(frames, items):
+                    self._emit(frame, event, meta)
+        except BaseException as error:  # noqa: BLE001
+            self._error = error
+            self._queue.close()
@@ -0,0 +1,385 @@
+"""
+Blue/violet demultiplexing and hemodynamic correction.
+
+With alternating excitation, blue frames carry the calcium signal plus
+hemodynamic absorption while violet (isosbestic) frames carry only the
+hemodynamics. `ChannelDemux` splits the interleaved stream into one
+stream per wavelength, by position in the excitation sequence or by the
+channel in the frame metadata. Metadata channel names are matched
+case-insensitively and through the Arduino-Switch states, so ``"Blue"``,
+``"blue"`` and ``"4"`` all name the blue channel.
+
+`HemodynamicRegression` regresses the violet signal out of the blue one,
+independently for every pixel. The fit only needs four running sums per
+pixel, so it is accumulated chunk by chunk along time with array
+operations: offline over saved sessions (`correct_session`) or online
+during acquisition (`OnlineHemodynamicCorrection`).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ._metadata import frame_values
+from ._synthetic import BLUE, VIOLET
+
+logger = logging.getLogger(__name__)
+
+# Arduino-Switch states loaded by ``load_mmc_params``
+ARDUINO_STATES = {"4": BLUE, "2": VIOLET}
+# frames per chunk in offline corrections
+CHUNK_FRAMES = 256
+
+
+def pattern_from_states(
+    states: Sequence[str], names: Optional[Dict[str, str]] = None
+) -> Tuple[str, ...]:
+    """Channel pattern of an Arduino-Switch state sequence.
+
+    ``pattern_from_states(['4', '4', '2', '2'])`` gives
+    ``('blue', 'blue', 'violet', 'violet')``.
+    """
+    names = ARDUINO_STATES if names is None else names
+    return tuple(names.get(str(state), str(state)) for state in states)
+
+
+def channel_name(channel: Any, names: Optional[Dict[str, str]] = None) -> str:
+    """Canonical name of a metadata channel.
+
+    Arduino-Switch states map through ``names`` (`ARDUINO_STATES` by
+    default); other names are lower-cased, so ``"Blue"`` gives ``"blue"``.
+    """
+    names = ARDUINO_STATES if names is None else names
+    text = str(channel).strip()
+    return names.get(text, text.lower())
+
+
+def demux_indices(
+    n_frames: int, pattern: Sequence[str], offset: int = 0
+) -> Dict[str, np.ndarray]:
+    """Frame indices of every channel in an interleaved stack.
+
+    Parameters
+    ----------
+    n_frames : int
+        Length of the interleaved stack.
+    pattern : sequence of str
+        Channel of each position in the repeating excitation sequence.
+    offset : int
+        Position in ``pattern`` of the first frame.
+    """
+    positions = (np.arange(n_frames) + offset) % len(pattern)
+    pattern = np.asarray(pattern)
+    return {
+        channel: np.flatnonzero(pattern[positions] == channel)
+        for channel in dict.fromkeys(pattern.tolist())
+    }
+
+
+def demux(
+    stack: Any, pattern: Sequence[str] = (BLUE, VIOLET), offset: int = 0
+) -> Dict[str, Any]:
+    """Split an interleaved (t, ...) stack into one stack per channel.
+
+    Regular strides (one frame per channel per period) are returned as
+    views; other patterns use fancy indexing, which dask arrays evaluate
+    lazily.
+    """
+    period = len(pattern)
+    out = {}
+    for channel, index in demux_indices(len(stack), pattern, offset).items():
+        if len(index) > 1 and np.all(np.diff(index) == period):
+            out[channel] = stack[index[0] :: period]
+        else:
+            out[channel] = stack[index]
+    return out
+
+
+class ChannelDemux:
+    """Route an interleaved MDA frame stream to per-channel listeners.
+
+    Parameters
+    ----------
+    outputs : dict
+        MDA listeners for each channel name; frames of channels without
+        outputs are dropped.
+    pattern : sequence of str
+        Excitation sequence used when a frame's metadata names no known
+        channel.
+    use_metadata : bool
+        Prefer the channel in the frame metadata (or MDA event) over the
+        position in ``pattern``, when it is one of the channels of
+        ``pattern`` or ``outputs`` (see `channel_name`).
+
+    Attributes
+    ----------
+    counts : dict
+        Frames per channel in the current sequence.
+    unknown : int
+        Frames whose metadata channel was not recognized and which were
+        assigned by ``pattern`` instead.
+    """
+
+    def __init__(
+        self,
+        outputs: Dict[str, Sequence[Any]],
+        pattern: Sequence[str] = (BLUE, VIOLET),
+        use_metadata: bool = True,
+    ):
+        self.outputs = {channel: list(out) for channel, out in outputs.items()}
+        self.pattern = tuple(pattern)
+        self.use_metadata = use_metadata
+        self.counts: Dict[str, int] = {}
+        self.unknown = 0
+        self._channels = set(self.pattern) | set(self.outputs)
+        self._index = 0
+
+    def channel_of(self, index: int, meta: Any = None, event: Any = None):
+        """Channel of the ``index``-th frame of the sequence."""
+        if self.use_metadata:
+            channel = frame_values(meta, event)["channel"]
+            if channel:
+                channel = channel_name(channel)
+                if channel in self._channels:
+                    return channel
+                self.unknown += 1
+        return self.pattern[index % len(self.pattern)]
+
+    def _listeners(self) -> List[Any]:
+        return [listener for out in self.outputs.values() for listener in out]
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self._index = 0
+        self.counts = {}
+        self.unknown = 0
+        for listener in self._listeners():
+            listener.sequenceStarted(sequence, *args)
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        channel = self.channel_of(self._index, meta, event)
+        self._index += 1
+        self.counts[channel] = self.counts.get(channel, 0) + 1
+        for listener in self.outputs.get(channel, ()):
+            listener.frameReady(image, event, meta)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        for listener in self._listeners():
+            listener.sequenceFinished(sequence)
+
+
+class HemodynamicRegression:
+    """Per-pixel linear regression of blue on violet fluorescence.
+
+    For every pixel, ``blue ≈ intercept + slope * violet`` is fitted by
+    least squares over all frames passed to `update`; `correct` removes the
+    violet-explained part of the blue signal.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self._sums: Optional[Dict[str, np.ndarray]] = None
+
+    def update(self, blue: Any, violet: Any) -> None:
+        """Add (t, ...) chunks of paired blue and violet frames."""
+        blue, violet = _pair(blue, violet)
+        if not len(blue):
+            return
+        sums = {
+            "b": blue.sum(0, dtype=np.float64),
+            "v": violet.sum(0, dtype=np.float64),
+            "bv": np.einsum("t...,t...->...", blue, violet, dtype=np.float64),
+            "vv": np.einsum(
+                "t...,t...->...", violet, violet, dtype=np.float64
+            ),
+        }
+        if self._sums is None:
+            self._sums = sums
+        else:
+            for key, value in sums.items():
+                self._sums[key] += value
+        self.n += len(blue)
+
+    def coefficients(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-pixel ``(intercept, slope)`` of the fit so far."""
+        if self._sums is None:
+            raise ValueError("no frames to fit")
+        n, s = self.n, self._sums
+        mean_b, mean_v = s["b"] / n, s["v"] / n
+        var_v = s["vv"] / n - mean_v**2
+        cov = s["bv"] / n - mean_b * mean_v
+        slope = np.divide(
+            cov, var_v, out=np.zeros_like(cov), where=var_v > 1e-12
+        )
+        return mean_b - slope * mean_v, slope
+
+    @property
+    def mean_blue(self) -> np.ndarray:
+        """Per-pixel mean blue fluorescence so far."""
+        if self._sums is None:
+            raise ValueError("no frames to fit")
+        return self._sums["b"] / self.n
+
+    def correct(
+        self, blue: Any, violet: Any, as_dff: bool = False
+    ) -> np.ndarray:
+        """Remove the violet-explained signal from a chunk of blue frames.
+
+        Returns ``blue - slope * (violet - mean(violet))`` as float32, which
+        keeps the mean blue fluorescence, or, with ``as_dff``, that value
+        as ΔF/F relative to the mean blue fluorescence.
+        """
+        blue, violet = _pair(blue, violet)
+        intercept, slope = self.coefficients()
+        mean_b = self.mean_blue
+        # blue - (intercept + slope * violet) + mean(blue)
+        out = blue.astype(np.float32)
+        out -= (slope * violet).astype(np.float32)
+        out += (mean_b - intercept).astype(np.float32)
+        if as_dff:
+            f0 = np.maximum(mean_b, 1e-6).astype(np.float32)
+            out -= f0
+            out /= f0
+        return out
+
+
+def correct_session(
+    blue: Any,
+    violet: Any,
+    chunk_frames: int = CHUNK_FRAMES,
+    as_dff: bool = False,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Hemodynamic correction of a whole session, chunk by chunk.
+
+    Two passes over the data, ``chunk_frames`` frames at a time: the first
+    fits every pixel, the second writes the corrected frames into ``out``,
+    which may be a memory map for sessions larger than memory. The inputs
+    can be any sliceable arrays (memory maps, zarr or dask arrays).
+
+    Returns
+    -------
+    np.ndarray
+        The (t, ...) float32 corrected blue frames; ``t`` is the length of
+        the shorter input.
+    """
+    n = min(len(blue), len(violet))
+    regression = HemodynamicRegression()
+    for start in range(0, n, chunk_frames):
+        stop = min(start + chunk_frames, n)
+        regression.update(blue[start:stop], violet[start:stop])
+    if out is None:
+        out = np.empty((n,) + tuple(blue.shape[1:]), dtype=np.float32)
+    for start in range(0, n, chunk_frames):
+        stop = min(start + chunk_frames, n)
+        out[start:stop] = regression.correct(
+            blue[start:stop], violet[start:stop], as_dff
+        )
+    return out
+
+
+class OnlineHemodynamicCorrection:
+    """Hemodynamic correction of an interleaved stream during acquisition.
+
+    Each blue frame is paired with the next violet frame (or vice versa);
+    every pair updates the running per-pixel fit and the corrected blue
+    frame, using the fit so far, goes to the outputs.
+
+    Parameters
+    ----------
+    outputs : sequence
+        MDA listeners receiving the corrected float32 frames.
+    pattern, use_metadata
+        Channel assignment, as in `ChannelDemux`.
+    as_dff : bool
+        Emit ΔF/F relative to the running mean blue fluorescence.
+    warmup : int
+        Pairs to accumulate before the fit is applied; until then the
+        slope is taken as zero.
+
+    Attributes
+    ----------
+    dropped : int
+        Frames of the current sequence that produced no output: frames of
+        other channels, and frames replaced by the next frame of the same
+        channel before a partner arrived. Logged when the sequence
+        finishes.
+    """
+
+    def __init__(
+        self,
+        outputs: Sequence[Any] = (),
+        pattern: Sequence[str] = (BLUE, VIOLET),
+        use_metadata: bool = True,
+        as_dff: bool = False,
+        warmup: int = 10,
+    ):
+        self.outputs = list(outputs)
+        self.demux = ChannelDemux({}, pattern, use_metadata)
+        self.as_dff = as_dff
+        self.warmup = warmup
+        self.regression = HemodynamicRegression()
+        self._pending: Dict[str, Tuple[np.ndarray, Any, Any]] = {}
+        self._index = 0
+        self.dropped = 0
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self.regression = HemodynamicRegression()
+        self._pending = {}
+        self._index = 0
+        self.dropped = 0
+        self.demux.sequenceStarted(sequence, *args)
+        for output in self.outputs:
+            output.sequenceStarted(sequence, *args)
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        channel = self.demux.channel_of(self._index, meta, event)
+        self._index += 1
+        if channel not in (BLUE, VIOLET):
+            self.dropped += 1
+            return
+        if channel in self._pending:
+            self.dropped += 1  # no partner arrived for the previous one
+        self._pending[channel] = (np.asarray(image), event, meta)
+        if len(self._pending) < 2:
+            return
+        blue, blue_event, blue_meta = self._pending.pop(BLUE)
+        violet = self._pending.pop(VIOLET)[0]
+        self.regression.update(blue[np.newaxis], violet[np.newaxis])
+        if self.regression.n >= self.warmup:
+            corrected = self.regression.correct(
+                blue[np.newaxis], violet[np.newaxis], self.as_dff
+            )[0]
+        else:
+            corrected = blue.astype(np.float32)
+            if self.as_dff:
+                f0 = np.maximum(self.regression.mean_blue, 1e-6)
+                corrected = ((corrected - f0) / f0).astype(np.float32)
+        for output in self.outputs:
+            output.frameReady(corrected, blue_event, blue_meta)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        self.dropped += len(self._pending)
+        self._pending = {}
+        if self.dropped:
+            logger.warning(
+                "hemodynamic correction dropped %d of %d frames "
+                "(%d with an unknown metadata channel)",
+                self.dropped,
+                self._index,
+                self.demux.unknown,
+            )
+        for output in self.outputs:
+            output.sequenceFinished(sequence)
+
+
+def _pair(blue: Any, violet: Any) -> Tuple[np.ndarray, np.ndarray]:
+    blue, violet = np.asarray(blue), np.asarray(violet)
+    n = min(len(blue), len(violet))
+    return blue[:n], violet[:n]
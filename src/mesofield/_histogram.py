@@ -0,0 +1,194 @@
+"""
+Cumulative intensity histograms for instant threshold previews.
+
+A histogram is built once per image, block by block, and afterwards the
+number of pixels above (or below) any threshold is a lookup in its
+cumulative counts instead of a pass over the pixel data. Images of up to 16
+bits get one bin per value, so their counts are exact.
+"""
+
+from __future__ import annotations
+
+import weakref
+from typing import Any, Dict, Generator, Optional, Tuple
+
+import numpy as np
+
+from ._blocks import iter_blocks
+from ._threshold import native_threshold
+
+# upper bound on the size of each block read while building a histogram
+BLOCK_BYTES = 16 * 2**20
+# number of bins for float (or > 16 bit integer) images
+FLOAT_BINS = 4096
+# key under which layer_histogram stores the histogram in ``layer.metadata``
+METADATA_KEY = "histogram"
+
+# histograms by id() of the data they were built from
+_HISTOGRAMS: Dict[int, Tuple[weakref.ref, IntensityHistogram]] = {}
+
+
+class IntensityHistogram:
+    """Pixel counts of an image, binned by intensity.
+
+    Parameters
+    ----------
+    dtype : dtype-like
+        The image dtype.
+    lo, hi : float, optional
+        Intensity range covered by the bins. Ignored for integer images of
+        up to 16 bits, which get one bin per representable value.
+    bins : int
+        Number of bins for all other images.
+    """
+
+    def __init__(
+        self,
+        dtype: Any,
+        lo: Optional[float] = None,
+        hi: Optional[float] = None,
+        bins: int = FLOAT_BINS,
+    ):
+        self.dtype = np.dtype(dtype)
+        self.exact = self.dtype.kind in "uib" and self.dtype.itemsize <= 2
+        if self.exact:
+            info = (
+                np.iinfo(np.uint8)
+                if self.dtype.kind == "b"
+                else np.iinfo(self.dtype)
+            )
+            self.lo, self.hi = info.min, info.max
+            nbins = info.max - info.min + 1
+        else:
+            if lo is None or hi is None:
+                raise ValueError("lo and hi are required for this dtype")
+            self.lo, self.hi = float(lo), float(hi)
+            nbins = bins
+        self.counts = np.zeros(nbins, dtype=np.int64)
+        self._cumulative: Optional[np.ndarray] = None
+
+    @property
+    def total(self) -> int:
+        """Number of pixels counted so far."""
+        return int(self.counts.sum())
+
+    def update(self, block: Any) -> None:
+        """Add the pixels in ``block`` to the histogram."""
+        block = np.asarray(block).ravel()
+        if self.exact:
+            if self.dtype.kind == "i":
+                block = block.astype(np.int32) - self.lo
+            self.counts += np.bincount(block, minlength=len(self.counts))
+        else:
+            counts, _ = np.histogram(
+                block, bins=len(self.counts), range=(self.lo, self.hi)
+            )
+            self.counts += counts
+        self._cumulative = None
+
+    def count_above(self, threshold: float, invert: bool = False) -> int:
+        """Number of pixels above ``threshold`` (below it if ``invert``).
+
+        ``threshold`` is on the ``img_as_float`` scale used by the threshold
+        widgets. Counts are exact for integer images of up to 16 bits and
+        interpolated within a bin otherwise.
+        """
+        if self._cumulative is None:
+            self._cumulative = np.concatenate([[0], np.cumsum(self.counts)])
+        cumulative = self._cumulative
+        total = int(cumulative[-1])
+        if self.exact:
+            if self.dtype.kind == "b":
+                # compare True/False as 1/0
+                bound = (np.ceil if invert else np.floor)(threshold)
+                bound = int(np.clip(bound, -1, 2))
+            else:
+                bound = native_threshold(self.dtype, threshold, invert)
+            # cumulative[i] counts the pixels with value < lo + i
+            if invert:
+                i = np.clip(bound - self.lo, 0, len(self.counts))
+                return int(cumulative[i])
+            i = np.clip(bound - self.lo + 1, 0, len(self.counts))
+            return total - int(cumulative[i])
+        value = native_threshold(self.dtype, threshold, invert)
+        width = (self.hi - self.lo) or 1.0
+        position = (value - self.lo) / width * len(self.counts)
+        below = float(
+            np.interp(position, np.arange(len(cumulative)), cumulative)
+        )
+        return int(round(below if invert else total - below))
+
+    def fraction_above(self, threshold: float, invert: bool = False) -> float:
+        """Fraction of pixels above ``threshold`` (below it if ``invert``)."""
+        total = self.total
+        return self.count_above(threshold, invert) / total if total else 0.0
+
+
+def build_histogram(
+    data: Any, block_bytes: int = BLOCK_BYTES
+) -> Generator[float, None, IntensityHistogram]:
+    """Build the histogram of ``data`` incrementally, block by block.
+
+    This is a generator that yields the fraction of the work done after
+    every block and returns the histogram, so it can drive a napari
+    ``thread_worker`` progress bar. Use `histogram_of` to build it in one go.
+    """
+    dtype = np.dtype(data.dtype)
+    blocks = list(iter_blocks(data.shape, dtype, block_bytes))
+    exact = dtype.kind in "uib" and dtype.itemsize <= 2
+    passes = 1 if exact else 2
+    lo = hi = None
+    if not exact:
+        # a first pass finds the intensity range
+        lo, hi = np.inf, -np.inf
+        for i, block in enumerate(blocks):
+            chunk = np.asarray(data[block])
+            lo = min(lo, float(np.nanmin(chunk)))
+            hi = max(hi, float(np.nanmax(chunk)))
+            yield (i + 1) / (len(blocks) * passes)
+    histogram = IntensityHistogram(dtype, lo, hi)
+    for i, block in enumerate(blocks):
+        histogram.update(data[block])
+        yield (i + 1 + len(blocks) * (passes - 1)) / (len(blocks) * passes)
+    _remember(data, histogram)
+    return histogram
+
+
+def histogram_of(data: Any, block_bytes: int = BLOCK_BYTES):
+    """Return the (cached) histogram of ``data``, building it if needed."""
+    histogram = cached_histogram(data)
+    if histogram is None:
+        builder = build_histogram(data, block_bytes)
+        while True:
+            try:
+                next(builder)
+            except StopIteration as stop:
+                histogram = stop.value
+                break
+    return histogram
+
+
+def cached_histogram(data: Any) -> Optional[IntensityHistogram]:
+    """The histogram already built for this exact data object, if any."""
+    entry = _HISTOGRAMS.get(id(data))
+    if entry is not None and entry[0]() is data:
+        return entry[1]
+    return None
+
+
+def layer_histogram(layer) -> IntensityHistogram:
+    """Return the histogram of an image layer, storing it with the layer."""
+    data = layer.data[0] if layer.multiscale else layer.data
+    histogram = histogram_of(data)
+    layer.metadata[METADATA_KEY] = histogram
+    return histogram
+
+
+def _remember(data: Any, histogram: IntensityHistogram) -> None:
+    key = id(data)
+    try:
+        ref = weakref.ref(data, lambda _: _HISTOGRAMS.pop(key, None))
+    except TypeError:
+        # not weak-referenceable, nothing to cache against
+        return
+    _HISTOGRAMS[key] = (ref, histogram)
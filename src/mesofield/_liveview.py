@@ -0,0 +1,190 @@
+"""
+A live view that redraws at display rate, whatever the acquisition rate.
+
+Acquisition threads hand every frame to `LiveView.update`, which only keeps
+a reference to the newest one (and folds it into optional running
+projections). A ``QTimer`` on the GUI thread then pushes the newest frame
+into a napari layer at most ``display_hz`` times per second, so rendering
+cost is independent of the camera frame rate and the producer never waits
+on the GUI.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+MEAN = "mean"
+MAX = "max"
+PROJECTIONS = (MEAN, MAX)
+
+
+class LiveView:
+    """Decimated live display of a frame stream in a napari viewer.
+
+    Parameters
+    ----------
+    viewer : napari.Viewer
+        Viewer the live layers are added to.
+    name : str
+        Name of the live image layer. Projection layers are named
+        ``f"{name} {projection}"``.
+    display_hz : float
+        Maximum number of redraws per second.
+    projections : sequence of {"mean", "max"}
+        Running projections to display next to the latest frame. They are
+        accumulated over every frame received since the last `reset`.
+    telemetry : AcquisitionTelemetry, optional
+        Receives the time from a frame's arrival to its display
+        (``"display"`` stage).
+    """
+
+    def __init__(
+        self,
+        viewer,
+        name: str = "live",
+        display_hz: float = 20.0,
+        projections: Sequence[str] = (),
+        telemetry=None,
+    ):
+        for projection in projections:
+            if projection not in PROJECTIONS:
+                raise ValueError(
+                    f"projections must be in {PROJECTIONS}, "
+                    f"not {projection!r}"
+                )
+        self.viewer = viewer
+        self.name = name
+        self.display_hz = display_hz
+        self.projections = tuple(projections)
+        self.telemetry = telemetry
+        self._lock = threading.Lock()
+        self._timer = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the current frame, projections and counters."""
+        with self._lock:
+            self._latest: Optional[np.ndarray] = None
+            self._received = 0.0
+            self._sum: Optional[np.ndarray] = None
+            self._max: Optional[np.ndarray] = None
+            self._version = 0
+            self._shown = 0
+            self.frames_received = 0
+            self.frames_displayed = 0
+
+    def update(self, frame: Any) -> None:
+        """Offer a new frame; safe to call from any thread."""
+        frame = np.asarray(frame)
+        with self._lock:
+            self._latest = frame
+            self._received = time.perf_counter()
+            self._accumulate(frame[np.newaxis])
+            self.frames_received += 1
+            self._version += 1
+
+    def update_batch(self, frames: Any) -> None:
+        """Offer a (n, ...) batch of frames, e.g. from a ring buffer drain."""
+        frames = np.asarray(frames)
+        if not len(frames):
+            return
+        with self._lock:
+            self._latest = frames[-1]
+            self._received = time.perf_counter()
+            self._accumulate(frames)
+            self.frames_received += len(frames)
+            self._version += 1
+
+    def latest(self) -> Optional[np.ndarray]:
+        """The newest frame received, if any."""
+        return self._latest
+
+    def projection(self, kind: str) -> Optional[np.ndarray]:
+        """The current running ``"mean"`` or ``"max"`` projection."""
+        with self._lock:
+            return self._projection(kind)
+
+    def refresh(self) -> bool:
+        """Draw the newest frame if it changed; call on the GUI thread.
+
+        Returns
+        -------
+        bool
+            Whether the display was updated.
+        """
+        with self._lock:
+            if self._version == self._shown or self._latest is None:
+                return False
+            self._shown = self._version
+            received = self._received
+            images: Dict[str, np.ndarray] = {self.name: self._latest}
+            for kind in self.projections:
+                images[f"{self.name} {kind}"] = self._projection(kind)
+        for name, image in images.items():
+            self._show(name, image)
+        self.frames_displayed += 1
+        if self.telemetry is not None:
+            self.telemetry.record("display", time.perf_counter() - received)
+        return True
+
+    def start(self) -> None:
+        """Start redrawing at ``display_hz`` from a Qt timer."""
+        from qtpy.QtCore import QTimer
+
+        if self._timer is None:
+            self._timer = QTimer()
+            self._timer.timeout.connect(self.refresh)
+        self._timer.start(max(1, int(round(1000 / self.display_hz))))
+
+    def stop(self) -> None:
+        """Stop redrawing, after showing the final frame."""
+        if self._timer is not None:
+            self._timer.stop()
+        self.refresh()
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self.reset()
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        self.update(image)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        pass
+
+    def _accumulate(self, frames: np.ndarray) -> None:
+        """Fold frames into the projections; the lock must be held."""
+        if MEAN in self.projections:
+            total = frames.sum(axis=0, dtype=np.float64)
+            if self._sum is None or self._sum.shape != total.shape:
+                self._sum = total
+            else:
+                self._sum += total
+        if MAX in self.projections:
+            peak = frames.max(axis=0)
+            if self._max is None or self._max.shape != peak.shape:
+                self._max = peak
+            else:
+                np.maximum(self._max, peak, out=self._max)
+
+    def _projection(self, kind: str) -> Optional[np.ndarray]:
+        if kind == MEAN:
+            if self._sum is None:
+                return None
+            return (self._sum / self.frames_received).astype(np.float32)
+        if kind == MAX:
+            return None if self._max is None else self._max.copy()
+        raise ValueError(f"unknown projection {kind!r}")
+
+    def _show(self, name: str, image: np.ndarray) -> None:
+        try:
+            layer = self.viewer.layers[name]
+        except KeyError:
+            self.viewer.add_image(image, name=name)
+            return
+        layer.data = image
@@ -0,0 +1,258 @@
+"""
+Columnar per-frame metadata.
+
+Instead of one JSON document per frame, `FrameMetadataRecorder` keeps the
+fields needed for analysis (frame index, timestamps, channel, exposure) in
+a preallocated NumPy structured array and writes it once per session, to
+Parquet when pyarrow is installed and to ``.npz`` otherwise. Reading the
+metadata of a whole session back with `load_frame_metadata` is a single
+array load.
+
+The table of the data product ``<stem>`` (e.g. ``<stem>.ome.zarr``) is
+saved next to it as ``<stem>_frame_metadata.parquet`` (or ``.npz``); see
+`frame_metadata_path`.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+FRAME_DTYPE = np.dtype(
+    [
+        ("frame_index", np.int64),
+        ("host_time", np.float64),
+        ("camera_time_ms", np.float64),
+        ("runner_time_ms", np.float64),
+        ("exposure_ms", np.float64),
+        ("channel", "U16"),
+        ("images_remaining", np.int32),
+    ]
+)
+
+# the table of ``<stem>`` is ``<stem>_frame_metadata.<ext>``
+METADATA_SUFFIX = "_frame_metadata"
+METADATA_EXTENSIONS = (".parquet", ".npz")
+
+# metadata keys checked, in order, for each field
+_KEYS = {
+    "frame_index": ("frame_index", "ImageNumber"),
+    "host_time": ("host_time",),
+    "camera_time_ms": ("camera_time_ms", "ElapsedTime-ms"),
+    "runner_time_ms": ("runner_time_ms",),
+    "exposure_ms": ("exposure_ms", "Exposure-ms"),
+    "channel": ("channel", "Channel"),
+    "images_remaining": ("images_remaining_in_buffer",),
+}
+
+
+class FrameMetadataRecorder:
+    """Record per-frame metadata into a structured array.
+
+    Parameters
+    ----------
+    path : str, optional
+        Where `save` writes by default, and where the table is written when
+        the MDA sequence finishes.
+    capacity : int
+        Number of rows preallocated, typically the expected number of frames;
+        the table doubles in size when it fills up.
+
+    Notes
+    -----
+    ``record`` understands the metadata dicts of pymmcore-plus
+    (``frameReady`` and ``popNextImageAndMD``) as well as those of
+    `SyntheticWidefield`. Missing timestamps and exposures are NaN, missing
+    buffer counts are -1.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 1024):
+        self.path = path
+        self._table = np.zeros(max(1, capacity), dtype=FRAME_DTYPE)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def table(self) -> np.ndarray:
+        """The rows recorded so far (a view, not a copy)."""
+        return self._table[: self._count]
+
+    def record(
+        self,
+        meta: Any = None,
+        event: Any = None,
+        frame_index: Optional[int] = None,
+    ) -> None:
+        """Append the metadata of one frame.
+
+        Parameters
+        ----------
+        meta : mapping, optional
+            Frame metadata.
+        event : useq.MDAEvent, optional
+            The event that produced the frame; supplies the channel and time
+            index when ``meta`` does not.
+        frame_index : int, optional
+            Overrides the index found in ``meta`` or ``event``; by default
+            frames are numbered in the order they are recorded.
+        """
+        if self._count == len(self._table):
+            grown = np.zeros(2 * len(self._table), dtype=FRAME_DTYPE)
+            grown[: self._count] = self._table
+            self._table = grown
+        row = self._table[self._count]
+        values = frame_values(meta, event)
+        if frame_index is not None:
+            values["frame_index"] = frame_index
+
+        row["frame_index"] = _number(values["frame_index"], self._count)
+        row["host_time"] = _number(values["host_time"], time.perf_counter())
+        for field in ("camera_time_ms", "runner_time_ms", "exposure_ms"):
+            row[field] = _number(values[field], np.nan)
+        row["channel"] = values["channel"] or ""
+        row["images_remaining"] = _number(values["images_remaining"], -1)
+        self._count += 1
+
+    def reset(self) -> None:
+        """Discard all recorded rows."""
+        self._count = 0
+
+    def save(self, path: Optional[str] = None) -> str:
+        """Write the table to ``.parquet`` or ``.npz``; returns the path.
+
+        Parquet is used for paths ending in ``.parquet`` when pyarrow is
+        installed; everything else is saved with ``np.savez``.
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("no path to save the frame metadata to")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                path = os.path.splitext(path)[0] + ".npz"
+            else:
+                table = self.table
+                pq.write_table(
+                    pa.table(
+                        {name: table[name] for name in FRAME_DTYPE.names}
+                    ),
+                    path,
+                )
+                return path
+        if not path.endswith(".npz"):
+            path += ".npz"
+        np.savez(path, frames=self.table)
+        return path
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self.reset()
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        self.record(meta, event)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        if self.path is not None:
+            self.save()
+
+
+def frame_metadata_path(stem: str, ext: str = ".parquet") -> str:
+    """Path of the metadata table of the data product ``stem``.
+
+    ``stem`` is the data path without its extension, e.g. the ``sub_dir``
+    of an experiment config for ``<sub_dir>.ome.zarr``.
+    """
+    return stem + METADATA_SUFFIX + ext
+
+
+def find_frame_metadata(stem: str) -> Optional[str]:
+    """The saved metadata table of ``stem`` (Parquet or ``.npz``), if any.
+
+    `FrameMetadataRecorder.save` falls back to ``.npz`` without pyarrow,
+    so both extensions are checked.
+    """
+    for ext in METADATA_EXTENSIONS:
+        path = frame_metadata_path(stem, ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_frame_metadata(path: str) -> np.ndarray:
+    """Load a table written by `FrameMetadataRecorder.save`.
+
+    Returns
+    -------
+    np.ndarray
+        Structured array with the fields of `FRAME_DTYPE`, one row per
+        frame.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        columns = pq.read_table(path)
+        table = np.zeros(columns.num_rows, dtype=FRAME_DTYPE)
+        for name in FRAME_DTYPE.names:
+            table[name] = columns.column(name).to_numpy()
+        return table
+    with np.load(path) as npz:
+        return npz["frames"]
+
+
+def frame_values(meta: Any = None, event: Any = None) -> Dict[str, Any]:
+    """Pick the fields of `FRAME_DTYPE` out of frame metadata.
+
+    Parameters
+    ----------
+    meta : mapping, optional
+        Frame metadata from pymmcore-plus or `SyntheticWidefield`.
+    event : useq.MDAEvent, optional
+        Supplies the channel and time index when ``meta`` does not.
+
+    Returns
+    -------
+    dict
+        The raw value of every field, None where it was not found.
+    """
+    values = {field: _lookup(meta, keys) for field, keys in _KEYS.items()}
+    if event is not None:
+        if values["channel"] is None and event.channel is not None:
+            values["channel"] = event.channel.config
+        if values["frame_index"] is None and "t" in event.index:
+            values["frame_index"] = event.index["t"]
+    return values
+
+
+def _lookup(meta: Any, keys) -> Any:
+    """First value found in ``meta`` under any of ``keys``."""
+    if meta is None:
+        return None
+    for key in keys:
+        try:
+            value = meta.get(key)
+            if value is None and isinstance(meta.get("camera_metadata"), dict):
+                value = meta["camera_metadata"].get(key)
+        except (AttributeError, KeyError, TypeError):
+            return None
+        if value is not None:
+            return value
+    return None
+
+
+def _number(value: Any, default):
+    """``value`` as a number, or ``default`` if missing or unparseable."""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
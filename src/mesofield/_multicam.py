@@ -0,0 +1,275 @@
+"""
+Synchronized acquisition from several cameras.
+
+Every camera runs as a `CameraPipeline`: its own acquisition thread (the
+pymmcore-plus MDA thread of its own ``CMMCorePlus``, or a synthetic
+source), its own bounded queue and writer thread (`AsyncFrameWriter`) and
+its own metadata table. Nothing is shared between pipelines except the
+`SessionClock`, which stamps every frame on arrival with the seconds
+elapsed since the session started, so the widefield and pupil streams can
+be aligned afterwards with `align_frames`. A slow pupil writer therefore
+only ever backs up its own queue, never the widefield camera's.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ._metadata import FrameMetadataRecorder
+from ._storage import AsyncFrameWriter
+
+
+class SessionClock:
+    """Monotonic clock shared by all cameras of a session.
+
+    Times are ``time.perf_counter()`` seconds relative to `start`, which is
+    the same clock in every thread of the process.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+
+    def start(self) -> None:
+        """Set the session origin to now."""
+        self.t0 = time.perf_counter()
+
+    def now(self) -> float:
+        """Seconds since the session started."""
+        return time.perf_counter() - self.t0
+
+
+class CoreSource:
+    """Frames from a ``CMMCorePlus`` running an MDA sequence on its thread.
+
+    Parameters
+    ----------
+    core : pymmcore_plus.CMMCorePlus
+        A core dedicated to this camera.
+    sequence : useq.MDASequence
+        The sequence to run, e.g. ``MDASequence(time_plan={"interval": 0,
+        "loops": n})``.
+    """
+
+    def __init__(self, core, sequence):
+        self.core = core
+        self.sequence = sequence
+
+    def start(self, listener) -> threading.Thread:
+        return self.core.run_mda(self.sequence, output=listener)
+
+    def stop(self) -> None:
+        self.core.mda.cancel()
+
+
+class SyntheticSource:
+    """Frames from a `SyntheticWidefield` camera, on a thread of its own."""
+
+    def __init__(self, camera, n_frames: int, realtime: bool = True):
+        self.camera = camera
+        self.n_frames = n_frames
+        self.realtime = realtime
+        self._stop = threading.Event()
+
+    def start(self, listener) -> threading.Thread:
+        self._stop.clear()
+
+        def _run():
+            listener.sequenceStarted()
+            try:
+                for frame, meta in self.camera.frames(
+                    self.n_frames, self.realtime
+                ):
+                    if self._stop.is_set():
+                        break
+                    listener.frameReady(frame, None, meta)
+            finally:
+                listener.sequenceFinished()
+
+        thread = threading.Thread(
+            target=_run, name="mesofield-synthetic-source", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+class CameraPipeline:
+    """One camera's acquisition thread, queue, writer and metadata.
+
+    Parameters
+    ----------
+    name : str
+        Camera name, used for output file names.
+    source : CoreSource or SyntheticSource
+        Where frames come from.
+    sink : BigTiffSink or ZarrSink, optional
+        Where frames are written, through an `AsyncFrameWriter`.
+    metadata_path : str, optional
+        Where the frame metadata table is saved when the sequence ends.
+    listeners : sequence
+        Further MDA listeners (live view, telemetry, ...).
+    max_queue : int
+        Capacity of the writer queue, in frames.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        source,
+        sink=None,
+        metadata_path: Optional[str] = None,
+        listeners: Sequence[Any] = (),
+        max_queue: int = 256,
+    ):
+        self.name = name
+        self.source = source
+        self.writer = (
+            AsyncFrameWriter(sink, max_queue=max_queue) if sink else None
+        )
+        self.metadata = FrameMetadataRecorder(metadata_path)
+        self.listeners = list(listeners)
+        self.clock = SessionClock()
+        self.error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+        self._outputs: List[Any] = [self.metadata]
+        if self.writer is not None:
+            self._outputs.append(self.writer)
+        self._outputs.extend(self.listeners)
+
+    def start(self, clock: Optional[SessionClock] = None) -> None:
+        """Start acquiring, stamping frames with ``clock``."""
+        if clock is not None:
+            self.clock = clock
+        self._thread = self.source.start(self)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait for the acquisition to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self) -> None:
+        """Cancel the acquisition."""
+        self.source.stop()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def summary(self) -> Dict[str, Any]:
+        """Frame count, rate and outputs of this camera."""
+        times = self.metadata.table["host_time"]
+        duration = float(times[-1] - times[0]) if len(times) > 1 else 0.0
+        return {
+            "frames": len(times),
+            "fps": (len(times) - 1) / duration if duration else None,
+            "paths": self.writer.paths if self.writer else [],
+            "writer": self.writer.metrics if self.writer else None,
+            "error": repr(self.error) if self.error else None,
+        }
+
+    # pymmcore-plus MDA listener protocol, fed by the source
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        for output in self._outputs:
+            output.sequenceStarted(sequence, *args)
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        # stamp on arrival, before anything else can delay the frame
+        stamped = dict(meta or {})
+        stamped["host_time"] = self.clock.now()
+        stamped.setdefault("camera", self.name)
+        for output in self._outputs:
+            output.frameReady(image, event, stamped)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        for output in self._outputs:
+            try:
+                output.sequenceFinished(sequence)
+            except Exception as error:  # noqa: BLE001
+                # finish the other outputs; the error is reported in summary
+                self.error = self.error or error
+
+
+class MultiCameraSession:
+    """Run several `CameraPipeline` objects against one `SessionClock`.
+
+    Parameters
+    ----------
+    pipelines : sequence of CameraPipeline
+        One pipeline per camera; names must be unique.
+    """
+
+    def __init__(self, pipelines: Sequence[CameraPipeline]):
+        names = [pipeline.name for pipeline in pipelines]
+        if len(set(names)) != len(names):
+            raise ValueError(f"camera names must be unique: {names}")
+        self.pipelines = {pipeline.name: pipeline for pipeline in pipelines}
+        self.clock = SessionClock()
+
+    def start(self) -> None:
+        """Start every camera at (nearly) the same time."""
+        self.clock.start()
+        for pipeline in self.pipelines.values():
+            pipeline.start(self.clock)
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Wait for all cameras to finish; returns their summaries."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for pipeline in self.pipelines.values():
+            remaining = (
+                None
+                if deadline is None
+                else max(0, deadline - time.monotonic())
+            )
+            pipeline.join(remaining)
+        return self.summary()
+
+    def run(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """`start` and `wait`."""
+        self.start()
+        return self.wait(timeout)
+
+    def stop(self) -> None:
+        """Cancel every camera."""
+        for pipeline in self.pipelines.values():
+            pipeline.stop()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            name: pipeline.summary()
+            for name, pipeline in self.pipelines.items()
+        }
+
+    def save_metadata(self, directory: str) -> Dict[str, str]:
+        """Save each camera's metadata table as ``<name>_frames.npz``."""
+        return {
+            name: pipeline.metadata.save(
+                os.path.join(directory, f"{name}_frames.npz")
+            )
+            for name, pipeline in self.pipelines.items()
+        }
+
+
+def align_frames(reference: Any, other: Any) -> np.ndarray:
+    """For each ``reference`` timestamp, the index of the nearest ``other``.
+
+    Both arguments are increasing session times (e.g. the ``host_time``
+    column of two cameras' metadata tables).
+    """
+    reference = np.asarray(reference, dtype=float)
+    other = np.asarray(other, dtype=float)
+    if len(other) == 0:
+        raise ValueError("cannot align frames to an empty time series")
+    if len(other) == 1:
+        return np.zeros(len(reference), dtype=np.intp)
+    right = np.clip(np.searchsorted(other, reference), 1, len(other) - 1)
+    left = right - 1
+    closer_left = reference - other[left] <= other[right] - reference
+    return np.where(closer_left, left, right)
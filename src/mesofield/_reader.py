@@ -6,8 +6,12 @@ implement multiple readers or even other plugin contributions. see:
 https://napari.org/stable/plugins/guides.html?#readers
 """
 
+import os
+
 import numpy as np
 
+from ._sequence import TiffSequence, is_image_sequence
+
 
 def napari_get_reader(path):
     """A basic implementation of a Reader contribution.
@@ -29,6 +33,10 @@ def napari_get_reader(path):
         # so we are only going to look at the first file.
         path = path[0]
 
+    # folders of per-frame TIFFs written by ImageSequenceWriter
+    if is_image_sequence(path):
+        return sequence_reader_function
+
     # if we know we cannot read the file, we immediately return None.
     if not path.endswith(".npy"):
         return None
@@ -37,7 +45,7 @@ def napari_get_reader(path):
     return reader_function
 
 
-def reader_function(path):
+def reader_function(path, lazy=True):
     """Take a path or list of paths and return a list of LayerData tuples.
 
     Readers are expected to return data as a list of tuples, where each tuple
@@ -48,6 +56,11 @@ def reader_function(path):
     ----------
     path : str or list of str
         Path to file, or list of paths.
+    lazy : bool
+        If True (the default), every file is memory mapped and the list is
+        presented as one dask-backed stack, so only the slices napari
+        displays are read from disk. If False, the files are loaded and
+        stacked in memory.
 
     Returns
     -------
@@ -61,13 +74,186 @@ def reader_function(path):
     """
     # handle both a string and a list of strings
     paths = [path] if isinstance(path, str) else path
-    # load all files into array
-    arrays = [np.load(_path) for _path in paths]
-    # stack arrays into single array
-    data = np.squeeze(np.stack(arrays))
+    # memory map every file so nothing is read until napari asks for a slice
+    arrays = [np.load(_path, mmap_mode="r") for _path in paths]
+    data = np.squeeze(_stack(arrays, lazy=lazy))
 
     # optional kwargs for the corresponding viewer.add_* method
     add_kwargs = {}
 
     layer_type = "image"  # optional, default is "image"
     return [(data, add_kwargs, layer_type)]
+
+
+def _stack(arrays, lazy=True):
+    """Stack memory-mapped arrays into a single (virtual) array.
+
+    Parameters
+    ----------
+    arrays : list of np.memmap
+        Arrays opened with ``np.load(..., mmap_mode="r")``.
+    lazy : bool
+        Present the stack as a dask array with one chunk per 2D plane, so
+        only the planes napari displays are paged in.
+
+    Returns
+    -------
+    array-like
+        The single memmap if only one array was given, otherwise a dask array
+        (lazy) or an in-memory numpy array (eager).
+    """
+    if len(arrays) == 1 and lazy:
+        # a lone memmap is already lazy, just add the stack axis
+        return arrays[0][np.newaxis]
+    if not lazy:
+        return np.stack(arrays)
+
+    import dask.array as da
+
+    # one chunk per plane; ``name=False`` skips hashing the file contents
+    chunks = (1,) * (arrays[0].ndim - 2) + arrays[0].shape[-2:]
+    return da.stack(
+        [da.from_array(arr, chunks=chunks, name=False) for arr in arrays]
+    )
+
+
+def sequence_reader_function(path, max_workers=None, readahead=8):
+    """Read folders of per-frame TIFFs as lazy, time-indexed stacks.
+
+    Parameters
+    ----------
+    path : str or list of str
+        Directory written by ``ImageSequenceWriter``, or a list of them. Each
+        directory becomes one image layer.
+    max_workers : int, optional
+        Number of threads decoding TIFF frames. Defaults to the number of
+        CPUs.
+    readahead : int
+        Number of frames decoded ahead of the current one while scrubbing.
+
+    Returns
+    -------
+    layer_data : list of tuples
+        One (data, add_kwargs, "image") tuple per directory, where data is a
+        ``TiffSequence`` that decodes frames only when napari requests them.
+    """
+    paths = [path] if isinstance(path, str) else path
+    layer_data = []
+    for _path in paths:
+        data = TiffSequence(
+            _path, max_workers=max_workers, readahead=readahead
+        )
+        # estimate contrast from the first frame instead of scanning the
+        # whole session
+        first = data[(0,) * (data.ndim - 2)]
+        add_kwargs = {
+            "name": os.path.basename(os.path.normpath(_path)),
+            "contrast_limits": _contrast_limits(first),
+        }
+        layer_data.append((data, add_kwargs, "image"))
+    return layer_data
+
+
+def napari_get_zarr_reader(path):
+    """Reader contribution for (OME-)Zarr stores.
+
+    Parameters
+    ----------
+    path : str or list of str
+        Path to a ``.zarr`` directory, or list of paths.
+
+    Returns
+    -------
+    function or None
+        ``zarr_reader_function`` if ``path`` is a Zarr group or array,
+        otherwise None.
+    """
+    if isinstance(path, list):
+        path = path[0]
+    if not os.path.isdir(path):
+        return None
+    if not any(
+        os.path.exists(os.path.join(path, name))
+        for name in (".zgroup", ".zarray", "zarr.json")
+    ):
+        return None
+    return zarr_reader_function
+
+
+def zarr_reader_function(path):
+    """Read OME-Zarr stores as lazy, multiscale image layers.
+
+    Every ``multiscales`` entry in the store (one per stage position for
+    stores written by ``OMEZarrWriter``) becomes one layer holding all of its
+    resolution levels, so napari can draw the coarse levels while zoomed out.
+    Stores without OME metadata are read as one layer per array.
+
+    Parameters
+    ----------
+    path : str or list of str
+        Path to a Zarr store, or list of paths.
+
+    Returns
+    -------
+    layer_data : list of tuples
+        (data, add_kwargs, "image") tuples where data is a list of dask
+        arrays (largest first) that only fetch the chunks napari displays.
+    """
+    import dask.array as da
+    import zarr
+
+    paths = [path] if isinstance(path, str) else path
+    layer_data = []
+    for _path in paths:
+        node = zarr.open(_path, mode="r")
+        name = os.path.splitext(os.path.basename(os.path.normpath(_path)))[0]
+        if isinstance(node, zarr.Array):
+            layer_data.append((da.from_zarr(node), {"name": name}, "image"))
+            continue
+
+        attrs = node.attrs.asdict()
+        multiscales = attrs.get("ome", attrs).get("multiscales", [])
+        if not multiscales:
+            for key, arr in node.arrays():
+                add_kwargs = {"name": f"{name}/{key}"}
+                layer_data.append((da.from_zarr(arr), add_kwargs, "image"))
+            continue
+
+        for image in multiscales:
+            datasets = image["datasets"]
+            levels = [da.from_zarr(node[ds["path"]]) for ds in datasets]
+            add_kwargs = {
+                "name": image.get("name") or datasets[0]["path"],
+                "multiscale": len(levels) > 1,
+            }
+            scale = _ome_scale(image, datasets[0])
+            axes = [
+                ax["name"] if isinstance(ax, dict) else ax
+                for ax in image.get("axes", [])
+            ]
+            if "c" in axes and levels[0].shape[axes.index("c")] > 1:
+                add_kwargs["channel_axis"] = axes.index("c")
+                if scale is not None:
+                    del scale[axes.index("c")]
+            if scale is not None:
+                add_kwargs["scale"] = scale
+            data = levels if len(levels) > 1 else levels[0]
+            layer_data.append((data, add_kwargs, "image"))
+    return layer_data
+
+
+def _ome_scale(image, dataset):
+    """Physical pixel size of the full resolution level, if recorded."""
+    transforms = list(image.get("coordinateTransformations", []))
+    transforms += dataset.get("coordinateTransformations", [])
+    scale = None
+    for tform in transforms:
+        if tform.get("type") == "scale":
+            values = np.asarray(tform["scale"], dtype=float)
+            scale = values if scale is None else scale * values
+    return None if scale is None else list(scale)
+
+
+def _contrast_limits(frame):
+    lo, hi = float(frame.min()), float(frame.max())
+    return [lo, hi if hi > lo else lo + 1]
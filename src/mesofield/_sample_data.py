@@ -1,23 +1,26 @@
 """
-This module is an example of a barebones sample data provider for napari.
+Sample data for napari: a short synthetic widefield recording.
 
-It implements the "sample data" specification.
 see: https://napari.org/stable/plugins/guides.html?#sample-data
-
-Replace code below according to your needs.
 """
 
 from __future__ import annotations
 
-import numpy
+from ._synthetic import BLUE, VIOLET, SyntheticWidefield
+
 
+def make_sample_data(n_frames: int = 200, shape=(256, 256), seed: int = 0):
+    """Generate a GCaMP-like recording, split by excitation channel.
 
-def make_sample_data():
-    """Generates an image"""
-    # Return list of tuples
-    # [(data1, add_image_kwargs1), (data2, add_image_kwargs2)]
-    # Check the documentation for more information about the
-    # add_image_kwargs
-    # https://napari.org/stable/api/napari.Viewer.html#napari.Viewer.add_image    
-    for i in range(20): return [(numpy.random.rand(512, 512), {})] 
-        
+    Frames alternate between blue (calcium dependent) and violet
+    (isosbestic) excitation; each channel is returned as its own layer.
+    """
+    camera = SyntheticWidefield(shape=shape, fps=50.0, seed=seed)
+    stack, metadata = camera.read(n_frames)
+    channels = [meta["channel"] for meta in metadata]
+    blue = stack[[c == BLUE for c in channels]]
+    violet = stack[[c == VIOLET for c in channels]]
+    return [
+        (blue, {"name": "GCaMP (blue)", "colormap": "green"}),
+        (violet, {"name": "isosbestic (violet)", "colormap": "magenta"}),
+    ]
@@ -0,0 +1,257 @@
+"""
+Lazy access to folders of per-frame TIFF files.
+
+``pymmcore_plus.mda.handlers.ImageSequenceWriter`` stores every frame of a
+session as its own file, named from a template such as
+``00042_t0042_c00.tif``. This module turns such a folder into a single
+array-like object that napari can slice: filenames are parsed into grid
+indices, frames are decoded on a thread pool, and the frames following the
+last requested one are decoded ahead of time so scrubbing stays smooth.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+TIFF_EXTENSIONS = (".tif", ".tiff")
+# ``_t0042`` / ``_c01`` style index tokens written by ImageSequenceWriter
+_AXIS_TOKEN = re.compile(r"_([a-z])(\d+)")
+_DIGITS = re.compile(r"\d+")
+
+
+def list_tiffs(directory: str) -> List[str]:
+    """Return the sorted TIFF filenames directly inside ``directory``."""
+    return sorted(
+        name
+        for name in os.listdir(directory)
+        if name.lower().endswith(TIFF_EXTENSIONS) and not name.startswith(".")
+    )
+
+
+def is_image_sequence(path: str) -> bool:
+    """Whether ``path`` is a directory containing per-frame TIFF files."""
+    try:
+        return os.path.isdir(path) and bool(list_tiffs(path))
+    except OSError:
+        return False
+
+
+def parse_sequence(
+    names: List[str],
+) -> Tuple[Tuple[str, ...], Dict[Tuple[int, ...], str]]:
+    """Map each filename onto its position in the acquisition grid.
+
+    Parameters
+    ----------
+    names : list of str
+        TIFF filenames from a single folder.
+
+    Returns
+    -------
+    axes : tuple of str
+        The axis letters found in the filenames, e.g. ``("t", "c")``. If the
+        names carry no axis tokens, a single ``"t"`` axis is used and files
+        are ordered by the numbers in their names.
+    index : dict
+        Mapping of grid index tuples to filenames.
+    """
+    tokens = [_AXIS_TOKEN.findall(os.path.splitext(n)[0]) for n in names]
+    axes = tuple(ax for ax, _ in tokens[0])
+    if axes and all(tuple(ax for ax, _ in tok) == axes for tok in tokens):
+        index = {
+            tuple(int(i) for _, i in tok): name
+            for tok, name in zip(tokens, names)
+        }
+    else:
+        # no consistent template, fall back to natural sort order
+        ordered = sorted(
+            names, key=lambda n: [int(d) for d in _DIGITS.findall(n)]
+        )
+        axes = ("t",)
+        index = {(i,): name for i, name in enumerate(ordered)}
+    return axes, index
+
+
+class TiffSequence:
+    """A read-only, lazily decoded stack of per-frame TIFF files.
+
+    Parameters
+    ----------
+    directory : str
+        Folder written by ``ImageSequenceWriter``.
+    max_workers : int, optional
+        Size of the decoding thread pool. Defaults to the number of CPUs.
+    readahead : int
+        Number of frames along the first axis that are decoded in the
+        background after each request, in the direction of travel.
+    cache_bytes : int
+        Upper bound on the memory used by decoded frames.
+
+    Notes
+    -----
+    The object implements the parts of the array protocol napari uses
+    (``shape``, ``dtype``, ``ndim`` and ``__getitem__``). Grid positions with
+    no file on disk (e.g. an aborted acquisition) read as zeros.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_workers: Optional[int] = None,
+        readahead: int = 8,
+        cache_bytes: int = 256 * 2**20,
+    ):
+        import tifffile
+
+        self._imread = tifffile.imread
+        self.directory = directory
+        axes, index = parse_sequence(list_tiffs(directory))
+        grid = tuple(max(i[k] for i in index) + 1 for k in range(len(axes)))
+        # drop singleton axes (a lone channel, say) but keep the first one
+        keep = [k for k, n in enumerate(grid) if n > 1 or k == 0]
+        self.axes = tuple(axes[k] for k in keep)
+        self._files = np.full(tuple(grid[k] for k in keep), None, object)
+        for idx, name in index.items():
+            self._files[tuple(idx[k] for k in keep)] = os.path.join(
+                directory, name
+            )
+
+        first_path = next(p for p in self._files.flat if p is not None)
+        first = self._imread(first_path)
+        self._frame_shape = first.shape
+        self.dtype = first.dtype
+        self.shape = self._files.shape + first.shape
+        self.ndim = len(self.shape)
+        self.size = int(np.prod(self.shape))
+
+        self.readahead = readahead
+        self._max_cached = max(1, cache_bytes // max(first.nbytes, 1))
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._cache[first_path] = first
+        self._pending: Dict[str, object] = {}
+        # re-entrant: done-callbacks may run in the thread that holds it
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mesofield-tiff"
+        )
+        self._last = 0
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __repr__(self) -> str:
+        return (
+            f"<TiffSequence {self.directory!r} shape={self.shape} "
+            f"dtype={self.dtype} axes={''.join(self.axes)}>"
+        )
+
+    def __array__(self, dtype=None, copy=None):
+        out = self[...]
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def __getitem__(self, key) -> np.ndarray:
+        key = _expand_key(key, self.ndim)
+        grid_key = key[: self._files.ndim]
+        frame_key = key[self._files.ndim :]
+
+        paths = np.asarray(self._files[grid_key], dtype=object)
+        frames = self._fetch(list(paths.flat))
+        out = np.empty(paths.shape + self._frame_shape, dtype=self.dtype)
+        flat = out.reshape((-1,) + self._frame_shape)
+        for i, frame in enumerate(frames):
+            flat[i] = frame
+        self._schedule_readahead(grid_key[0])
+        return out[(Ellipsis,) + tuple(frame_key)]
+
+    def close(self) -> None:
+        """Stop the decoding threads and drop cached frames."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._cache.clear()
+            self._pending.clear()
+
+    def _submit(self, path: str):
+        """Return a future for ``path``; the lock must be held."""
+        future = self._pending.get(path)
+        if future is None:
+            future = self._pool.submit(self._imread, path)
+            self._pending[path] = future
+        return future
+
+    def _fetch(self, paths: List[Optional[str]]) -> List[np.ndarray]:
+        frames: List[Optional[np.ndarray]] = [None] * len(paths)
+        futures = {}
+        with self._lock:
+            for i, path in enumerate(paths):
+                if path is None:
+                    frames[i] = np.zeros(self._frame_shape, self.dtype)
+                elif path in self._cache:
+                    self._cache.move_to_end(path)
+                    frames[i] = self._cache[path]
+                else:
+                    futures[i] = self._submit(path)
+        for i, future in futures.items():
+            frames[i] = future.result()
+        with self._lock:
+            for i in futures:
+                self._store(paths[i], frames[i])
+        return frames
+
+    def _store(self, path: str, frame: np.ndarray) -> None:
+        """Move a decoded frame into the LRU cache; the lock must be held."""
+        self._pending.pop(path, None)
+        self._cache[path] = frame
+        self._cache.move_to_end(path)
+        while len(self._cache) > self._max_cached:
+            self._cache.popitem(last=False)
+
+    def _schedule_readahead(self, first_key) -> None:
+        if not self.readahead or not isinstance(first_key, (int, np.integer)):
+            return
+        first_key = int(first_key) % len(self)
+        step = -1 if first_key < self._last else 1
+        self._last = first_key
+        ahead = range(
+            self._last + step,
+            self._last + step * (self.readahead + 1),
+            step,
+        )
+        with self._lock:
+            for i in ahead:
+                if not 0 <= i < len(self):
+                    break
+                for path in self._files[i].flat:
+                    if path is None or path in self._cache:
+                        continue
+                    if path not in self._pending:
+                        future = self._submit(path)
+                        future.add_done_callback(
+                            lambda f, p=path: self._on_readahead(p, f)
+                        )
+
+    def _on_readahead(self, path: str, future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                self._pending.pop(path, None)
+            return
+        with self._lock:
+            if self._pending.get(path) is future:
+                self._store(path, future.result())
+
+
+def _expand_key(key, ndim: int) -> tuple:
+    """Turn an indexing key into a tuple with one entry per dimension."""
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(k is Ellipsis for k in key):
+        i = next(i for i, k in enumerate(key) if k is Ellipsis)
+        fill = (slice(None),) * (ndim - len(key) + 1)
+        key = key[:i] + fill + key[i + 1 :]
+    return tuple(key) + (slice(None),) * (ndim - len(key))
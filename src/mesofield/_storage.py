@@ -0,0 +1,405 @@
+"""
+Asynchronous, bounded frame writing for acquisitions.
+
+`AsyncFrameWriter` takes frames from the acquisition thread (or the
+pymmcore-plus ``frameReady`` signal) into a bounded `FrameRingBuffer` and
+writes them in batches from a dedicated thread. When the disk falls behind
+and the queue fills up, producers wait (backpressure) instead of memory
+growing without bound; the time spent waiting and the queue depth are
+reported in `AsyncFrameWriter.metrics`.
+
+Frames go to a single container per session instead of one file per
+frame: a multi-page BigTIFF (`BigTiffSink`) or a chunked Zarr array
+(`ZarrSink`), both preallocated from the expected number of frames.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ._buffer import BLOCK, BufferClosed, FrameRingBuffer
+from ._zarr import blosc, create_array, open_group
+
+logger = logging.getLogger(__name__)
+
+# target size of each compressed chunk written by ZarrSink
+CHUNK_BYTES = 8 * 2**20
+
+
+class BigTiffSink:
+    """Append frames as the pages of a single BigTIFF file.
+
+    Parameters
+    ----------
+    path : str
+        Output file; ``.tif`` is appended if it has no TIFF extension.
+    num_frames : int, optional
+        Expected number of frames. The file is then preallocated and
+        memory-mapped, so writing a frame is a copy into the page cache.
+        Frames beyond ``num_frames`` are discarded (and counted). Without
+        it, pages are appended to a growing file.
+    """
+
+    def __init__(self, path: str, num_frames: Optional[int] = None):
+        if not path.lower().endswith((".tif", ".tiff")):
+            path += ".tif"
+        self.path = path
+        self.num_frames = num_frames
+        self.frames_written = 0
+        self.frames_discarded = 0
+        self._memmap: Optional[np.ndarray] = None
+        self._writer = None
+
+    def open(self, frame_shape: Tuple[int, ...], dtype: Any) -> None:
+        """Create the file for frames of ``frame_shape`` and ``dtype``."""
+        import tifffile
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.num_frames:
+            self._memmap = tifffile.memmap(
+                self.path,
+                shape=(self.num_frames,) + tuple(frame_shape),
+                dtype=dtype,
+                bigtiff=True,
+                photometric="minisblack",
+            )
+        else:
+            self._writer = tifffile.TiffWriter(self.path, bigtiff=True)
+
+    def write(self, frames: np.ndarray, metadata: List[Any]) -> None:
+        """Append a (n, y, x) batch of frames."""
+        if self._memmap is not None:
+            n = min(len(frames), len(self._memmap) - self.frames_written)
+            self._memmap[self.frames_written : self.frames_written + n] = (
+                frames[:n]
+            )
+            self.frames_discarded += len(frames) - n
+        else:
+            n = len(frames)
+            for frame in frames:
+                self._writer.write(
+                    frame, contiguous=True, photometric="minisblack"
+                )
+        self.frames_written += n
+
+    def close(self) -> List[str]:
+        """Flush and close the file; returns the paths written."""
+        if self._memmap is not None:
+            self._memmap.flush()
+            self._memmap = None
+            if self.frames_written < self.num_frames:
+                logger.warning(
+                    "%s: only %d of %d preallocated frames were written",
+                    self.path,
+                    self.frames_written,
+                    self.num_frames,
+                )
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.frames_discarded:
+            logger.warning(
+                "%s: discarded %d frames beyond num_frames",
+                self.path,
+                self.frames_discarded,
+            )
+        return [self.path]
+
+
+class ZarrSink:
+    """Append frames to a chunked, compressed OME-Zarr array.
+
+    Frames are staged until a whole chunk is filled, so every chunk is
+    compressed and written exactly once.
+
+    Parameters
+    ----------
+    path : str
+        Output group; ``.ome.zarr`` is appended if it has no ``.zarr``
+        extension. The frames are stored in its ``0`` array.
+    num_frames : int, optional
+        Expected number of frames, used to preallocate the array. The array
+        grows past it if needed and is trimmed to the frames written on
+        close.
+    chunk_frames : int, optional
+        Frames per chunk; by default chunks hold about 8 MB.
+    clevel : int
+        Blosc/zstd compression level, 0 to store chunks uncompressed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_frames: Optional[int] = None,
+        chunk_frames: Optional[int] = None,
+        clevel: int = 3,
+    ):
+        if not path.endswith(".zarr"):
+            path += ".ome.zarr"
+        self.path = path
+        self.num_frames = num_frames
+        self.chunk_frames = chunk_frames
+        self.clevel = clevel
+        self.frames_written = 0
+        self._array = None
+        self._staging: Optional[np.ndarray] = None
+        self._staged = 0
+
+    def open(self, frame_shape: Tuple[int, ...], dtype: Any) -> None:
+        """Create the array for frames of ``frame_shape`` and ``dtype``."""
+        frame_shape = tuple(frame_shape)
+        dtype = np.dtype(dtype)
+        if self.chunk_frames is None:
+            frame_bytes = int(np.prod(frame_shape)) * dtype.itemsize
+            self.chunk_frames = max(1, CHUNK_BYTES // max(frame_bytes, 1))
+        length = self.num_frames or self.chunk_frames
+        root = open_group(self.path, mode="w")
+        self._array = create_array(
+            root,
+            "0",
+            (length,) + frame_shape,
+            (self.chunk_frames,) + frame_shape,
+            dtype,
+            blosc(self.clevel) if self.clevel else None,
+        )
+        axes = [{"name": "t", "type": "time"}] + [
+            {"name": name, "type": "space"}
+            for name in ("z", "y", "x")[-len(frame_shape) :]
+        ]
+        root.attrs["multiscales"] = [
+            {
+                "version": "0.4",
+                "name": os.path.basename(self.path),
+                "axes": axes,
+                "datasets": [{"path": "0"}],
+            }
+        ]
+        self._staging = np.empty(
+            (self.chunk_frames,) + frame_shape, dtype=dtype
+        )
+
+    def write(self, frames: np.ndarray, metadata: List[Any]) -> None:
+        """Append a (n, ...) batch of frames."""
+        while len(frames):
+            n = min(len(frames), self.chunk_frames - self._staged)
+            self._staging[self._staged : self._staged + n] = frames[:n]
+            self._staged += n
+            frames = frames[n:]
+            if self._staged == self.chunk_frames:
+                self._flush()
+
+    def close(self) -> List[str]:
+        """Write the last partial chunk and trim the array."""
+        if self._array is not None:
+            self._flush()
+            if self._array.shape[0] != self.frames_written:
+                self._array.resize(
+                    (self.frames_written,) + self._array.shape[1:]
+                )
+            self._array = None
+        return [self.path]
+
+    def _flush(self) -> None:
+        if not self._staged:
+            return
+        start = self.frames_written
+        stop = start + self._staged
+        if stop > self._array.shape[0]:
+            length = max(stop, 2 * self._array.shape[0])
+            self._array.resize((length,) + self._array.shape[1:])
+        self._array[start:stop] = self._staging[: self._staged]
+        self.frames_written = stop
+        self._staged = 0
+
+
+class AsyncFrameWriter:
+    """Write frames to a sink from a dedicated thread through a bounded queue.
+
+    Parameters
+    ----------
+    sink : BigTiffSink or ZarrSink
+        Where the frames go. Any object with ``open(frame_shape, dtype)``,
+        ``write(frames, metadata)`` and ``close()`` methods works.
+    max_queue : int
+        Number of frames the queue holds before producers are blocked.
+    batch_frames : int
+        Largest number of frames handed to the sink at once.
+    put_timeout : float, optional
+        Longest a producer waits for space in a full queue before the frame
+        is dropped; None waits indefinitely.
+    telemetry : AcquisitionTelemetry, optional
+        Receives the time each frame spent queued (``"queue"`` stage), the
+        duration of each batch write (``"write"`` stage) and, on close,
+        the writer metrics.
+
+    Notes
+    -----
+    The ``sequenceStarted``, ``frameReady`` and ``sequenceFinished`` methods
+    match the pymmcore-plus MDA listener protocol, so the writer can be used
+    with ``mda_listeners_connected`` in place of ``ImageSequenceWriter``.
+    """
+
+    def __init__(
+        self,
+        sink,
+        max_queue: int = 256,
+        batch_frames: int = 32,
+        put_timeout: Optional[float] = None,
+        telemetry=None,
+    ):
+        self.sink = sink
+        self.telemetry = telemetry
+        self.batch_frames = batch_frames
+        self._queue = FrameRingBuffer(
+            max_queue, overflow=BLOCK, block_timeout=put_timeout
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._started = 0.0
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.paths: List[str] = []
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, throughput and backpressure counters."""
+        elapsed = time.perf_counter() - self._started if self._started else 0
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self._queue.high_water,
+            "queue_capacity": self._queue.capacity,
+            "frames_queued": self._queue.pushed,
+            "frames_written": self.frames_written,
+            "frames_dropped": self._queue.dropped,
+            "bytes_written": self.bytes_written,
+            "write_seconds": self.write_seconds,
+            "blocked_seconds": self.blocked_seconds,
+            "mb_per_s": (
+                self.bytes_written / 2**20 / elapsed if elapsed else None
+            ),
+            # compression ratio and throughput, for sinks that report them
+            "compression": getattr(self.sink, "stats", None),
+        }
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self._thread is not None:
+            raise RuntimeError("writer already started")
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="mesofield-writer", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, frame: Any, meta: Any = None) -> bool:
+        """Queue a frame, waiting while the queue is full.
+
+        Returns False if the frame was dropped, either after ``put_timeout``
+        or because the writer stopped on an error.
+        """
+        if self._thread is None:
+            self.start()
+        start = time.perf_counter()
+        try:
+            queued = self._queue.push(frame, (start, meta))
+        except BufferClosed:
+            return False
+        finally:
+            self.blocked_seconds += time.perf_counter() - start
+        return queued
+
+    def close(self, timeout: Optional[float] = None) -> List[str]:
+        """Write the remaining frames, close the sink and stop the thread.
+
+        Returns
+        -------
+        list of str
+            The paths written by the sink.
+
+        Raises
+        ------
+        Exception
+            Whatever stopped the writer thread, if it failed.
+        """
+        self._queue.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._error is not None:
+            raise self._error
+        metrics = self.metrics
+        if self.telemetry is not None:
+            self.telemetry.update_counters({"writer": metrics})
+        logger.info(
+            "wrote %d frames (%d dropped) at %.1f MB/s, "
+            "max queue depth %d/%d, producers blocked %.2f s",
+            metrics["frames_written"],
+            metrics["frames_dropped"],
+            metrics["mb_per_s"] or 0,
+            metrics["max_queue_depth"],
+            metrics["queue_capacity"],
+            metrics["blocked_seconds"],
+        )
+        compression = metrics["compression"]
+        if compression and compression["ratio"]:
+            logger.info(
+                "compressed %.2fx at %.1f MB/s, chunks per level %s",
+                compression["ratio"],
+                compression["mb_per_s"] or 0,
+                compression["levels"],
+            )
+        return self.paths
+
+    def __enter__(self) -> AsyncFrameWriter:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        if self._thread is None:
+            self.start()
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        self.put(image, meta)
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        opened = False
+        watch_queue = getattr(self.sink, "watch_queue", None)
+        if watch_queue is not None:
+            # let adaptive sinks react to the queue backing up
+            watch_queue(lambda: len(self._queue) / self._queue.capacity)
+        try:
+            for frames, queued in self._queue.batches(self.batch_frames):
+                if not opened:
+                    self.sink.open(frames.shape[1:], frames.dtype)
+                    opened = True
+                start = time.perf_counter()
+                enqueued, metadata = zip(*queued)
+                self.sink.write(frames, list(metadata))
+                elapsed = time.perf_counter() - start
+                self.write_seconds += elapsed
+                if self.telemetry is not None:
+                    self.telemetry.record("queue", start - np.array(enqueued))
+                    self.telemetry.record("write", elapsed)
+                self.frames_written += len(frames)
+                self.bytes_written += frames.nbytes
+        except BaseException as error:  # noqa: BLE001
+            self._error = error
+            self._queue.close()
+        finally:
+            if opened:
+                self.paths = self.sink.close()
@@ -0,0 +1,233 @@
+"""
+A synthetic widefield camera for testing and benchmarking without hardware.
+
+`SyntheticWidefield` produces GCaMP-like cortical time series: a vignetted,
+vascularized baseline, a handful of cortical regions with calcium transients
+(fast rise, slow decay), a hemodynamic component shared by both excitation
+wavelengths, and shot/read noise. Frames alternate between blue (calcium
+dependent) and violet (isosbestic) excitation, as the Arduino-Switch
+sequence does on the rig.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+BLUE = "blue"
+VIOLET = "violet"
+
+
+class SyntheticWidefield:
+    """Stream of synthetic widefield frames.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Frame shape (height, width).
+    dtype : dtype-like
+        Output dtype. Integer frames are clipped to the dtype range, float
+        frames are scaled to roughly 0-1.
+    fps : float
+        Frame rate; sets the kinetics of the signals and, when streaming in
+        real time, the pacing of the frames.
+    channels : sequence of str
+        Excitation pattern, repeated frame by frame.
+    n_regions : int
+        Number of independently active cortical regions.
+    dff : float
+        Peak ΔF/F of a single calcium transient.
+    event_rate : float
+        Mean number of transients per region per second.
+    exposure_ms : float
+        Exposure reported in the frame metadata.
+    seed : int, optional
+        Seed for reproducible output.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, int] = (512, 512),
+        dtype="uint16",
+        fps: float = 50.0,
+        channels: Sequence[str] = (BLUE, VIOLET),
+        n_regions: int = 12,
+        dff: float = 0.08,
+        event_rate: float = 0.5,
+        exposure_ms: float = 18.0,
+        seed: Optional[int] = None,
+    ):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.fps = float(fps)
+        self.channels = tuple(channels)
+        self.dff = dff
+        self.event_rate = event_rate
+        self.exposure_ms = exposure_ms
+        self._rng = np.random.default_rng(seed)
+
+        if self.dtype.kind in "ui":
+            info = np.iinfo(self.dtype)
+            self._gain = min(1.0, info.max / 65535) * 4.0
+            self._offset = 100.0 * self._gain / 4.0
+            self._limits = (info.min, info.max)
+        else:
+            self._gain, self._offset, self._limits = 1 / 16384, 0.0, None
+        self._baseline = self._make_baseline() * 4000.0
+        self._footprints = self._make_footprints(n_regions)
+
+        dt = 1.0 / self.fps
+        # GCaMP8-like kinetics: ~10 ms rise, ~300 ms decay
+        self._rise = np.exp(-dt / 0.01)
+        self._decay = np.exp(-dt / 0.3)
+        self._calcium = np.zeros((2, n_regions))
+        self._phase = self._rng.uniform(0, 2 * np.pi, 2)
+        self.frame_index = 0
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def channel(self, index: int) -> str:
+        """Excitation channel of frame ``index``."""
+        return self.channels[index % len(self.channels)]
+
+    def next_frame(self) -> Tuple[np.ndarray, Dict]:
+        """Generate the next frame and its metadata."""
+        index = self.frame_index
+        channel = self.channel(index)
+        t = index / self.fps
+
+        # calcium: spikes through a difference of exponentials
+        spikes = self._rng.poisson(
+            self.event_rate / self.fps, self._calcium.shape[1]
+        )
+        self._calcium[0] = self._calcium[0] * self._rise + spikes
+        self._calcium[1] = self._calcium[1] * self._decay + spikes
+        activity = (self._calcium[1] - self._calcium[0]) * self.dff
+
+        # hemodynamics: slow vasomotion plus heartbeat, seen by both channels
+        hemo = 0.01 * np.sin(2 * np.pi * 0.1 * t + self._phase[0])
+        hemo += 0.003 * np.sin(2 * np.pi * 10.0 * t + self._phase[1])
+
+        if channel == VIOLET:
+            signal = self._baseline * (0.6 * (1 - hemo))
+        else:
+            response = activity @ self._footprints
+            signal = self._baseline * ((1 - hemo) * (1 + response))
+        signal = signal.reshape(self.shape)
+        # shot noise (Gaussian approximation) plus read noise
+        noise = self._rng.standard_normal(self.shape, dtype=np.float32)
+        signal = signal + noise * np.sqrt(signal + 4.0)
+        frame = self._to_dtype(signal)
+
+        self.frame_index += 1
+        meta = {
+            "frame_index": index,
+            "channel": channel,
+            "exposure_ms": self.exposure_ms,
+            "camera_time_ms": t * 1000.0,
+            "host_time": time.perf_counter(),
+        }
+        return frame, meta
+
+    def frames(
+        self, n_frames: Optional[int] = None, realtime: bool = False
+    ) -> Iterator[Tuple[np.ndarray, Dict]]:
+        """Yield ``(frame, metadata)`` pairs, like ``popNextImageAndMD``.
+
+        Parameters
+        ----------
+        n_frames : int, optional
+            Number of frames to produce; endless if None.
+        realtime : bool
+            Pace the frames at ``fps`` instead of producing them as fast as
+            possible.
+        """
+        start = time.perf_counter()
+        first = self.frame_index
+        while n_frames is None or self.frame_index - first < n_frames:
+            if realtime:
+                due = start + (self.frame_index - first) / self.fps
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield self.next_frame()
+
+    def read(self, n_frames: int) -> Tuple[np.ndarray, list]:
+        """Generate ``n_frames`` frames as one (t, y, x) array."""
+        out = np.empty((n_frames,) + self.shape, dtype=self.dtype)
+        metadata = []
+        for i, (frame, meta) in enumerate(self.frames(n_frames)):
+            out[i] = frame
+            metadata.append(meta)
+        return out, metadata
+
+    def start(
+        self,
+        callback: Callable[[np.ndarray, Dict], None],
+        n_frames: Optional[int] = None,
+        realtime: bool = True,
+    ) -> threading.Thread:
+        """Deliver frames to ``callback`` from a background thread.
+
+        This stands in for a camera driver thread emitting ``frameReady``.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("synthetic camera is already running")
+        self._stop.clear()
+
+        def _run():
+            for frame, meta in self.frames(n_frames, realtime):
+                if self._stop.is_set():
+                    break
+                callback(frame, meta)
+
+        self._thread = threading.Thread(
+            target=_run, name="mesofield-synthetic-camera", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop a stream started with `start`."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _to_dtype(self, signal: np.ndarray) -> np.ndarray:
+        signal = signal * self._gain + self._offset
+        if self._limits is None:
+            return signal.astype(self.dtype)
+        np.rint(signal, out=signal)
+        np.clip(signal, *self._limits, out=signal)
+        return signal.astype(self.dtype)
+
+    def _make_baseline(self) -> np.ndarray:
+        """Vignetted illumination with dark blood vessels, flattened."""
+        h, w = self.shape
+        y, x = np.mgrid[-1 : 1 : h * 1j, -1 : 1 : w * 1j]
+        field = np.exp(-(x**2 + y**2) / 1.2)
+        vessels = np.ones(self.shape, dtype=np.float32)
+        for _ in range(6):
+            # random smooth curves darkening a narrow band
+            a, b, c = self._rng.uniform(-1, 1, 3)
+            width = self._rng.uniform(0.005, 0.02)
+            distance = np.abs(y - (a * x**2 + b * x + c))
+            vessels *= 1 - 0.35 * np.exp(-((distance / width) ** 2))
+        return (field * vessels).astype(np.float32).ravel()
+
+    def _make_footprints(self, n_regions: int) -> np.ndarray:
+        """Gaussian cortical regions, shape (n_regions, height * width)."""
+        h, w = self.shape
+        y, x = np.mgrid[-1 : 1 : h * 1j, -1 : 1 : w * 1j]
+        centers = self._rng.uniform(-0.7, 0.7, (n_regions, 2))
+        sizes = self._rng.uniform(0.1, 0.3, n_regions)
+        footprints = np.empty((n_regions, h * w), dtype=np.float32)
+        for i, ((cy, cx), size) in enumerate(zip(centers, sizes)):
+            footprints[i] = np.exp(
+                -((y - cy) ** 2 + (x - cx) ** 2) / (2 * size**2)
+            ).ravel()
+        return footprints
@@ -0,0 +1,338 @@
+"""
+Acquisition telemetry: dropped frames, timing gaps and stage latencies.
+
+`AcquisitionTelemetry` listens to the frame stream next to the writer. It
+compares each frame's index and camera timestamp with the previous one to
+detect lost frames and timing gaps, tracks how late frames reach the host
+relative to the camera clock, and keeps log-binned latency histograms for
+the queue, write and display stages (filled in by `AsyncFrameWriter` and
+`LiveView` when they are given the telemetry object). `TelemetryWidget`
+shows the numbers live in a napari dock; `AcquisitionTelemetry.save`
+writes them next to the session data.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from magicgui.widgets import Container, Label
+
+from ._metadata import frame_values
+
+QUEUE = "queue"
+WRITE = "write"
+DISPLAY = "display"
+RECEIVE = "receive"
+INTERVAL = "interval"
+
+# at most this many gaps are listed individually
+MAX_GAPS = 1000
+
+
+class LatencyHistogram:
+    """Log-binned histogram of durations, in seconds.
+
+    Parameters
+    ----------
+    lo, hi : float
+        Range covered by the bins; values outside it are counted in the
+        first or last bin.
+    bins_per_decade : int
+        Resolution of the histogram; 20 bins per decade bounds the error of
+        the reported percentiles to about 12%.
+    """
+
+    def __init__(
+        self, lo: float = 1e-6, hi: float = 100.0, bins_per_decade: int = 20
+    ):
+        self.lo, self.hi = lo, hi
+        self.bins_per_decade = bins_per_decade
+        n = int(math.ceil(math.log10(hi / lo) * bins_per_decade))
+        self.edges = np.logspace(math.log10(lo), math.log10(hi), n + 1)
+        self.counts = np.zeros(n, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        """Count one duration."""
+        i = int(
+            math.log10(max(seconds, self.lo) / self.lo) * self.bins_per_decade
+        )
+        self.counts[min(i, len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def add_many(self, seconds: Any) -> None:
+        """Count an array of durations."""
+        seconds = np.asarray(seconds, dtype=float).ravel()
+        if not seconds.size:
+            return
+        i = np.log10(np.maximum(seconds, self.lo) / self.lo)
+        i = np.minimum(
+            (i * self.bins_per_decade).astype(int), len(self.counts) - 1
+        )
+        self.counts += np.bincount(i, minlength=len(self.counts))
+        self.count += seconds.size
+        self.total += float(seconds.sum())
+        self.max = max(self.max, float(seconds.max()))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def percentile(self, q: float) -> float:
+        """Approximate ``q``-th percentile (0-100), from the bin centers."""
+        if not self.count:
+            return math.nan
+        rank = q / 100 * self.count
+        i = int(np.searchsorted(np.cumsum(self.counts), max(rank, 1)))
+        i = min(i, len(self.counts) - 1)
+        center = math.sqrt(self.edges[i] * self.edges[i + 1])
+        return min(center, self.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary statistics plus the non-empty bins."""
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "count": self.count,
+            "mean_s": _finite(self.mean),
+            "p50_s": _finite(self.percentile(50)),
+            "p99_s": _finite(self.percentile(99)),
+            "max_s": self.max,
+            "bins": {
+                f"{self.edges[i]:.3g}": int(self.counts[i]) for i in nonzero
+            },
+        }
+
+
+class AcquisitionTelemetry:
+    """Per-session timing and loss statistics.
+
+    Parameters
+    ----------
+    fps : float, optional
+        Nominal frame rate. If omitted, the expected frame interval is the
+        median of the intervals seen so far.
+    gap_factor : float
+        A timing gap is reported when consecutive frames are more than
+        ``gap_factor`` expected intervals apart.
+
+    Notes
+    -----
+    The ``sequenceStarted``, ``frameReady`` and ``sequenceFinished`` methods
+    match the pymmcore-plus MDA listener protocol.
+    """
+
+    def __init__(self, fps: Optional[float] = None, gap_factor: float = 1.5):
+        self.fps = fps
+        self.gap_factor = gap_factor
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear all statistics, e.g. at the start of a sequence."""
+        with self._lock:
+            self.stages: Dict[str, LatencyHistogram] = {
+                name: LatencyHistogram()
+                for name in (RECEIVE, INTERVAL, QUEUE, WRITE, DISPLAY)
+            }
+            self.frames = 0
+            self.missing_frames = 0
+            self.timing_gaps = 0
+            self.gaps: List[Dict[str, Any]] = []
+            self.counters: Dict[str, Any] = {}
+            self._last_index: Optional[int] = None
+            self._last_camera: Optional[float] = None
+            self._offset = math.inf
+            self._started = time.perf_counter()
+            self._recent: List[float] = []
+
+    def frame_received(
+        self,
+        frame_index: Optional[int] = None,
+        camera_time_ms: Optional[float] = None,
+        host_time: Optional[float] = None,
+    ) -> None:
+        """Account for one frame arriving at the host.
+
+        Parameters
+        ----------
+        frame_index : int, optional
+            Frame counter reported with the frame; jumps in it count as
+            missing frames.
+        camera_time_ms : float, optional
+            Camera timestamp, used to detect timing gaps and to measure how
+            late frames reach the host (``"receive"`` stage).
+        host_time : float, optional
+            ``time.perf_counter()`` at arrival; defaults to now.
+        """
+        host_time = time.perf_counter() if host_time is None else host_time
+        with self._lock:
+            self.frames += 1
+            previous = self._last_index
+            if frame_index is not None:
+                frame_index = int(frame_index)
+                if previous is not None and frame_index > previous + 1:
+                    missing = frame_index - previous - 1
+                    self._gap("index", previous, missing)
+                    self.missing_frames += missing
+                self._last_index = frame_index
+            if camera_time_ms is None or math.isnan(camera_time_ms):
+                return
+            camera = camera_time_ms / 1000
+            # delivery delay relative to the earliest frame seen, which
+            # cancels the unknown offset between the two clocks
+            offset = host_time - camera
+            if offset < self._offset:
+                self._offset = offset
+            self.stages[RECEIVE].add(offset - self._offset)
+            if self._last_camera is not None:
+                interval = camera - self._last_camera
+                self.stages[INTERVAL].add(interval)
+                expected = self._expected_interval(interval)
+                if expected and interval > self.gap_factor * expected:
+                    self.timing_gaps += 1
+                    self._gap("timing", previous, interval)
+            self._last_camera = camera
+
+    def record(self, stage: str, seconds: Any) -> None:
+        """Add one duration (or an array of them) to a stage histogram."""
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            if np.ndim(seconds):
+                histogram.add_many(seconds)
+            else:
+                histogram.add(float(seconds))
+
+    def update_counters(self, counters: Dict[str, Any]) -> None:
+        """Store extra numbers (e.g. writer metrics) with the summary."""
+        with self._lock:
+            self.counters.update(counters)
+
+    def summary(self) -> Dict[str, Any]:
+        """All statistics as a JSON-serializable dict."""
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            return {
+                "frames": self.frames,
+                "missing_frames": self.missing_frames,
+                "timing_gaps": self.timing_gaps,
+                "elapsed_s": elapsed,
+                "fps": self.frames / elapsed if elapsed else None,
+                "nominal_fps": self.fps,
+                "gaps": list(self.gaps),
+                "stages": {
+                    name: histogram.to_dict()
+                    for name, histogram in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def save(self, path: str) -> str:
+        """Write `summary` to a JSON file; returns the path."""
+        if not path.endswith(".json"):
+            path += ".json"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2, default=str)
+        return path
+
+    # pymmcore-plus MDA listener protocol
+
+    def sequenceStarted(self, sequence: Any = None, *args) -> None:
+        self.reset()
+
+    def frameReady(self, image: Any, event: Any = None, meta: Any = None):
+        values = frame_values(meta, event)
+        self.frame_received(
+            _float(values["frame_index"]),
+            _float(values["camera_time_ms"]),
+        )
+
+    def sequenceFinished(self, sequence: Any = None) -> None:
+        pass
+
+    def _expected_interval(self, interval: float) -> Optional[float]:
+        """Nominal frame interval; the lock must be held."""
+        if self.fps:
+            return 1 / self.fps
+        self._recent.append(interval)
+        if len(self._recent) > 64:
+            del self._recent[:32]
+        return (
+            float(np.median(self._recent)) if len(self._recent) > 4 else None
+        )
+
+    def _gap(self, kind: str, after: Optional[int], size: float) -> None:
+        if len(self.gaps) < MAX_GAPS:
+            self.gaps.append({"kind": kind, "after": after, "size": size})
+
+
+class TelemetryWidget(Container):
+    """Dock widget showing live `AcquisitionTelemetry` numbers.
+
+    Parameters
+    ----------
+    telemetry : AcquisitionTelemetry
+        The statistics to show.
+    interval_ms : int
+        Refresh period.
+    """
+
+    def __init__(self, telemetry: AcquisitionTelemetry, interval_ms=500):
+        super().__init__()
+        from qtpy.QtCore import QTimer
+
+        self.telemetry = telemetry
+        self._frames = Label(label="Frames:")
+        self._lost = Label(label="Missing / gaps:")
+        self._stages = {
+            name: Label(label=f"{name.capitalize()}:")
+            for name in (RECEIVE, INTERVAL, QUEUE, WRITE, DISPLAY)
+        }
+        self.extend([self._frames, self._lost, *self._stages.values()])
+        self._timer = QTimer()
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start(interval_ms)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Update the labels from the current statistics."""
+        summary = self.telemetry.summary()
+        self._frames.value = (
+            f"{summary['frames']} ({summary['fps'] or 0:.1f} fps)"
+        )
+        self._lost.value = (
+            f"{summary['missing_frames']} / {summary['timing_gaps']}"
+        )
+        for name, label in self._stages.items():
+            stats = summary["stages"].get(name, {})
+            if not stats.get("count"):
+                label.value = "-"
+                continue
+            label.value = (
+                f"p50 {stats['p50_s'] * 1000:.1f} ms, "
+                f"p99 {stats['p99_s'] * 1000:.1f} ms, "
+                f"max {stats['max_s'] * 1000:.1f} ms"
+            )
+
+
+def _finite(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
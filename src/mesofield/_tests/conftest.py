@@ -0,0 +1,26 @@
+import pytest
+
+
+class RecordingListener:
+    """MDA listener that keeps everything a pipeline stage sends it."""
+
+    def __init__(self):
+        self.frames, self.events, self.meta = [], [], []
+        self.started = self.finished = False
+
+    def sequenceStarted(self, *args):
+        self.started = True
+
+    def frameReady(self, image, event=None, meta=None):
+        self.frames.append(image)
+        self.events.append(event)
+        self.meta.append(meta)
+
+    def sequenceFinished(self, *args):
+        self.finished = True
+
+
+@pytest.fixture
+def recording_listener():
+    """Factory of `RecordingListener` outputs for the stage under test."""
+    return RecordingListener
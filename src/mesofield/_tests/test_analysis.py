@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+import tifffile
+
+from mesofield._analysis import (
+    load_frames,
+    load_session,
+    map_chunks,
+    session_files,
+)
+from mesofield._metadata import FrameMetadataRecorder, frame_metadata_path
+from mesofield._storage import AsyncFrameWriter, ZarrSink
+
+
+def _square(chunk):
+    return chunk.astype(np.float32) ** 2
+
+
+def _every_other(chunk):
+    return chunk[::2]
+
+
+@pytest.fixture
+def session(tmp_path):
+    rng = np.random.default_rng(0)
+    stack = rng.integers(0, 4000, (30, 16, 12), dtype=np.uint16)
+    anat = tmp_path / "anat"
+    frames = anat / "sub-gs18_ses-3_20240101-120000"
+    frames.mkdir(parents=True)
+    # per-frame files, named so that a lexical sort would misorder them
+    for i, frame in enumerate(stack[:20]):
+        tifffile.imwrite(frames / f"img_t{i}_c0.tif", frame)
+    tifffile.imwrite(anat / "sub-gs18_ses-3_20240101-130000.tif", stack[20:])
+    tifffile.imwrite(anat / "sub-other_ses-3_20240101-130000.tif", stack)
+    return anat, stack
+
+
+def test_session_files(session):
+    anat, _ = session
+    acquisitions = session_files(str(anat), "gs18", "ses-3")
+    assert [len(paths) for paths in acquisitions] == [20, 1]
+    assert acquisitions[0][2].endswith("img_t2_c0.tif")
+
+
+def test_load_frames_in_order(session):
+    anat, stack = session
+    paths = [
+        p for acq in session_files(str(anat), "gs18", "ses-3") for p in acq
+    ]
+    data = load_frames(paths, max_workers=4, max_pending=2)
+    np.testing.assert_array_equal(data, stack)
+
+
+def test_load_session_to_memmap(session, tmp_path):
+    anat, stack = session
+    stacks, metadata = load_session(
+        str(anat), "gs18", "ses-3", out=str(tmp_path / "cache")
+    )
+    assert metadata == [None, None]
+    assert isinstance(stacks[0], np.memmap)
+    np.testing.assert_array_equal(stacks[0], stack[:20])
+    np.testing.assert_array_equal(stacks[1], stack[20:])
+    reloaded = np.load(
+        tmp_path / "cache" / "sub-gs18_ses-3_20240101-130000.npy"
+    )
+    np.testing.assert_array_equal(reloaded, stack[20:])
+
+
+def test_load_zarr_session_with_metadata(tmp_path):
+    # laid out as the acquisition prototype writes it
+    stack = np.arange(24 * 6 * 5, dtype=np.uint16).reshape(24, 6, 5)
+    stem = str(tmp_path / "sub-gs18_ses-3_20240101-120000")
+    recorder = FrameMetadataRecorder(frame_metadata_path(stem))
+    with AsyncFrameWriter(ZarrSink(stem, chunk_frames=8)) as writer:
+        for i, frame in enumerate(stack):
+            writer.put(frame)
+            recorder.record({"channel": "blue"}, frame_index=i)
+    recorder.save()
+    with AsyncFrameWriter(ZarrSink(stem + "_dff")) as writer:
+        writer.put(stack[0])
+
+    stacks, metadata = load_session(str(tmp_path), "gs18", "3")
+    assert len(stacks) == 1
+    np.testing.assert_array_equal(stacks[0], stack)
+    assert list(metadata[0]["frame_index"]) == list(range(24))
+
+    stacks, metadata = load_session(
+        str(tmp_path), "gs18", "ses-3", out=str(tmp_path / "cache")
+    )
+    np.testing.assert_array_equal(stacks[0], stack)
+    np.testing.assert_array_equal(
+        np.load(tmp_path / "cache" / "sub-gs18_ses-3_20240101-120000.npy"),
+        stack,
+    )
+    dff, _ = load_session(str(tmp_path), "gs18", "3", product="dff")
+    np.testing.assert_array_equal(dff[0], stack[:1])
+
+
+def test_load_frames_rejects_mismatched_files(tmp_path):
+    tifffile.imwrite(tmp_path / "a.tif", np.zeros((4, 4), np.uint16))
+    tifffile.imwrite(tmp_path / "b.tif", np.zeros((4, 5), np.uint16))
+    with pytest.raises(ValueError):
+        load_frames([str(tmp_path / "a.tif"), str(tmp_path / "b.tif")])
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_map_chunks(processes):
+    data = np.arange(100 * 4, dtype=np.uint16).reshape(100, 2, 2)
+    out = map_chunks(
+        _square, data, chunk_frames=7, processes=processes, max_workers=2
+    )
+    np.testing.assert_array_equal(out, data.astype(np.float32) ** 2)
+
+
+def test_map_chunks_into_out():
+    data = np.arange(40, dtype=np.int32).reshape(40, 1)
+    out = np.zeros((20, 1), np.int32)
+    result = map_chunks(
+        _every_other, data, out=out, chunk_frames=8, processes=False
+    )
+    assert result is out
+    np.testing.assert_array_equal(out, data[::2])
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from mesofield._binning import (
+    Binner,
+    bin_spatial,
+    bin_stack,
+    output_dtype,
+)
+from mesofield._hemo import pattern_from_states
+from mesofield._synthetic import SyntheticWidefield
+
+
+def test_spatial_binning_is_dtype_safe():
+    frame = np.full((5, 9), 65535, dtype=np.uint16)
+    mean = bin_spatial(frame, 2)
+    assert mean.shape == (2, 4)
+    assert mean.dtype == np.uint16
+    assert (mean == 65535).all()
+
+    total = bin_spatial(frame, 4, "sum")
+    assert total.dtype == np.uint32
+    assert (total == 16 * 65535).all()
+    assert output_dtype(np.int16, "sum", 4) == np.int32
+    assert output_dtype(np.float32, "sum", 4) == np.float32
+
+
+def test_mean_rounds_to_nearest():
+    frame = np.array([[1, 2], [2, 2]], dtype=np.uint8)
+    assert bin_spatial(frame, 2)[0, 0] == 2  # 1.75
+
+
+def test_bin_stack_matches_stream(recording_listener):
+    stack, metadata = SyntheticWidefield((16, 16), seed=0).read(12)
+    out = recording_listener()
+    binner = Binner(spatial=2, temporal=3, outputs=[out])
+    binner.sequenceStarted()
+    for frame, meta in zip(stack, metadata):
+        binner.frameReady(frame, None, meta)
+    binner.sequenceFinished()
+    # channels are binned separately: 6 blue and 6 violet frames each
+    assert len(out.frames) == 4
+    assert [m["channel"] for m in out.meta] == [
+        "blue",
+        "violet",
+        "blue",
+        "violet",
+    ]
+    assert out.meta[0]["frame_index"] == 0
+    expected = bin_stack(stack[0::2], spatial=2, temporal=3)
+    np.testing.assert_array_equal(out.frames[0], expected[0])
+    np.testing.assert_array_equal(out.frames[2], expected[1])
+    assert out.frames[0].shape == (8, 8)
+    assert binner.reduction == 12
+
+
+@pytest.mark.parametrize(
+    "states, temporal, expected",
+    [
+        (["4", "4", "2", "2"], 4, ("blue", "violet")),
+        (["4", "2"], 2, ("blue", "violet")),
+        (["4", "4", "2", "2"], 1, ("blue", "blue", "violet", "violet")),
+    ],
+)
+def test_hardware_sequence_keeps_channels_apart(
+    recording_listener, states, temporal, expected
+):
+    pattern = pattern_from_states(states)
+    # hardware sequencing: no frame carries a channel
+    stack = np.array(
+        [np.full((2, 2), 100 if c == "blue" else 10) for c in pattern * 4],
+        dtype=np.uint16,
+    )
+    out = recording_listener()
+    binner = Binner(temporal=temporal, outputs=[out], pattern=pattern)
+    binner.sequenceStarted()
+    for i, frame in enumerate(stack):
+        binner.frameReady(frame, None, {"frame_index": i})
+    binner.sequenceFinished()
+    assert binner.output_pattern == expected
+    # every binned frame is pure blue or pure violet, in output_pattern order
+    channels = ["blue" if f[0, 0] == 100 else "violet" for f in out.frames]
+    assert {int(f[0, 0]) for f in out.frames} == {100, 10}
+    assert channels == list(expected) * (len(channels) // len(expected))
+    assert [m["channel"] for m in out.meta] == channels
+
+
+def test_from_config():
+    binner = Binner.from_config(
+        {"spatial_binning": 4, "temporal_binning": 2, "binning_mode": "sum"}
+    )
+    assert (binner.spatial, binner.temporal, binner.mode) == (4, 2, "sum")
+    assert binner.output_frames(8000) == 4000
+    assert Binner.from_config({}).reduction == 1
+    with pytest.raises(ValueError):
+        Binner(mode="median")
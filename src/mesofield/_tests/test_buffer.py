@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+import pytest
+
+from mesofield._buffer import BufferClosed, FrameRingBuffer, feed_from_core
+from mesofield._synthetic import SyntheticWidefield
+
+
+def test_ring_buffer_batches():
+    buffer = FrameRingBuffer(8, (4, 4), "uint16")
+    for i in range(5):
+        assert buffer.push(np.full((4, 4), i), {"i": i})
+    frames, metadata = buffer.drain(3)
+    assert frames.shape == (3, 4, 4)
+    assert [m["i"] for m in metadata] == [0, 1, 2]
+    # wrap around the end of the buffer
+    for i in range(5, 11):
+        buffer.push(np.full((4, 4), i), {"i": i})
+    frames, metadata = buffer.drain()
+    assert list(frames[:, 0, 0]) == list(range(3, 11))
+    assert buffer.dropped == 0
+
+
+@pytest.mark.parametrize(
+    "overflow, expected",
+    [("drop_oldest", [2, 3, 4]), ("drop_newest", [0, 1, 2])],
+)
+def test_ring_buffer_overflow(overflow, expected):
+    buffer = FrameRingBuffer(3, overflow=overflow)
+    results = [buffer.push(np.full((2, 2), i, np.uint8)) for i in range(5)]
+    assert buffer.dropped == 2
+    assert results.count(False) == (2 if overflow == "drop_newest" else 0)
+    frames, _ = buffer.drain()
+    assert list(frames[:, 0, 0]) == expected
+
+
+def test_ring_buffer_block_and_close():
+    buffer = FrameRingBuffer(2, overflow="block", block_timeout=0.05)
+    buffer.push(np.zeros(3))
+    buffer.push(np.ones(3))
+    # nobody drains: the producer gives up after block_timeout
+    assert not buffer.push(np.ones(3))
+    assert buffer.dropped == 1
+    buffer.close()
+    with pytest.raises(BufferClosed):
+        buffer.push(np.zeros(3))
+    assert len(buffer.drain()[0]) == 2
+    assert len(buffer.drain(timeout=0)[0]) == 0
+
+
+def test_ring_buffer_new_sequence_new_shape():
+    buffer = FrameRingBuffer(4)
+    buffer.sequenceStarted()
+    buffer.frameReady(np.zeros((4, 4), np.uint16))
+    buffer.sequenceFinished()
+    # e.g. a new ROI: the next sequence brings its own frame shape
+    buffer.sequenceStarted()
+    buffer.frameReady(np.ones((2, 3), np.uint8))
+    frames, _ = buffer.drain()
+    assert frames.shape == (1, 2, 3) and frames.dtype == np.uint8
+
+
+def test_ring_buffer_threaded_consumer():
+    camera = SyntheticWidefield(shape=(16, 16), fps=2000.0)
+    buffer = FrameRingBuffer(64, overflow="block")
+    received = []
+
+    def _consume():
+        for _frames, metadata in buffer.batches(max_frames=16):
+            received.extend(meta["frame_index"] for meta in metadata)
+
+    consumer = threading.Thread(target=_consume)
+    consumer.start()
+    for frame, meta in camera.frames(200):
+        buffer.push(frame, meta)
+    buffer.close()
+    consumer.join(5)
+    assert received == list(range(200))
+    assert buffer.dropped == 0
+
+
+class _FakeCore:
+    def __init__(self, n):
+        self.frames = [(np.full((2, 2), i), {"i": i}) for i in range(n)]
+
+    def getRemainingImageCount(self):
+        return len(self.frames)
+
+    def isSequenceRunning(self):
+        return bool(self.frames)
+
+    def popNextImageAndMD(self):
+        return self.frames.pop(0)
+
+
+def test_feed_from_core():
+    buffer = FrameRingBuffer(10)
+    assert feed_from_core(_FakeCore(5), buffer) == 5
+    assert buffer.closed
+    assert [m["i"] for m in buffer.drain()[1]] == list(range(5))
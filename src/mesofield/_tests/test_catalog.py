@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+import tifffile
+
+from mesofield._catalog import (
+    SessionCatalog,
+    SessionCatalogWidget,
+    session_stem,
+)
+from mesofield._metadata import FrameMetadataRecorder
+from mesofield._storage import ZarrSink
+
+
+def _anat(root, protocol, subject, session):
+    anat = root / f"{protocol}-{subject}" / f"ses-{session}" / "anat"
+    anat.mkdir(parents=True)
+    return anat
+
+
+def _zarr(path, n_frames, shape=(8, 6)):
+    sink = ZarrSink(str(path))
+    sink.open(shape, np.uint16)
+    sink.write(np.ones((n_frames,) + shape, np.uint16), [None] * n_frames)
+    return sink.close()[0]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    anat = _anat(tmp_path, "camk2", "gs18", "3")
+    stem = anat / "sub-gs18_ses-3_20240101_120000"
+    _zarr(stem, 10)
+    _zarr(f"{stem}_dff", 10)
+    recorder = FrameMetadataRecorder(f"{stem}_frame_metadata.npz")
+    recorder.record(frame_index=0)
+    recorder.save()
+    sequence = anat / "sub-gs18_ses-3_20240101_130000"
+    sequence.mkdir()
+    for i in range(3):
+        tifffile.imwrite(sequence / f"img_t{i}.tif", np.zeros((4, 4), "u1"))
+    other = _anat(tmp_path, "camk2", "gs19", "1")
+    tifffile.imwrite(
+        other / "sub-gs19_ses-1_20240102_090000.tif",
+        np.zeros((5, 4, 4), np.uint16),
+    )
+    (other / "notes.txt").write_text("not a session")
+    return tmp_path, anat
+
+
+def test_scan_indexes_sessions(tree):
+    root, _ = tree
+    catalog = SessionCatalog(str(root))
+    records = catalog.scan()
+    assert len(records) == 4
+    raw = catalog.find(subject="gs18", product="raw")
+    assert [r["kind"] for r in raw] == ["zarr", "sequence"]
+    assert raw[0]["protocol"] == "camk2"
+    assert raw[0]["session"] == "3"
+    assert raw[0]["frames"] == 10
+    assert raw[0]["shape"] == [10, 8, 6]
+    assert raw[0]["dtype"] == "uint16"
+    assert raw[0]["size_bytes"] > 0
+    assert "frame_metadata" in raw[0]["files"]
+    assert raw[1]["frames"] == 3
+    assert catalog.find(product="dff")[0]["files"] == {}
+    (tiff,) = catalog.find(subject="gs19")
+    assert tiff["kind"] == "tiff" and tiff["frames"] == 5
+    assert os.path.exists(catalog.index_path)
+
+
+def test_rescan_only_touches_changed_directories(tree):
+    root, anat = tree
+    SessionCatalog(str(root)).scan()
+
+    catalog = SessionCatalog(str(root))
+    assert len(catalog.records) == 4  # loaded from the saved index
+    catalog.scan()
+    assert catalog.listed == 0 and catalog.read == 0
+
+    _zarr(anat / "sub-gs18_ses-3_20240103_100000", 4)
+    catalog.scan()
+    assert catalog.listed == 1 and catalog.read == 1
+    assert len(catalog.find(subject="gs18", product="raw")) == 3
+
+    # a session growing in place is re-read without relisting its folder
+    record = catalog.find(subject="gs18", product="dff")[0]
+    zarray = os.path.join(record["path"], "0", ".zarray")
+    os.utime(zarray, (record["mtime"] + 10, record["mtime"] + 10))
+    catalog.scan()
+    assert catalog.listed == 0 and catalog.read == 1
+
+
+def test_session_stem():
+    assert session_stem("sub-01_ses-01.ome.zarr") == "sub-01_ses-01"
+    assert session_stem("sub-01_pupil.tif") == "sub-01_pupil"
+    assert session_stem("notes.txt") == "notes.txt"
+
+
+def test_widget_lists_and_opens(tree, make_napari_viewer, qtbot):
+    root, anat = tree
+    viewer = make_napari_viewer()
+    widget = SessionCatalogWidget(viewer, str(root))
+    # the first scan runs in a worker thread
+    qtbot.waitUntil(lambda: len(widget._sessions.choices) == 4)
+    qtbot.waitUntil(lambda: widget._refresh_button.enabled)
+
+    _zarr(anat / "sub-gs18_ses-3_20240101_140000", 2)
+    widget.refresh()
+    # refresh returns before the scan, which updates the list when done
+    assert len(widget._sessions.choices) == 4
+    qtbot.waitUntil(lambda: len(widget._sessions.choices) == 5)
+    widget._sessions.value = widget.catalog.find(product="dff")[0]
+    widget.open_selected()
+    assert len(viewer.layers) == 1
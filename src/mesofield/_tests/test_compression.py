@@ -0,0 +1,90 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from mesofield._compression import AdaptiveLevel, CompressedZarrSink
+from mesofield._reader import zarr_reader_function
+from mesofield._storage import AsyncFrameWriter
+from mesofield._synthetic import SyntheticWidefield
+
+
+def test_adaptive_level():
+    policy = AdaptiveLevel((5, 3, 1, 0), start=0.25)
+    assert policy.level(0.0) == 5
+    assert policy.level(0.3) == 3
+    assert policy.level(0.6) == 1
+    assert policy.level(1.0) == 0
+    assert AdaptiveLevel((3,)).level(1.0) == 3
+
+
+def test_roundtrip_through_async_writer(tmp_path):
+    camera = SyntheticWidefield((64, 48), seed=0)
+    stack, _ = camera.read(45)
+    # one level, so the ratio does not depend on how fast the test runs
+    sink = CompressedZarrSink(
+        str(tmp_path / "session"),
+        num_frames=40,
+        chunk_frames=8,
+        levels=(3,),
+        max_workers=2,
+    )
+    with AsyncFrameWriter(sink, max_queue=16) as writer:
+        for frame in stack:
+            writer.put(frame)
+    ((data, _, _),) = zarr_reader_function(writer.paths[0])
+    np.testing.assert_array_equal(np.asarray(data), stack)
+
+    stats = writer.metrics["compression"]
+    assert stats["chunks"] == 6
+    assert stats["levels"] == {3: 6}
+    assert stats["bytes_in"] == 6 * 8 * 64 * 48 * 2
+    assert stats["ratio"] > 1  # even shot-noise-limited frames compress
+    assert stats["mb_per_s"] > 0
+
+
+def test_busy_workers_are_no_backlog(tmp_path):
+    stack = np.random.default_rng(0).integers(0, 50, (24, 16, 16), "u2")
+    sink = CompressedZarrSink(
+        str(tmp_path / "idle"), chunk_frames=4, levels=(5, 1, 0), max_workers=2
+    )
+    sink.watch_queue(lambda: 0.0)
+    sink.open(stack.shape[1:], stack.dtype)
+    for start in range(0, len(stack), 8):
+        # two chunks per write: both go straight to a worker
+        sink.write(stack[start : start + 8], [None] * 8)
+        for future in list(sink._pending):
+            future.result()
+    sink.close()
+    assert sink.stats["levels"] == {5: 6}
+
+
+def test_level_drops_when_queue_backs_up(tmp_path):
+    stack = np.random.default_rng(0).integers(0, 50, (32, 16, 16), "u2")
+    sink = CompressedZarrSink(
+        str(tmp_path / "backlog"), chunk_frames=4, levels=(5, 1, 0)
+    )
+    sink.watch_queue(lambda: 1.0)
+    sink.open(stack.shape[1:], stack.dtype)
+    sink.write(stack, [None] * len(stack))
+    sink.close()
+    assert sink.stats["levels"] == {0: 8}
+    ((data, _, _),) = zarr_reader_function(sink.path)
+    np.testing.assert_array_equal(np.asarray(data), stack)
+
+
+def test_failed_close_leaves_the_sink_closed(tmp_path):
+    sink = CompressedZarrSink(str(tmp_path / "gone"), chunk_frames=4)
+    sink.open((8, 8), np.uint16)
+    sink.write(np.zeros((3, 8, 8), np.uint16), [None] * 3)
+    # the staged chunk cannot be written once its directory is gone
+    shutil.rmtree(os.path.join(sink.path, "0"))
+    with pytest.raises(FileNotFoundError):
+        sink.close()
+    assert sink.close() == [sink.path]
+
+
+def test_preferred_level_must_compress(tmp_path):
+    with pytest.raises(ValueError):
+        CompressedZarrSink(str(tmp_path / "x"), levels=(0,))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from mesofield._dff import OnlineDeltaF
+from mesofield._reader import zarr_reader_function
+from mesofield._storage import AsyncFrameWriter, ZarrSink
+from mesofield._synthetic import SyntheticWidefield
+
+
+def test_mean_baseline_per_channel(recording_listener):
+    stack, metadata = SyntheticWidefield((8, 8), seed=0).read(40)
+    out = recording_listener()
+    dff = OnlineDeltaF(window=100, outputs=[out], threaded=False)
+    dff.sequenceStarted()
+    for frame, meta in zip(stack, metadata):
+        dff.frameReady(frame, None, meta)
+    dff.sequenceFinished()
+    assert out.finished and len(out.frames) == 40
+
+    # within the window the baseline is the plain mean of each channel
+    blue = stack[0::2].astype(np.float32)
+    np.testing.assert_allclose(dff.baseline("blue"), blue.mean(0), rtol=1e-4)
+    f0 = blue.mean(0)
+    np.testing.assert_allclose(out.frames[-2], (blue[-1] - f0) / f0, atol=1e-4)
+
+
+def test_percentile_baseline_ignores_transients():
+    rng = np.random.default_rng(0)
+    frames = np.full((200, 4, 4), 100.0) + rng.normal(0, 1, (200, 4, 4))
+    frames[::10] += 50  # sparse bright transients
+    dff = OnlineDeltaF("percentile", window=100, n_blocks=20, threaded=False)
+    for frame in frames:
+        dff.process(frame)
+    np.testing.assert_allclose(dff.baseline(), 100, atol=2)
+
+
+def test_threaded_dff_saved_when_sequence_finishes(tmp_path):
+    camera = SyntheticWidefield((16, 16), seed=1)
+    writer = AsyncFrameWriter(ZarrSink(str(tmp_path / "dff")))
+    dff = OnlineDeltaF(window=50, outputs=[writer], max_queue=4)
+    dff.sequenceStarted()
+    for frame, meta in camera.frames(30):
+        dff.frameReady(frame, None, meta)
+    dff.sequenceFinished()
+    ((data, _, _),) = zarr_reader_function(writer.paths[0])
+    assert data.shape == (30, 16, 16)
+    assert data.dtype == np.float32
+    assert abs(float(np.asarray(data).mean())) < 0.05
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        OnlineDeltaF("median")
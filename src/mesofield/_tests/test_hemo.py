@@ -0,0 +1,103 @@
+import numpy as np
+
+from mesofield._hemo import (
+    ChannelDemux,
+    HemodynamicRegression,
+    OnlineHemodynamicCorrection,
+    channel_name,
+    correct_session,
+    demux,
+    pattern_from_states,
+)
+from mesofield._synthetic import SyntheticWidefield
+
+
+def test_demux_patterns():
+    stack = np.arange(10)
+    split = demux(stack)
+    np.testing.assert_array_equal(split["blue"], [0, 2, 4, 6, 8])
+    assert split["violet"].base is stack  # a view
+
+    pattern = pattern_from_states(["4", "4", "2", "2"])
+    assert pattern == ("blue", "blue", "violet", "violet")
+    split = demux(stack, pattern, offset=1)
+    np.testing.assert_array_equal(split["blue"], [0, 3, 4, 7, 8])
+    np.testing.assert_array_equal(split["violet"], [1, 2, 5, 6, 9])
+
+
+def test_channel_demux_stream(recording_listener):
+    blue, violet = recording_listener(), recording_listener()
+    stream = ChannelDemux({"blue": [blue], "violet": [violet]})
+    camera = SyntheticWidefield((4, 4))
+    stream.sequenceStarted()
+    for frame, meta in camera.frames(7):
+        stream.frameReady(frame, None, meta)
+    stream.sequenceFinished()
+    assert stream.counts == {"blue": 4, "violet": 3}
+    assert len(blue.frames) == 4
+
+
+def test_metadata_channel_names(recording_listener):
+    assert channel_name("Blue") == channel_name("4") == "blue"
+    assert channel_name(" Violet") == channel_name(2) == "violet"
+    blue, violet = recording_listener(), recording_listener()
+    stream = ChannelDemux({"blue": [blue], "violet": [violet]})
+    stream.sequenceStarted()
+    # rig labels, Arduino states and an unknown name (falls back to the
+    # pattern position, here violet)
+    for channel in ("Blue", "2", "BLUE", "DAPI"):
+        stream.frameReady(np.zeros((2, 2)), None, {"Channel": channel})
+    assert stream.counts == {"blue": 2, "violet": 2}
+    assert stream.unknown == 1
+
+
+def test_online_correction_with_rig_channel_names(recording_listener, caplog):
+    out = recording_listener()
+    online = OnlineHemodynamicCorrection([out], warmup=0)
+    online.sequenceStarted()
+    for channel in ("Blue", "Blue", "Violet", "Violet") * 2:
+        online.frameReady(np.ones((3, 3)), None, {"Channel": channel})
+    online.sequenceFinished()
+    assert len(out.frames) == 3
+    # the first blue frame had no partner, the last violet one neither
+    assert online.dropped == 2
+    assert "dropped 2 of 8 frames" in caplog.text
+
+
+def _hemodynamic_session(n=400, shape=(6, 5)):
+    rng = np.random.default_rng(0)
+    hemo = rng.normal(0, 1, (n, 1, 1))
+    neural = rng.normal(0, 1, (n,) + shape)
+    gain = rng.uniform(0.5, 2.0, shape)
+    violet = 500 + 20 * hemo + rng.normal(0, 0.02, (n,) + shape)
+    blue = 1000 + 20 * gain * hemo + neural
+    return blue.astype(np.float32), violet.astype(np.float32), neural, gain
+
+
+def test_regression_recovers_neural_signal():
+    blue, violet, neural, gain = _hemodynamic_session()
+    regression = HemodynamicRegression()
+    for start in range(0, len(blue), 64):
+        regression.update(blue[start : start + 64], violet[start : start + 64])
+    _, slope = regression.coefficients()
+    np.testing.assert_allclose(slope, gain, rtol=0.05)
+
+    corrected = correct_session(blue, violet, chunk_frames=64)
+    residual = corrected - corrected.mean(0) - (neural - neural.mean(0))
+    assert np.abs(residual).mean() < 0.1
+    np.testing.assert_allclose(corrected.mean(0), blue.mean(0), rtol=1e-4)
+
+
+def test_online_correction_matches_offline(recording_listener):
+    blue, violet, _, _ = _hemodynamic_session(n=200)
+    out = recording_listener()
+    online = OnlineHemodynamicCorrection([out], use_metadata=False, warmup=0)
+    online.sequenceStarted()
+    for b, v in zip(blue, violet):
+        online.frameReady(b)
+        online.frameReady(v)
+    online.sequenceFinished()
+    assert len(out.frames) == 200
+    # the last frame is corrected with the fit over the whole session
+    offline = correct_session(blue, violet)
+    np.testing.assert_allclose(out.frames[-1], offline[-1], rtol=1e-4)
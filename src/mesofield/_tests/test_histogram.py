@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from skimage.util import img_as_float
+
+from mesofield._histogram import (
+    build_histogram,
+    cached_histogram,
+    histogram_of,
+)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.int16, bool])
+def test_histogram_counts_are_exact(dtype):
+    rng = np.random.default_rng(0)
+    if dtype is bool:
+        data = rng.random((4, 20, 20)) > 0.5
+    else:
+        info = np.iinfo(dtype)
+        data = rng.integers(info.min, info.max, (4, 20, 20), dtype=dtype)
+    histogram = histogram_of(data, block_bytes=data[0].nbytes)
+    assert histogram.total == data.size
+    as_float = img_as_float(data)
+    for threshold in [-2.0, -0.5, 0.0, 0.3, 0.5, 0.99, 1.0]:
+        assert histogram.count_above(threshold) == np.sum(as_float > threshold)
+        assert histogram.count_above(threshold, invert=True) == np.sum(
+            as_float < threshold
+        )
+
+
+def test_histogram_float_is_close():
+    data = np.random.default_rng(1).normal(size=(10, 64, 64))
+    histogram = histogram_of(data)
+    for threshold in [-1.0, 0.0, 0.7]:
+        expected = np.mean(data > threshold)
+        assert histogram.fraction_above(threshold) == pytest.approx(
+            expected, abs=1e-3
+        )
+
+
+def test_build_histogram_is_incremental_and_cached():
+    data = np.zeros((8, 16, 16), dtype=np.uint16)
+    progress = []
+    builder = build_histogram(data, block_bytes=data[0].nbytes * 2)
+    with pytest.raises(StopIteration) as stop:
+        while True:
+            progress.append(next(builder))
+    assert progress == [0.25, 0.5, 0.75, 1.0]
+    histogram = stop.value.value
+    assert cached_histogram(data) is histogram
+    assert histogram_of(data) is histogram
+    assert cached_histogram(data.copy()) is None
@@ -0,0 +1,73 @@
+import importlib
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# wall-clock budget for ``import mesofield`` in a fresh interpreter
+IMPORT_BUDGET_S = 0.25
+# none of these may be imported just to resolve the plugin manifest
+HEAVY_MODULES = (
+    "dask",
+    "magicgui",
+    "napari",
+    "pymmcore_plus",
+    "pymmcore_widgets",
+    "qtpy",
+    "skimage",
+    "tifffile",
+    "zarr",
+)
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _probe(module):
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout)
+
+
+def test_import_time_budget():
+    # best of three, so a busy machine does not fail the test
+    elapsed = min(_probe("mesofield")["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET_S
+
+
+@pytest.mark.parametrize(
+    "module", ["mesofield", "mesofield._reader", "mesofield._writer"]
+)
+def test_no_heavy_imports(module):
+    modules = set(_probe(module)["modules"])
+    loaded = [name for name in HEAVY_MODULES if name in modules]
+    assert not loaded
+
+
+def test_manifest_commands_resolve():
+    import yaml
+
+    manifest = Path(__file__).parents[1] / "napari.yaml"
+    commands = yaml.safe_load(manifest.read_text())["contributions"]
+    for command in commands["commands"]:
+        module, name = command["python_name"].split(":")
+        assert getattr(importlib.import_module(module), name) is not None
+
+
+def test_unknown_attribute():
+    import mesofield
+
+    with pytest.raises(AttributeError):
+        mesofield.does_not_exist  # noqa: B018
+    assert "ImageThreshold" in dir(mesofield)
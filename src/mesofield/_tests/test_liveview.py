@@ -0,0 +1,38 @@
+import numpy as np
+
+from mesofield._liveview import LiveView
+
+
+def test_live_view_decimates(make_napari_viewer):
+    viewer = make_napari_viewer()
+    live = LiveView(viewer, projections=("mean", "max"))
+    assert not live.refresh()
+
+    for i in range(50):
+        live.update(np.full((8, 8), i, dtype=np.uint16))
+    assert live.refresh()
+    # nothing new since the last redraw
+    assert not live.refresh()
+    assert live.frames_received == 50
+    assert live.frames_displayed == 1
+
+    np.testing.assert_array_equal(viewer.layers["live"].data, 49)
+    np.testing.assert_allclose(viewer.layers["live mean"].data, 24.5)
+    np.testing.assert_array_equal(viewer.layers["live max"].data, 49)
+
+
+def test_live_view_batches(make_napari_viewer):
+    viewer = make_napari_viewer()
+    live = LiveView(viewer, name="cam", projections=("max",))
+    frames = np.arange(4 * 3 * 3).reshape(4, 3, 3)
+    live.update_batch(frames)
+    live.refresh()
+    np.testing.assert_array_equal(viewer.layers["cam"].data, frames[-1])
+    np.testing.assert_array_equal(live.projection("max"), frames.max(0))
+
+    live.sequenceStarted()
+    assert live.latest() is None
+    assert live.projection("max") is None
+    live.frameReady(np.ones((3, 3)))
+    live.stop()
+    np.testing.assert_array_equal(viewer.layers["cam"].data, 1)
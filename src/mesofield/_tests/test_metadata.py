@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from mesofield._metadata import (
+    FrameMetadataRecorder,
+    find_frame_metadata,
+    frame_metadata_path,
+    load_frame_metadata,
+)
+from mesofield._synthetic import SyntheticWidefield
+
+
+def test_record_synthetic_metadata(tmp_path):
+    recorder = FrameMetadataRecorder(str(tmp_path / "frames.npz"), capacity=4)
+    camera = SyntheticWidefield(shape=(4, 4), exposure_ms=20.0)
+    recorder.sequenceStarted()
+    for frame, meta in camera.frames(10):
+        recorder.frameReady(frame, None, meta)
+    recorder.sequenceFinished()
+    assert len(recorder) == 10
+
+    table = load_frame_metadata(str(tmp_path / "frames.npz"))
+    assert list(table["frame_index"]) == list(range(10))
+    assert list(table["channel"][:2]) == ["blue", "violet"]
+    np.testing.assert_array_equal(table["exposure_ms"], 20.0)
+    assert np.all(np.diff(table["host_time"]) >= 0)
+    assert np.isnan(table["runner_time_ms"]).all()
+    assert (table["images_remaining"] == -1).all()
+
+
+def test_record_pymmcore_metadata(tmp_path):
+    useq = pytest.importorskip("useq")
+    recorder = FrameMetadataRecorder()
+    event = useq.MDAEvent(index={"t": 5}, channel={"config": "Violet"})
+    meta = {
+        "exposure_ms": 18.0,
+        "runner_time_ms": 123.5,
+        "images_remaining_in_buffer": 3,
+        "camera_metadata": {"ElapsedTime-ms": "99.5"},
+    }
+    recorder.frameReady(np.zeros((2, 2)), event, meta)
+    row = recorder.table[0]
+    assert row["frame_index"] == 5
+    assert row["channel"] == "Violet"
+    assert row["camera_time_ms"] == 99.5
+    assert row["runner_time_ms"] == 123.5
+    assert row["images_remaining"] == 3
+
+
+def test_save_parquet_or_npz(tmp_path):
+    recorder = FrameMetadataRecorder(capacity=2)
+    for i in range(3):
+        recorder.record({"channel": "blue"}, frame_index=i)
+    path = recorder.save(str(tmp_path / "frames.parquet"))
+    table = load_frame_metadata(path)
+    assert list(table["frame_index"]) == [0, 1, 2]
+    assert list(table["channel"]) == ["blue"] * 3
+
+
+def test_metadata_next_to_its_data(tmp_path):
+    stem = str(tmp_path / "sub-gs18_ses-3_20240101-120000")
+    assert find_frame_metadata(stem) is None
+    path = FrameMetadataRecorder(frame_metadata_path(stem)).save()
+    # .npz without pyarrow, either way found from the data stem
+    assert find_frame_metadata(stem) == path
+    assert path.startswith(stem + "_frame_metadata.")
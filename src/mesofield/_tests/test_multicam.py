@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from mesofield._metadata import load_frame_metadata
+from mesofield._multicam import (
+    CameraPipeline,
+    CoreSource,
+    MultiCameraSession,
+    SyntheticSource,
+    align_frames,
+)
+from mesofield._reader import zarr_reader_function
+from mesofield._storage import ZarrSink
+from mesofield._synthetic import SyntheticWidefield
+
+
+def _pipeline(tmp_path, name, shape, fps, n_frames):
+    camera = SyntheticWidefield(shape, fps=fps, seed=0)
+    return CameraPipeline(
+        name,
+        SyntheticSource(camera, n_frames, realtime=True),
+        sink=ZarrSink(str(tmp_path / name)),
+    )
+
+
+def test_two_cameras_on_independent_pipelines(tmp_path):
+    widefield = _pipeline(tmp_path, "widefield", (64, 64), 100, 40)
+    pupil = _pipeline(tmp_path, "pupil", (32, 32), 25, 10)
+    session = MultiCameraSession([widefield, pupil])
+    summary = session.run(timeout=30)
+
+    assert summary["widefield"]["frames"] == 40
+    assert summary["pupil"]["frames"] == 10
+    assert summary["widefield"]["error"] is None
+    ((data, _, _),) = zarr_reader_function(summary["pupil"]["paths"][0])
+    assert data.shape == (10, 32, 32)
+
+    # both cameras are stamped against the same session clock
+    wide_times = widefield.metadata.table["host_time"]
+    pupil_times = pupil.metadata.table["host_time"]
+    assert 0 <= wide_times[0] < 1 and 0 <= pupil_times[0] < 1
+    assert np.all(np.diff(wide_times) > 0)
+    nearest = align_frames(pupil_times, wide_times)
+    assert np.all(np.abs(wide_times[nearest] - pupil_times) < 0.05)
+
+    paths = session.save_metadata(str(tmp_path))
+    table = load_frame_metadata(paths["pupil"])
+    np.testing.assert_array_equal(table["host_time"], pupil_times)
+
+
+def test_align_frames():
+    reference = [0.0, 0.9, 2.2, 10.0]
+    other = [0.0, 1.0, 2.0, 3.0]
+    np.testing.assert_array_equal(align_frames(reference, other), [0, 1, 2, 3])
+    np.testing.assert_array_equal(align_frames(reference, [1.5]), [0] * 4)
+    with pytest.raises(ValueError):
+        align_frames(reference, [])
+
+
+def test_unique_names(tmp_path):
+    a = _pipeline(tmp_path, "cam", (8, 8), 10, 1)
+    b = _pipeline(tmp_path, "cam", (8, 8), 10, 1)
+    with pytest.raises(ValueError):
+        MultiCameraSession([a, b])
+
+
+def test_two_demo_cores(tmp_path):
+    pymmcore_plus = pytest.importorskip("pymmcore_plus")
+    useq = pytest.importorskip("useq")
+    if pymmcore_plus.find_micromanager() is None:
+        pytest.skip("Micro-Manager demo adapters not installed")
+
+    pipelines = []
+    for name in ("widefield", "pupil"):
+        core = pymmcore_plus.CMMCorePlus()
+        core.loadSystemConfiguration()
+        core.setExposure(5)
+        sequence = useq.MDASequence(time_plan={"interval": 0, "loops": 20})
+        pipelines.append(
+            CameraPipeline(
+                name,
+                CoreSource(core, sequence),
+                sink=ZarrSink(str(tmp_path / name)),
+            )
+        )
+    summary = MultiCameraSession(pipelines).run(timeout=60)
+    for name in ("widefield", "pupil"):
+        assert summary[name]["frames"] == 20
+        assert summary[name]["error"] is None
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from mesofield._pupil import PupilTracker, pupil_fit
+
+
+def _eye(n, shape=(128, 160), radius=20, seed=0):
+    """IR eye frames: a dark disc drifting right on a bright, noisy iris."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[: shape[0], : shape[1]]
+    frames = rng.integers(2800, 3200, (n,) + shape).astype(np.uint16)
+    centers = [(60 + i, 64) for i in range(n)]
+    for frame, (cx, cy) in zip(frames, centers):
+        frame[(xx - cx) ** 2 + (yy - cy) ** 2 <= radius**2] = 400
+    return frames, np.array(centers, dtype=float)
+
+
+def test_fit_recovers_ellipse():
+    h, w = 100, 120
+    yy, xx = np.mgrid[:h, :w]
+    a, b, theta = 30, 15, 0.4
+    u = (xx - 55) * np.cos(theta) + (yy - 48) * np.sin(theta)
+    v = -(xx - 55) * np.sin(theta) + (yy - 48) * np.cos(theta)
+    frame = np.where((u / a) ** 2 + (v / b) ** 2 <= 1, 0, 255).astype("u1")
+    fit = pupil_fit(frame[np.newaxis], threshold=128)
+    assert fit["center_x"][0] == pytest.approx(55, abs=0.1)
+    assert fit["center_y"][0] == pytest.approx(48, abs=0.1)
+    assert fit["major"][0] == pytest.approx(2 * a, rel=0.03)
+    assert fit["minor"][0] == pytest.approx(2 * b, rel=0.03)
+    assert fit["angle"][0] == pytest.approx(theta, abs=0.02)
+
+
+def test_fit_batch_with_auto_threshold():
+    frames, centers = _eye(8)
+    fit = pupil_fit(frames)
+    np.testing.assert_allclose(fit["center_x"], centers[:, 0], atol=0.05)
+    np.testing.assert_allclose(fit["center_y"], centers[:, 1], atol=0.05)
+    np.testing.assert_allclose(fit["diameter"], 40, rtol=0.03)
+
+
+def test_empty_frame_is_nan():
+    fit = pupil_fit(np.full((1, 8, 8), 100, np.uint16), threshold=50)
+    assert np.isnan(fit["diameter"][0]) and np.isnan(fit["center_x"][0])
+
+
+def test_tracker_streams_traces_and_sparse_frames(
+    tmp_path, recording_listener
+):
+    frames, centers = _eye(40)
+    sparse = recording_listener()
+    batches = []
+    tracker = PupilTracker(
+        batch_frames=8,
+        save_every=10,
+        outputs=[sparse],
+        path=str(tmp_path / "pupil"),
+        on_traces=lambda rows: batches.append(len(rows)),
+        max_queue=16,
+    )
+    tracker.sequenceStarted()
+    for i, frame in enumerate(frames):
+        tracker.frameReady(frame, None, {"frame_index": i, "host_time": i})
+    tracker.sequenceFinished()
+
+    traces = tracker.traces
+    assert len(traces) == 40 and sum(batches) == 40
+    np.testing.assert_array_equal(traces["frame_index"], np.arange(40))
+    np.testing.assert_allclose(traces["center_x"], centers[:, 0], atol=0.05)
+    assert [m["frame_index"] for m in sparse.meta] == [0, 10, 20, 30]
+    assert sparse.finished
+
+    saved = np.load(tmp_path / "pupil.npz")["pupil"]
+    np.testing.assert_array_equal(saved, traces)
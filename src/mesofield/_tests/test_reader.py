@@ -1,6 +1,8 @@
 import numpy as np
+import pytest
 
 from mesofield import napari_get_reader
+from mesofield._reader import napari_get_zarr_reader
 
 
 # tmp_path is a pytest fixture
@@ -29,3 +31,89 @@ def test_reader(tmp_path):
 def test_get_reader_pass():
     reader = napari_get_reader("fake.file")
     assert reader is None
+
+
+def test_reader_stack_is_lazy(tmp_path):
+    paths = []
+    for i in range(3):
+        path = str(tmp_path / f"frame{i}.npy")
+        np.save(path, np.full((8, 8), i, dtype=np.uint16))
+        paths.append(path)
+
+    data = napari_get_reader(paths)(paths)[0][0]
+    # nothing has been read yet, the stack is a dask array
+    assert not isinstance(data, np.ndarray)
+    assert data.shape == (3, 8, 8)
+    assert data.chunksize == (1, 8, 8)
+    np.testing.assert_array_equal(np.asarray(data[2]), 2)
+
+
+def test_reader_image_sequence_directory(tmp_path):
+    tifffile = pytest.importorskip("tifffile")
+
+    # mimic ImageSequenceWriter's "{frame:05}_t{t:04}_c{c:02}.tif" names
+    frames = np.arange(6 * 2 * 4 * 5, dtype=np.uint16).reshape(6, 2, 4, 5)
+    for t in range(6):
+        for c in range(2):
+            name = f"{t * 2 + c:05}_t{t:04}_c{c:02}.tif"
+            tifffile.imwrite(tmp_path / name, frames[t, c])
+    (tmp_path / "_frame_metadata.json").write_text("{}")
+
+    reader = napari_get_reader(str(tmp_path))
+    assert callable(reader)
+    data, add_kwargs, layer_type = reader(str(tmp_path))[0]
+    assert layer_type == "image"
+    assert data.shape == frames.shape
+    assert data.dtype == frames.dtype
+
+    np.testing.assert_array_equal(data[3], frames[3])
+    np.testing.assert_array_equal(data[1:4, 1, :, 2], frames[1:4, 1, :, 2])
+    np.testing.assert_array_equal(np.asarray(data), frames)
+    data.close()
+
+
+def test_zarr_reader_multiscale(tmp_path):
+    zarr = pytest.importorskip("zarr")
+
+    store = str(tmp_path / "session.zarr")
+    group = zarr.open_group(store, mode="w")
+    full = np.random.randint(0, 4096, (3, 64, 64), dtype=np.uint16)
+    levels = [full, full[:, ::2, ::2], full[:, ::4, ::4]]
+    for i, level in enumerate(levels):
+        arr = group.zeros(
+            name=str(i), shape=level.shape, chunks=(1, 16, 16), dtype="u2"
+        )
+        arr[:] = level
+    group.attrs["multiscales"] = [
+        {
+            "version": "0.4",
+            "name": "p0",
+            "axes": [
+                {"name": "t", "type": "time"},
+                {"name": "y", "type": "space"},
+                {"name": "x", "type": "space"},
+            ],
+            "datasets": [
+                {
+                    "path": str(i),
+                    "coordinateTransformations": [
+                        {"type": "scale", "scale": [1.0, 2.0**i, 2.0**i]}
+                    ],
+                }
+                for i in range(3)
+            ],
+        }
+    ]
+
+    assert napari_get_reader(store) is None
+    reader = napari_get_zarr_reader(store)
+    assert callable(reader)
+    data, add_kwargs, layer_type = reader(store)[0]
+    assert add_kwargs["multiscale"]
+    assert add_kwargs["name"] == "p0"
+    assert [d.shape for d in data] == [lvl.shape for lvl in levels]
+    np.testing.assert_array_equal(np.asarray(data[1][2]), levels[1][2])
+
+
+def test_get_zarr_reader_pass(tmp_path):
+    assert napari_get_zarr_reader(str(tmp_path)) is None
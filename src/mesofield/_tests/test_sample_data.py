@@ -4,5 +4,9 @@
 
 from mesofield import make_sample_data
 
+
 def test_something():
-    print(make_sample_data())
+    layers = make_sample_data(n_frames=20, shape=(64, 64))
+    assert len(layers) == 2
+    blue, violet = (data for data, _ in layers)
+    assert blue.shape == violet.shape == (10, 64, 64)
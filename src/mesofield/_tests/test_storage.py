@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import tifffile
+
+from mesofield._reader import zarr_reader_function
+from mesofield._storage import AsyncFrameWriter, BigTiffSink, ZarrSink
+from mesofield._synthetic import SyntheticWidefield
+
+
+def _record(writer, n_frames, shape=(16, 24)):
+    camera = SyntheticWidefield(shape=shape, seed=3)
+    stack, metadata = camera.read(n_frames)
+    writer.sequenceStarted()
+    for frame, meta in zip(stack, metadata):
+        writer.frameReady(frame, None, meta)
+    writer.sequenceFinished()
+    return stack
+
+
+@pytest.mark.parametrize("num_frames", [50, None])
+def test_bigtiff_sink(tmp_path, num_frames):
+    sink = BigTiffSink(str(tmp_path / "session"), num_frames)
+    writer = AsyncFrameWriter(sink, max_queue=8, batch_frames=4)
+    stack = _record(writer, 50)
+    assert writer.paths == [str(tmp_path / "session.tif")]
+    np.testing.assert_array_equal(tifffile.imread(writer.paths[0]), stack)
+    metrics = writer.metrics
+    assert metrics["frames_written"] == 50
+    assert metrics["frames_dropped"] == 0
+    assert 0 < metrics["max_queue_depth"] <= 8
+
+
+@pytest.mark.parametrize("num_frames", [40, 7, None])
+def test_zarr_sink(tmp_path, num_frames):
+    sink = ZarrSink(str(tmp_path / "session"), num_frames, chunk_frames=6)
+    writer = AsyncFrameWriter(sink, max_queue=4)
+    stack = _record(writer, 20)
+    ((data, _, _),) = zarr_reader_function(writer.paths[0])
+    # trimmed (or grown) to the frames actually written
+    np.testing.assert_array_equal(np.asarray(data), stack)
+
+
+def test_writer_reports_sink_errors(tmp_path):
+    class _FailingSink:
+        def open(self, frame_shape, dtype):
+            raise OSError("disk full")
+
+        def close(self):
+            return []
+
+    writer = AsyncFrameWriter(_FailingSink(), max_queue=2)
+    writer.start()
+    writer.put(np.zeros((2, 2)))
+    writer._thread.join(5)
+    # the writer is gone: producers are no longer blocked
+    assert not writer.put(np.zeros((2, 2)))
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
@@ -0,0 +1,43 @@
+import threading
+
+import numpy as np
+
+from mesofield._synthetic import BLUE, VIOLET, SyntheticWidefield
+
+
+def test_synthetic_frames():
+    camera = SyntheticWidefield(shape=(32, 48), dtype="uint16", seed=1)
+    stack, metadata = camera.read(10)
+    assert stack.shape == (10, 32, 48)
+    assert stack.dtype == np.uint16
+    assert [m["channel"] for m in metadata[:4]] == [BLUE, VIOLET] * 2
+    assert [m["frame_index"] for m in metadata] == list(range(10))
+    # the violet channel is dimmer than the blue one
+    assert stack[0::2].mean() > stack[1::2].mean()
+
+    # reproducible with a seed
+    again, _ = SyntheticWidefield(shape=(32, 48), seed=1).read(10)
+    np.testing.assert_array_equal(stack, again)
+
+
+def test_synthetic_dtypes():
+    for dtype in ("uint8", "uint16", "float32"):
+        frame, _ = SyntheticWidefield((16, 16), dtype=dtype).next_frame()
+        assert frame.dtype == dtype
+        assert np.isfinite(frame).all()
+
+
+def test_synthetic_stream():
+    camera = SyntheticWidefield(shape=(16, 16), fps=1000.0)
+    frames = []
+    done = threading.Event()
+
+    def _frame_ready(frame, meta):
+        frames.append(meta["frame_index"])
+        if len(frames) == 20:
+            done.set()
+
+    camera.start(_frame_ready, n_frames=20)
+    assert done.wait(5)
+    camera.stop()
+    assert frames == list(range(20))
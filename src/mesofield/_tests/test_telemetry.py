@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+
+from mesofield._liveview import LiveView
+from mesofield._storage import AsyncFrameWriter, ZarrSink
+from mesofield._synthetic import SyntheticWidefield
+from mesofield._telemetry import (
+    AcquisitionTelemetry,
+    LatencyHistogram,
+    TelemetryWidget,
+)
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    histogram.add_many(np.full(98, 0.001))
+    histogram.add(0.1)
+    histogram.add(0.2)
+    assert histogram.count == 100
+    assert abs(histogram.percentile(50) - 0.001) < 0.0002
+    assert histogram.percentile(99) > 0.05
+    assert histogram.max == 0.2
+
+
+def test_detects_missing_frames_and_gaps():
+    telemetry = AcquisitionTelemetry(fps=100)
+    for i in [0, 1, 2, 5, 6]:
+        telemetry.frame_received(i, camera_time_ms=i * 10.0)
+    # a timing gap without missing indices (a stalled camera)
+    telemetry.frame_received(7, camera_time_ms=100.0)
+    summary = telemetry.summary()
+    assert summary["frames"] == 6
+    assert summary["missing_frames"] == 2
+    assert summary["timing_gaps"] == 2
+    assert summary["gaps"][0] == {"kind": "index", "after": 2, "size": 2}
+    assert summary["gaps"][-1]["after"] == 6
+    assert summary["stages"]["interval"]["count"] == 5
+
+
+def test_stage_latencies_saved(tmp_path, make_napari_viewer):
+    telemetry = AcquisitionTelemetry()
+    writer = AsyncFrameWriter(
+        ZarrSink(str(tmp_path / "session")), telemetry=telemetry
+    )
+    live = LiveView(make_napari_viewer(), telemetry=telemetry)
+    camera = SyntheticWidefield(shape=(8, 8))
+    writer.sequenceStarted()
+    for frame, meta in camera.frames(20):
+        telemetry.frameReady(frame, None, meta)
+        writer.frameReady(frame, None, meta)
+        live.update(frame)
+    writer.sequenceFinished()
+    live.refresh()
+
+    widget = TelemetryWidget(telemetry)
+    widget.refresh()
+    assert widget._frames.value.startswith("20")
+
+    path = telemetry.save(str(tmp_path / "telemetry"))
+    with open(path) as file:
+        saved = json.load(file)
+    assert saved["frames"] == 20
+    assert saved["missing_frames"] == 0
+    assert saved["stages"]["queue"]["count"] == 20
+    assert saved["stages"]["write"]["count"] >= 1
+    assert saved["stages"]["display"]["count"] == 1
+    assert saved["counters"]["writer"]["frames_written"] == 20
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from skimage.util import img_as_float
+
+from mesofield._threshold import (
+    native_threshold,
+    threshold_array,
+    threshold_blocks,
+    threshold_lazy,
+    unpack_mask,
+)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.int16])
+@pytest.mark.parametrize("invert", [False, True])
+def test_native_threshold_matches_img_as_float(dtype, invert):
+    info = np.iinfo(dtype)
+    values = np.arange(info.min, info.max + 1, dtype=dtype)
+    as_float = img_as_float(values)
+    for threshold in [-1.5, -1.0, 0.0, 0.25, 0.5, 1.0, 2.0, *as_float[::251]]:
+        bound = native_threshold(dtype, threshold, invert)
+        if invert:
+            expected, result = as_float < threshold, values < bound
+        else:
+            expected, result = as_float > threshold, values > bound
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_threshold_lazy_stack():
+    stack = np.random.randint(0, 2**16, (5, 16, 16), dtype=np.uint16)
+    lazy = threshold_lazy(stack, 0.5)
+    assert lazy.dtype == bool
+    assert lazy.chunksize == (1, 16, 16)
+    np.testing.assert_array_equal(
+        np.asarray(lazy[3]), img_as_float(stack[3]) > 0.5
+    )
+    np.testing.assert_array_equal(
+        np.asarray(lazy), threshold_array(stack, 0.5)
+    )
+
+
+def test_threshold_blocks_cancel():
+    stack = np.random.random((6, 8, 8))
+    result = threshold_blocks(stack, 0.3, invert=True, block_bytes=8 * 8 * 8)
+    np.testing.assert_array_equal(result, stack < 0.3)
+
+    polls = []
+
+    def cancelled():
+        polls.append(None)
+        return len(polls) > 2
+
+    result = threshold_blocks(
+        stack, 0.3, cancelled=cancelled, block_bytes=1, workers=1
+    )
+    assert result is None
+    assert len(polls) == 3
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_threshold_blocks_parallel_packed(workers):
+    stack = np.random.randint(0, 2**16, (7, 13, 21), dtype=np.uint16)
+    expected = img_as_float(stack) > 0.4
+    out = np.zeros(stack.shape, dtype=bool)
+    result = threshold_blocks(stack, 0.4, workers=workers, out=out)
+    assert result is out
+    np.testing.assert_array_equal(out, expected)
+
+    packed = threshold_blocks(stack, 0.4, workers=workers, packed=True)
+    assert packed.shape == (7, 13, 3)
+    np.testing.assert_array_equal(unpack_mask(packed, stack.shape), expected)
+
+
+def test_threshold_blocks_parallel_cancel():
+    stack = np.random.random((64, 8, 8))
+    result = threshold_blocks(
+        stack, 0.5, cancelled=lambda: True, block_bytes=1, workers=4
+    )
+    assert result is None
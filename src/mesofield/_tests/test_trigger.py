@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+import pytest
+
+from mesofield._trigger import (
+    AcquisitionTrigger,
+    SerialTrigger,
+    SoftwareTrigger,
+)
+
+
+def test_software_trigger_starts_acquisition():
+    started = threading.Event()
+    prepared = []
+    source = SoftwareTrigger()
+    trigger = AcquisitionTrigger([source])
+    trigger.arm(started.set, prepare=lambda: prepared.append(True))
+    assert prepared and trigger.armed and not started.is_set()
+
+    before = time.perf_counter()
+    source.fire()
+    assert trigger.wait(5)
+    assert started.is_set()
+    assert trigger.source == "software"
+    assert before <= trigger.host_time <= time.perf_counter()
+    # the armed thread only has to wake up
+    assert trigger.latency_s < 0.1
+    assert not trigger.armed
+
+    record = trigger.to_dict(t0=before)
+    assert record["session_time"] == pytest.approx(trigger.host_time - before)
+
+
+def test_serial_trigger_over_a_pipe():
+    read_fd, write_fd = os.pipe()
+    port = os.fdopen(read_fd, "rb")
+    calls = []
+    trigger = AcquisitionTrigger([SerialTrigger(port, match=b"TTL")])
+    trigger.arm(lambda: calls.append(time.perf_counter()))
+    os.write(write_fd, b"hello\n")
+    time.sleep(0.05)
+    assert not calls  # lines that do not match are ignored
+    os.write(write_fd, b"TTL 1\n")
+    assert trigger.wait(5)
+    assert trigger.source == "serial"
+    assert calls[0] >= trigger.host_time
+    os.close(write_fd)
+    port.close()
+
+
+def test_first_source_wins_and_fires_once():
+    a, b = SoftwareTrigger(), SoftwareTrigger()
+    calls = []
+    trigger = AcquisitionTrigger([a, b])
+    trigger.arm(lambda: calls.append(1))
+    a.fire()
+    b.fire()
+    assert trigger.wait(5)
+    b.fire()
+    assert calls == [1]
+
+
+def test_disarm_does_not_start():
+    calls = []
+    source = SoftwareTrigger()
+    trigger = AcquisitionTrigger([source])
+    trigger.arm(lambda: calls.append(1))
+    trigger.disarm()
+    source.fire()
+    assert trigger.wait(5)
+    assert not calls and trigger.host_time is None
+
+
+def test_start_errors_are_kept():
+    def fail():
+        raise RuntimeError("camera not ready")
+
+    source = SoftwareTrigger()
+    trigger = AcquisitionTrigger([source])
+    trigger.arm(fail)
+    with pytest.raises(RuntimeError):
+        trigger.arm(fail)
+    source.fire()
+    assert trigger.wait(5)
+    assert isinstance(trigger.error, RuntimeError)
+
+
+def test_start_errors_are_reported(caplog):
+    def fail():
+        raise RuntimeError("camera not ready")
+
+    reported = []
+    source = SoftwareTrigger()
+    trigger = AcquisitionTrigger([source], on_error=reported.append)
+    trigger.arm(fail)
+    source.fire()
+    assert trigger.wait(5)
+    assert reported == [trigger.error]
+
+    # without a callback the failure is logged
+    trigger = AcquisitionTrigger([source])
+    trigger.arm(fail)
+    source.fire()
+    assert trigger.wait(5)
+    assert "camera not ready" in caplog.text
+
+
+def test_rearm_after_disarm_fires():
+    source = SoftwareTrigger()
+    trigger = AcquisitionTrigger([source])
+    calls = []
+    for _ in range(20):
+        calls.clear()
+        trigger.arm(lambda: calls.append(1))
+        trigger.disarm()
+        trigger.arm(lambda: calls.append(2))
+        # the disarmed thread must not clear the new arm
+        time.sleep(0.001)
+        assert trigger.armed
+        source.fire()
+        assert trigger.wait(5)
+        assert calls == [2] and not trigger.armed
+
+
+def test_serial_restart_keeps_a_single_reader():
+    read_fd, write_fd = os.pipe()
+    port = os.fdopen(read_fd, "rb")
+    calls = []
+    source = SerialTrigger(port, match=b"TTL")
+    trigger = AcquisitionTrigger([source])
+    trigger.arm(lambda: calls.append(1))
+    trigger.disarm()
+    trigger.arm(lambda: calls.append(2))
+    readers = [
+        t
+        for t in threading.enumerate()
+        if t.name == "mesofield-serial-trigger"
+    ]
+    assert len(readers) == 1
+    os.write(write_fd, b"TTL\n")
+    assert trigger.wait(5)
+    readers[0].join(5)
+    assert calls == [2] and not readers[0].is_alive()
+    os.close(write_fd)
+    port.close()
@@ -1,3 +1,5 @@
+from functools import partial
+
 import numpy as np
 
 from mesofield._widget import (
@@ -20,19 +22,37 @@ def test_threshold_autogenerate_widget():
 # make_napari_viewer is a pytest fixture that returns a napari viewer object
 # you don't need to import it, as long as napari is installed
 # in your testing environment
-def test_threshold_magic_widget(make_napari_viewer):
+def test_threshold_magic_widget(make_napari_viewer, qtbot):
     viewer = make_napari_viewer()
     layer = viewer.add_image(np.random.random((100, 100)))
 
     # our widget will be a MagicFactory or FunctionGui instance
     my_widget = threshold_magic_widget()
 
-    # if we "call" this object, it'll execute our function
-    thresholded = my_widget(viewer.layers[0], 0.5)
+    # if we "call" this object, it'll start our function in a worker
+    worker = my_widget(viewer.layers[0], 0.5)
+    with qtbot.waitSignal(worker.returned) as blocker:
+        pass
+    thresholded = blocker.args[0]
     assert thresholded.shape == layer.data.shape
     # etc.
 
 
+def test_threshold_magic_widget_newest_call_wins(make_napari_viewer, qtbot):
+    viewer = make_napari_viewer()
+    layer = viewer.add_image(np.random.random((100, 100)))
+    my_widget = threshold_magic_widget()
+
+    # a quick slider drag: only the last call produces a result
+    workers = [my_widget(layer, value) for value in (0.2, 0.4, 0.6)]
+    results = {}
+    for i, worker in enumerate(workers):
+        worker.returned.connect(partial(results.__setitem__, i))
+    qtbot.waitUntil(lambda: len(results) == 3)
+    assert results[0] is None and results[1] is None
+    np.testing.assert_array_equal(results[2], layer.data > 0.6)
+
+
 def test_image_threshold_widget(make_napari_viewer):
     viewer = make_napari_viewer()
     layer = viewer.add_image(np.random.random((100, 100)))
@@ -64,3 +84,57 @@ def test_example_q_widget(make_napari_viewer, capsys):
     # read captured output and check that it's as we expected
     captured = capsys.readouterr()
     assert captured.out == "napari has 1 layers\n"
+
+
+def test_image_threshold_widget_stack_is_lazy(make_napari_viewer):
+    viewer = make_napari_viewer()
+    stack = np.random.randint(0, 2**16, (4, 32, 32), dtype=np.uint16)
+    layer = viewer.add_image(stack)
+    my_widget = ImageThreshold(viewer)
+    my_widget._image_layer_combo.value = layer
+    my_widget._threshold_slider.value = 0.5
+
+    # the preview is evaluated slice by slice...
+    my_widget._threshold_im()
+    labels = viewer.layers[f"{layer.name}_thresholded"]
+    assert not isinstance(labels.data, np.ndarray)
+
+    # ...and committing computes the full volume
+    my_widget._apply_threshold()
+    assert isinstance(labels.data, np.ndarray)
+    np.testing.assert_array_equal(labels.data, stack > 2**15)
+
+
+def test_image_threshold_widget_lazy_source_follows_data(make_napari_viewer):
+    viewer = make_napari_viewer()
+    layer = viewer.add_image(np.zeros((3, 8, 8), np.uint16))
+    my_widget = ImageThreshold(viewer)
+    first = my_widget._lazy_source(layer)
+    assert my_widget._lazy_source(layer) is first
+
+    callbacks = len(layer.events.data.callbacks)
+    for value in (1, 2):
+        layer.data = np.full((3, 8, 8), value, np.uint16)
+        source = my_widget._lazy_source(layer)
+        assert int(np.asarray(source[0])[0, 0]) == value
+    # one connection per layer, however often the data is replaced
+    assert len(layer.events.data.callbacks) == callbacks
+
+
+def test_image_threshold_widget_coverage(make_napari_viewer, qtbot):
+    viewer = make_napari_viewer()
+    image = np.arange(100, dtype=np.uint8).reshape(10, 10)
+    layer = viewer.add_image(image)
+    my_widget = ImageThreshold(viewer)
+    my_widget._image_layer_combo.value = layer
+    my_widget._threshold_slider.value = 0.2
+
+    # the histogram is built once in the background...
+    label = my_widget._coverage_label
+    qtbot.waitUntil(lambda: "above" in label.value)
+    assert label.value.startswith(f"{np.sum(image > 0.2 * 255)} px")
+    assert "histogram" in layer.metadata
+
+    # ...after which the count follows the slider without a worker
+    my_widget._threshold_slider.value = 0.5
+    assert label.value.startswith(f"{np.sum(image > 0.5 * 255)} px")
@@ -1,7 +1,60 @@
-# from mesofield import write_single_image, write_multiple
+import numpy as np
+import pytest
 
-# add your tests here...
+from mesofield import write_multiple, write_single_image
+from mesofield._reader import zarr_reader_function
+from mesofield._zarr import open_group
 
 
 def test_something():
     pass
+
+
+def test_write_single_image_streams_blocks(tmp_path):
+    dask_array = pytest.importorskip("dask.array")
+
+    data = np.arange(10 * 6 * 4, dtype=np.uint16).reshape(10, 6, 4)
+    # one plane per block, the dask graph is only computed block by block
+    lazy = dask_array.from_array(data, chunks=(3, 6, 4))
+    path = str(tmp_path / "stack")
+    written = write_single_image(path, lazy, {}, block_bytes=6 * 4 * 2)
+    assert written == [path + ".npy"]
+
+    saved = np.load(written[0], mmap_mode="r")
+    assert saved.dtype == data.dtype
+    np.testing.assert_array_equal(saved, data)
+
+
+def test_write_single_image_multiscale(tmp_path):
+    data = np.random.random((8, 8))
+    path = str(tmp_path / "image.npy")
+    write_single_image(path, [data, data[::2, ::2]], {"multiscale": True})
+    np.testing.assert_array_equal(np.load(path), data)
+
+
+def test_write_multiple_zarr_group(tmp_path):
+    pytest.importorskip("zarr")
+
+    raw = np.random.randint(0, 4096, (6, 32, 32), dtype=np.uint16)
+    mask = raw > 2048
+    layers = [
+        (raw, {"name": "raw", "contrast_limits": (0, 4095)}, "image"),
+        (mask.astype(np.uint8), {"name": "raw mask"}, "labels"),
+    ]
+    path = str(tmp_path / "export")
+    written = write_multiple(path, layers, max_workers=2)
+    assert written == [path + ".zarr"]
+
+    # the export can be read back with the OME-Zarr reader
+    read = zarr_reader_function(written[0])
+    assert [add_kwargs["name"] for _, add_kwargs, _ in read] == [
+        "raw",
+        "raw_mask",
+    ]
+    np.testing.assert_array_equal(np.asarray(read[0][0]), raw)
+    np.testing.assert_array_equal(np.asarray(read[1][0]), mask)
+
+    root = open_group(written[0])
+    assert root["raw"].attrs["napari"]["contrast_limits"] == [0, 4095]
+    assert root["raw_mask"].attrs["napari"]["layer_type"] == "labels"
+    assert root.attrs["mesofield_export"]["bytes"] == raw.nbytes + mask.size
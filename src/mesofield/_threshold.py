@@ -0,0 +1,221 @@
+"""
+Thresholding helpers shared by the threshold widgets.
+
+The widgets express thresholds on the ``skimage.util.img_as_float`` scale
+(0-1 for unsigned images). Rather than converting whole images to float64,
+the threshold is mapped once onto the image's own dtype and the comparison
+runs on the raw data, either eagerly or lazily through dask so that only
+the slices napari displays are evaluated.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional, Tuple, Union
+
+import numpy as np
+
+from ._blocks import iter_blocks
+
+# upper bound on the size of each block thresholded at once
+BLOCK_BYTES = 16 * 2**20
+
+
+def native_threshold(
+    dtype: Any, threshold: float, invert: bool = False
+) -> Union[int, float]:
+    """Map an ``img_as_float`` threshold onto values of ``dtype``.
+
+    The returned bound ``b`` satisfies, for every value ``x`` of ``dtype``,
+    ``x > b == img_as_float(x) > threshold`` (or ``<`` when ``invert``), so
+    thresholding can skip the float conversion entirely.
+
+    Parameters
+    ----------
+    dtype : dtype-like
+        The image dtype.
+    threshold : float
+        Threshold on the ``img_as_float`` scale.
+    invert : bool
+        Whether the comparison is ``<`` instead of ``>``.
+
+    Returns
+    -------
+    int or float
+        The bound to compare the raw image against.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind not in "ui":
+        # floats are not rescaled by img_as_float, bools compare as 0/1
+        return threshold
+    info = np.iinfo(dtype)
+    # img_as_float computes ``x * (1 / imax)`` in float64 (clipped at -1)
+    scale = 1.0 / info.max
+    lowest = max(info.min * scale, -1.0)
+    if invert and threshold <= lowest:
+        return info.min
+    if threshold < lowest:
+        return info.min - 1
+    if threshold > info.max * scale:
+        return info.max if not invert else info.max + 1
+    # smallest integer whose float value exceeds (or reaches) the threshold
+    bound = math.floor(threshold * info.max)
+    if invert:
+        while bound * scale >= threshold:
+            bound -= 1
+        while bound * scale < threshold:
+            bound += 1
+        return bound
+    while bound * scale > threshold:
+        bound -= 1
+    while (bound + 1) * scale <= threshold:
+        bound += 1
+    return bound
+
+
+def threshold_array(
+    data: Any, threshold: float, invert: bool = False
+) -> np.ndarray:
+    """Threshold ``data`` in its native dtype, returning a boolean array."""
+    data = np.asarray(data)
+    bound = native_threshold(data.dtype, threshold, invert)
+    return data < bound if invert else data > bound
+
+
+def threshold_blocks(
+    data: Any,
+    threshold: float,
+    invert: bool = False,
+    cancelled: Optional[Callable[[], bool]] = None,
+    block_bytes: int = BLOCK_BYTES,
+    workers: Optional[int] = None,
+    out: Optional[np.ndarray] = None,
+    packed: bool = False,
+) -> Optional[np.ndarray]:
+    """Threshold ``data`` block by block along the first axis, in parallel.
+
+    This is the engine behind all threshold widgets. Blocks are compared
+    against the threshold in the image's native dtype (see
+    `native_threshold`) on a thread pool, writing straight into a
+    preallocated mask, so no float copy of the input is ever made.
+
+    Parameters
+    ----------
+    data : array-like
+        Image data, read one block at a time.
+    threshold : float
+        Threshold on the ``img_as_float`` scale.
+    invert : bool
+        Keep pixels below the threshold instead of above.
+    cancelled : callable, optional
+        Polled before every block; once it returns True the computation is
+        abandoned.
+    block_bytes : int
+        Upper bound on the size of the input read per block. Smaller blocks
+        are used when needed to give every worker something to do.
+    workers : int, optional
+        Number of threads. Defaults to the number of CPUs.
+    out : np.ndarray, optional
+        Preallocated output, boolean with the shape of ``data`` (or uint8
+        with the shape given by `packed_shape` when ``packed``).
+    packed : bool
+        Store the mask bit-packed along the last axis with
+        ``np.packbits``, using 8x less memory. See `unpack_mask`.
+
+    Returns
+    -------
+    np.ndarray or None
+        The mask, or None if the computation was cancelled.
+    """
+    shape = tuple(data.shape)
+    bound = native_threshold(data.dtype, threshold, invert)
+    compare = np.less if invert else np.greater
+    if packed and len(shape) < 2:
+        raise ValueError("packed masks need at least 2 dimensions")
+    if out is None:
+        if packed:
+            out = np.empty(packed_shape(shape), dtype=np.uint8)
+        else:
+            out = np.empty(shape, dtype=bool)
+    if not shape:
+        out[()] = compare(np.asarray(data), bound)
+        return out
+
+    workers = workers or os.cpu_count() or 1
+    # aim for a few blocks per worker so the load stays balanced
+    itemsize = np.dtype(data.dtype).itemsize
+    nbytes = int(np.prod(shape)) * itemsize
+    block_bytes = max(1, min(block_bytes, nbytes // (4 * workers)))
+
+    def _threshold_block(block) -> bool:
+        if cancelled is not None and cancelled():
+            return False
+        chunk = np.asarray(data[block])
+        if packed:
+            out[block] = np.packbits(compare(chunk, bound), axis=-1)
+        else:
+            compare(chunk, bound, out=out[block])
+        return True
+
+    blocks = iter_blocks(shape, data.dtype, block_bytes)
+    if workers == 1:
+        completed = all(_threshold_block(block) for block in blocks)
+        return out if completed else None
+
+    completed = True
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: set = set()
+        for block in blocks:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                completed = all(f.result() for f in done) and completed
+                if not completed:
+                    break
+            pending.add(pool.submit(_threshold_block, block))
+        completed = all(f.result() for f in wait(pending).done) and completed
+    return out if completed else None
+
+
+def packed_shape(shape: Tuple[int, ...]) -> Tuple[int, ...]:
+    """Shape of a mask of ``shape`` bit-packed along the last axis."""
+    return tuple(shape[:-1]) + (-(-shape[-1] // 8),)
+
+
+def unpack_mask(packed: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+    """Expand a mask made with ``threshold_blocks(..., packed=True)``."""
+    return np.unpackbits(packed, axis=-1, count=shape[-1]).astype(bool)
+
+
+def threshold_lazy(data: Any, threshold: float, invert: bool = False):
+    """Threshold ``data`` lazily, one 2D plane at a time.
+
+    Parameters
+    ----------
+    data : array-like
+        Image data; dask arrays are used as-is, anything else is wrapped
+        with one chunk per plane.
+    threshold : float
+        Threshold on the ``img_as_float`` scale.
+    invert : bool
+        Keep pixels below the threshold instead of above.
+
+    Returns
+    -------
+    dask.array.Array
+        A boolean array that is only evaluated for the slices requested.
+    """
+    return as_lazy(data).map_blocks(
+        threshold_array, threshold, invert, dtype=bool
+    )
+
+
+def as_lazy(data: Any):
+    """Wrap ``data`` as a dask array with one chunk per 2D plane."""
+    import dask.array as da
+
+    if isinstance(data, da.Array):
+        return data
+    chunks = (1,) * (data.ndim - 2) + tuple(data.shape[-2:])
+    return da.from_array(data, chunks=chunks, name=False)
@@ -0,0 +1,334 @@
+"""
+Start acquisitions on an external trigger without blocking the GUI.
+
+An `AcquisitionTrigger` listens to one or more trigger sources: the
+keyboard (`KeyboardTrigger`), a line on a serial port such as an Arduino
+forwarding a TTL edge (`SerialTrigger`), or code (`SoftwareTrigger`).
+`AcquisitionTrigger.arm` returns immediately. It runs any slow preparation
+up front and parks a thread on an event, and the first source to fire
+wakes that thread, which calls the start function right away. The moment
+the trigger arrived is taken with ``time.perf_counter()``, the clock the
+frame metadata uses for ``host_time``, so stimulus onsets can be aligned
+with frames afterwards.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class SoftwareTrigger:
+    """Trigger source fired from code, e.g. a PsychoPy callback."""
+
+    name = "software"
+
+    def __init__(self):
+        self._fire: Optional[Callable[[str], None]] = None
+
+    def start(self, fire: Callable[[str], None]) -> None:
+        self._fire = fire
+
+    def stop(self) -> None:
+        self._fire = None
+
+    def fire(self) -> None:
+        """Fire the trigger, if it is armed."""
+        if self._fire is not None:
+            self._fire(self.name)
+
+
+class KeyboardTrigger:
+    """Trigger source fired by a key press (needs the ``keyboard`` package).
+
+    Parameters
+    ----------
+    key : str
+        Key name, as understood by ``keyboard.on_press_key``.
+    """
+
+    name = "keyboard"
+
+    def __init__(self, key: str = "space"):
+        self.key = key
+        self._hook = None
+
+    def start(self, fire: Callable[[str], None]) -> None:
+        import keyboard
+
+        self._hook = keyboard.on_press_key(
+            self.key, lambda _event: fire(self.name)
+        )
+
+    def stop(self) -> None:
+        if self._hook is not None:
+            import keyboard
+
+            keyboard.unhook(self._hook)
+            self._hook = None
+
+
+class SerialTrigger:
+    """Trigger source fired by a line received on a serial port.
+
+    Parameters
+    ----------
+    port : str or file-like
+        Serial port name (opened with pyserial) or any binary file-like
+        object with ``readline``, such as a pipe standing in for the port.
+    match : bytes
+        Prefix of the line that fires the trigger; an empty prefix fires
+        on any non-empty line.
+    baudrate : int
+        Baud rate, when ``port`` is a port name.
+    poll_s : float
+        Read timeout of the serial port, i.e. how quickly `stop` takes
+        effect.
+    """
+
+    name = "serial"
+
+    def __init__(
+        self,
+        port: Any,
+        match: bytes = b"",
+        baudrate: int = 115200,
+        poll_s: float = 0.05,
+    ):
+        self.port = port
+        self.match = match
+        self.baudrate = baudrate
+        self.poll_s = poll_s
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._fire: Optional[Callable[[str], None]] = None
+        self._stream: Any = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, fire: Callable[[str], None]) -> None:
+        with self._lock:
+            self._fire = fire
+            self._stop.clear()
+            if self._thread is not None:
+                # a reader blocked on a file-like since the last stop
+                # carries on with the new callback
+                return
+            stream = self.port
+            if isinstance(stream, str):
+                import serial
+
+                stream = serial.Serial(
+                    stream, self.baudrate, timeout=self.poll_s
+                )
+            self._stream = stream
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(stream,),
+                name="mesofield-serial-trigger",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop.set()
+            self._fire = None
+            thread = self._thread
+        # a serial port times out within ``poll_s``; a blocking file-like
+        # may never return, and its reader is reused by the next `start`
+        if (
+            thread is not None
+            and thread is not threading.current_thread()
+            and getattr(self._stream, "timeout", None) is not None
+        ):
+            thread.join()
+
+    def _run(self, stream) -> None:
+        try:
+            while True:
+                line = stream.readline()
+                with self._lock:
+                    # a serial port that timed out has an empty line;
+                    # anything else has ended
+                    ended = not line and (
+                        getattr(stream, "timeout", None) is None
+                    )
+                    if self._stop.is_set() or ended:
+                        self._thread = None
+                        return
+                    line = line.strip()
+                    if not line or not line.startswith(self.match):
+                        continue
+                    fire, self._fire = self._fire, None
+                    self._thread = None
+                fire(self.name)
+                return
+        finally:
+            if stream is not self.port:
+                stream.close()
+
+
+class AcquisitionTrigger:
+    """Arms an acquisition and starts it when a trigger source fires.
+
+    Parameters
+    ----------
+    sources : sequence
+        Trigger sources; the first to fire starts the acquisition.
+    on_error : callable, optional
+        Called from the trigger thread with the exception if the start
+        function fails, e.g. to show a message in the GUI. The error is
+        logged when no callback is given.
+
+    Attributes
+    ----------
+    host_time : float or None
+        ``time.perf_counter()`` when the trigger arrived.
+    source : str or None
+        Name of the source that fired.
+    latency_s : float or None
+        Time from the trigger to the start function being called.
+    error : BaseException or None
+        What the start function raised, if anything.
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[Any],
+        on_error: Optional[Callable[[BaseException], Any]] = None,
+    ):
+        if not sources:
+            raise ValueError("at least one trigger source is needed")
+        self.sources = list(sources)
+        self.on_error = on_error
+        self.host_time: Optional[float] = None
+        self.source: Optional[str] = None
+        self.latency_s: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._fired = threading.Event()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._armed = False
+        # bumped by every arm and disarm; a trigger thread only touches
+        # the shared state while its own arm is the current one
+        self._generation = 0
+
+    @property
+    def armed(self) -> bool:
+        return self._armed
+
+    def arm(
+        self,
+        start: Callable[[], Any],
+        prepare: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """Wait for a trigger in the background, then call ``start``.
+
+        ``prepare`` runs first, in the calling thread, for anything slow
+        that can happen before the trigger (e.g.
+        ``core.prepareSequenceAcquisition``). ``start`` runs in the
+        trigger thread, which may block for the whole acquisition.
+        """
+        if self._armed:
+            raise RuntimeError("trigger is already armed")
+        if prepare is not None:
+            prepare()
+        # fresh events: the thread of a previous arm keeps its own
+        fired, done = threading.Event(), threading.Event()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self.host_time = self.source = self.latency_s = None
+            self.error = None
+            self._fired, self._done = fired, done
+            self._armed = True
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(start, generation, fired, done),
+            name="mesofield-trigger",
+            daemon=True,
+        )
+        self._thread.start()
+        for source in self.sources:
+            source.start(self._fire)
+
+    def disarm(self) -> None:
+        """Stop listening; an acquisition already started is unaffected."""
+        if not self._armed:
+            return
+        self._stop_sources()
+        with self._lock:
+            self._armed = False
+            self._generation += 1
+            # wake the waiting thread without starting anything
+            self._fired.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the started function returns (or the trigger is
+        disarmed); returns whether it did."""
+        return self._done.wait(timeout)
+
+    def to_dict(self, t0: Optional[float] = None) -> Dict[str, Any]:
+        """The trigger record, e.g. for the session telemetry.
+
+        ``t0`` is the ``time.perf_counter()`` origin of a `SessionClock`,
+        to also report the trigger in session time.
+        """
+        record: Dict[str, Any] = {
+            "source": self.source,
+            "host_time": self.host_time,
+            "latency_s": self.latency_s,
+        }
+        if t0 is not None and self.host_time is not None:
+            record["session_time"] = self.host_time - t0
+        return record
+
+    def _fire(self, source: str) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            if not self._armed or self._fired.is_set():
+                return
+            self.host_time = now
+            self.source = source
+            self._fired.set()
+
+    def _run(
+        self,
+        start: Callable[[], Any],
+        generation: int,
+        fired: threading.Event,
+        done: threading.Event,
+    ) -> None:
+        try:
+            fired.wait()
+            with self._lock:
+                if generation != self._generation:
+                    return  # disarmed
+                self.latency_s = time.perf_counter() - self.host_time
+                self._armed = False
+            self._stop_sources()
+            start()
+        except BaseException as error:  # noqa: BLE001
+            # nobody joins this thread: report the failure instead of
+            # letting it pass silently
+            with self._lock:
+                if generation == self._generation:
+                    self.error = error
+            if self.on_error is not None:
+                self.on_error(error)
+            else:
+                logger.error("triggered acquisition failed", exc_info=error)
+        finally:
+            with self._lock:
+                if generation == self._generation:
+                    self._armed = False
+            done.set()
+
+    def _stop_sources(self) -> None:
+        for source in self.sources:
+            source.stop()
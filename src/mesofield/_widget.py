@@ -29,17 +29,70 @@ References:
 Replace code below according to your needs.
 """
 
+import weakref
 from typing import TYPE_CHECKING
 
+import numpy as np
 from magicgui import magic_factory
-from magicgui.widgets import CheckBox, Container, create_widget
+from magicgui.widgets import (
+    CheckBox,
+    Container,
+    Label,
+    PushButton,
+    create_widget,
+)
 from qtpy.QtWidgets import QHBoxLayout, QPushButton, QWidget
-from skimage.util import img_as_float
-from pymmcore_widgets import InstallWidget
+
+from ._histogram import METADATA_KEY, build_histogram, cached_histogram
+from ._threshold import as_lazy, threshold_blocks, threshold_lazy
 
 if TYPE_CHECKING:
     import napari
 
+# the newest threshold_magic_widget call for each image layer (by id);
+# older calls still running in a worker thread give up and return None
+_latest_threshold_call = {}
+# ids of the image data whose histograms are being built in a worker
+_building_histograms = set()
+
+
+def _layer_data(image_layer):
+    data = image_layer.data
+    return data[0] if image_layer.multiscale else data
+
+
+def _show_coverage(label, image_layer, threshold, invert, refresh):
+    """Show how many pixels pass ``threshold`` in ``label``.
+
+    The count is read from the layer's cumulative intensity histogram, which
+    is built once in a worker thread (``refresh`` is called when it is
+    ready) and kept in ``layer.metadata``.
+    """
+    if image_layer is None:
+        label.value = ""
+        return
+    data = _layer_data(image_layer)
+    histogram = cached_histogram(data)
+    if histogram is None:
+        label.value = "building histogram..."
+        if id(data) not in _building_histograms:
+            _start_histogram_worker(data, refresh)
+        return
+    image_layer.metadata[METADATA_KEY] = histogram
+    count = histogram.count_above(threshold, invert)
+    fraction = histogram.fraction_above(threshold, invert)
+    side = "below" if invert else "above"
+    label.value = f"{count:,} px ({fraction:.1%}) {side} threshold"
+
+
+def _start_histogram_worker(data, on_ready):
+    from napari.qt.threading import thread_worker
+
+    _building_histograms.add(id(data))
+    worker = thread_worker(build_histogram)(data)
+    worker.finished.connect(lambda: _building_histograms.discard(id(data)))
+    worker.returned.connect(lambda _: on_ready())
+    worker.start()
 
 
 # Uses the `autogenerate: true` flag in the plugin manifest
@@ -49,20 +102,68 @@ def threshold_autogenerate_widget(
     img: "napari.types.ImageData",
     threshold: "float",
 ) -> "napari.types.LabelsData":
-    return img_as_float(img) > threshold
+    # a known histogram answers thresholds that keep all or no pixels
+    histogram = cached_histogram(img)
+    if histogram is not None:
+        count = histogram.count_above(threshold)
+        if count in (0, histogram.total):
+            return np.full(img.shape, bool(count))
+    return threshold_blocks(img, threshold)
+
+
+def _init_threshold_magic_widget(widget):
+    # live pixel count under the slider, read from the layer histogram
+    coverage = Label(gui_only=True)
+    widget.append(coverage)
+
+    def refresh(*_):
+        _show_coverage(
+            coverage,
+            widget.img_layer.value,
+            widget.threshold.value,
+            False,
+            refresh,
+        )
+
+    widget.img_layer.changed.connect(refresh)
+    widget.threshold.changed.connect(refresh)
 
 
 # the magic_factory decorator lets us customize aspects of our widget
 # we specify a widget type for the threshold parameter
 # and use auto_call=True so the function is called whenever
-# the value of a parameter changes
+# the value of a parameter changes. Returning a FunctionWorker keeps
+# the computation off the Qt thread; napari adds its result when done.
 @magic_factory(
-    threshold={"widget_type": "FloatSlider", "max": 1}, auto_call=True
+    threshold={"widget_type": "FloatSlider", "max": 1},
+    auto_call=True,
+    widget_init=_init_threshold_magic_widget,
 )
 def threshold_magic_widget(
     img_layer: "napari.layers.Image", threshold: "float"
-) -> "napari.types.LabelsData":
-    return img_as_float(img_layer.data) > threshold
+) -> "napari.qt.threading.FunctionWorker[napari.types.LabelsData]":
+    from napari.qt.threading import thread_worker
+    from qtpy.QtCore import QTimer
+
+    key, token = id(img_layer), object()
+    _latest_threshold_call[key] = token
+
+    def superseded():
+        return _latest_threshold_call.get(key) is not token
+
+    data = _layer_data(img_layer)
+
+    @thread_worker
+    def _threshold():
+        thresholded = threshold_blocks(data, threshold, cancelled=superseded)
+        # a newer slider value may have arrived while we were working
+        return None if superseded() else thresholded
+
+    worker = _threshold()
+    # start once napari has connected to the ``returned`` signal
+    QTimer.singleShot(0, worker.start)
+    return worker
+
 
 # if we want even more control over our widget, we can use
 # magicgui `Container`
@@ -81,10 +182,16 @@ class ImageThreshold(Container):
         self._threshold_slider.max = 1
         # use magicgui widgets directly
         self._invert_checkbox = CheckBox(text="Keep pixels below threshold")
+        self._apply_button = PushButton(text="Apply to all slices")
+        self._coverage_label = Label()
 
         # connect your own callbacks
+        self._image_layer_combo.changed.connect(self._update_coverage)
+        self._threshold_slider.changed.connect(self._update_coverage)
+        self._invert_checkbox.changed.connect(self._update_coverage)
         self._threshold_slider.changed.connect(self._threshold_im)
         self._invert_checkbox.changed.connect(self._threshold_im)
+        self._apply_button.changed.connect(self._apply_threshold)
 
         # append into/extend the container with your widgets
         self.extend(
@@ -92,21 +199,71 @@ class ImageThreshold(Container):
                 self._image_layer_combo,
                 self._threshold_slider,
                 self._invert_checkbox,
+                self._coverage_label,
+                self._apply_button,
             ]
         )
+        # lazily wrapped layer data, keyed by the layer itself so that a
+        # deleted layer (and a reused id) cannot hand out stale data
+        self._sources = weakref.WeakKeyDictionary()
+        # layers whose data events are already connected
+        self._watched = weakref.WeakSet()
+
+    def _update_coverage(self):
+        _show_coverage(
+            self._coverage_label,
+            self._image_layer_combo.value,
+            self._threshold_slider.value,
+            self._invert_checkbox.value,
+            self._update_coverage,
+        )
+
+    def _lazy_source(self, image_layer):
+        # wrap each layer once, until its data is replaced
+        if image_layer not in self._watched:
+            image_layer.events.data.connect(self._forget_source)
+            self._watched.add(image_layer)
+        if image_layer not in self._sources:
+            self._sources[image_layer] = as_lazy(_layer_data(image_layer))
+        return self._sources[image_layer]
+
+    def _forget_source(self, event):
+        self._sources.pop(event.source, None)
 
     def _threshold_im(self):
+        # preview only: stacks are thresholded lazily, so napari evaluates
+        # just the slices it displays
         image_layer = self._image_layer_combo.value
         if image_layer is None:
             return
 
-        image = img_as_float(image_layer.data)
-        name = image_layer.name + "_thresholded"
         threshold = self._threshold_slider.value
-        if self._invert_checkbox.value:
-            thresholded = image < threshold
+        invert = self._invert_checkbox.value
+        if _layer_data(image_layer).ndim > 2:
+            thresholded = threshold_lazy(
+                self._lazy_source(image_layer), threshold, invert
+            )
         else:
-            thresholded = image > threshold
+            thresholded = threshold_blocks(
+                _layer_data(image_layer), threshold, invert
+            )
+        self._show(image_layer, thresholded)
+
+    def _apply_threshold(self):
+        # commit: evaluate the threshold over the full volume
+        image_layer = self._image_layer_combo.value
+        if image_layer is None:
+            return
+
+        thresholded = threshold_blocks(
+            _layer_data(image_layer),
+            self._threshold_slider.value,
+            self._invert_checkbox.value,
+        )
+        self._show(image_layer, thresholded)
+
+    def _show(self, image_layer, thresholded):
+        name = image_layer.name + "_thresholded"
         if name in self._viewer.layers:
             self._viewer.layers[name].data = thresholded
         else:
@@ -119,7 +276,10 @@ class ExampleQWidget(QWidget):
     def __init__(self, viewer: "napari.viewer.Viewer"):
         super().__init__()
         self.viewer = viewer
-        
+
+        # pymmcore_widgets pulls in pymmcore-plus; only pay for it here
+        from pymmcore_widgets import InstallWidget
+
         installer = InstallWidget()
 
         btn = QPushButton("Click me!")
@@ -131,4 +291,3 @@ class ExampleQWidget(QWidget):
 
     def _on_click(self):
         print("napari has", len(self.viewer.layers), "layers")
-        
@@ -9,15 +9,47 @@ Replace code below according to your needs.
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, List, Sequence, Tuple, Union
+import logging
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from ._blocks import iter_blocks
+from ._zarr import blosc, create_array, open_group
+
+logger = logging.getLogger(__name__)
+
+# upper bound on the size of each block copied from the layer to disk
+BLOCK_BYTES = 64 * 2**20
+# target size of each compressed chunk in multi-layer exports
+CHUNK_BYTES = 8 * 2**20
 
 if TYPE_CHECKING:
     DataType = Union[Any, Sequence[Any]]
     FullLayerData = Tuple[DataType, dict, str]
 
 
-def write_single_image(path: str, data: Any, meta: dict) -> List[str]:
-    """Writes a single image layer.
+def write_single_image(
+    path: str, data: Any, meta: dict, block_bytes: int = BLOCK_BYTES
+) -> List[str]:
+    """Writes a single image layer to a ``.npy`` file.
+
+    The file is preallocated with ``np.lib.format.open_memmap`` and filled in
+    blocks along the first axis, so lazy (dask) or memory-mapped layers are
+    streamed to disk without ever being materialized as one in-memory array.
 
     Parameters
     ----------
@@ -28,20 +60,44 @@ def write_single_image(path: str, data: Any, meta: dict) -> List[str]:
     meta : dict
         A dictionary containing all other attributes from the napari layer
         (excluding the `.data` layer attribute).
+    block_bytes : int
+        Approximate memory used per block while writing.
 
     Returns
     -------
     [path] : A list containing the string path to the saved file.
     """
+    if meta.get("multiscale"):
+        # only the full resolution level is saved
+        data = data[0]
+    if not path.endswith(".npy"):
+        path += ".npy"
 
-    # implement your writer logic here ...
+    out = np.lib.format.open_memmap(
+        path, mode="w+", dtype=data.dtype, shape=tuple(data.shape)
+    )
+    for block in iter_blocks(data.shape, data.dtype, block_bytes):
+        out[block] = np.asarray(data[block])
+    out.flush()
+    del out
 
     # return path to any file(s) that were successfully written
     return [path]
 
 
-def write_multiple(path: str, data: List[FullLayerData]) -> List[str]:
-    """Writes multiple layers of different types.
+def write_multiple(
+    path: str,
+    data: List[FullLayerData],
+    max_workers: Optional[int] = None,
+    clevel: int = 3,
+) -> List[str]:
+    """Writes image and labels layers into a single Zarr group.
+
+    Every layer is stored as an OME-Zarr multiscale image under its own
+    subgroup (``<name>/0``, ``<name>/1``, ... for each resolution level) with
+    the JSON-serializable part of its metadata in the subgroup attributes.
+    Chunks are compressed with Blosc/zstd on a thread pool; the achieved
+    throughput is logged and stored in the root group attributes.
 
     Parameters
     ----------
@@ -53,13 +109,151 @@ def write_multiple(path: str, data: List[FullLayerData]) -> List[str]:
         `meta` is a dictionary containing all other metadata attributes
         from the napari layer (excluding the `.data` layer attribute).
         `layer_type` is a string, eg: "image", "labels", "surface", etc.
+    max_workers : int, optional
+        Number of threads compressing chunks. Defaults to the number of CPUs.
+    clevel : int
+        Blosc compression level.
 
     Returns
     -------
     [path] : A list containing (potentially multiple) string paths to the saved file(s).
     """
+    if not path.endswith(".zarr"):
+        path += ".zarr"
 
-    # implement your writer logic here ...
+    start = time.perf_counter()
+    root = open_group(path, mode="w")
+    compressor = blosc(clevel)
+    multiscales = []
+    names: Dict[str, int] = {}
+    nbytes = 0
+    workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # at most two chunks per worker are held in memory at once
+        max_pending = 2 * workers
+        pending: set = set()
+        for layer_data, meta, layer_type in data:
+            name = _unique_name(meta.get("name") or layer_type, names)
+            group = root.require_group(name)
+            group.attrs["napari"] = {
+                "layer_type": layer_type,
+                **_jsonable(meta),
+            }
+            levels = layer_data if meta.get("multiscale") else [layer_data]
+            for level, level_data in enumerate(levels):
+                chunks = _chunk_shape(level_data, CHUNK_BYTES)
+                arr = create_array(
+                    group,
+                    str(level),
+                    tuple(level_data.shape),
+                    chunks,
+                    level_data.dtype,
+                    compressor,
+                )
+                for block in iter_blocks(
+                    level_data.shape, level_data.dtype, CHUNK_BYTES
+                ):
+                    if len(pending) >= max_pending:
+                        done, pending = wait(
+                            pending, return_when=FIRST_COMPLETED
+                        )
+                        for future in done:
+                            future.result()
+                    pending.add(
+                        pool.submit(_write_block, arr, level_data, block)
+                    )
+                nbytes += level_data.size * level_data.dtype.itemsize
+            multiscales.append(
+                {
+                    "version": "0.4",
+                    "name": name,
+                    "datasets": [
+                        {"path": f"{name}/{level}"}
+                        for level in range(len(levels))
+                    ],
+                }
+            )
+        for future in wait(pending).done:
+            future.result()
+
+    elapsed = time.perf_counter() - start
+    stored = _stored_bytes(path)
+    stats = {
+        "seconds": elapsed,
+        "bytes": nbytes,
+        "stored_bytes": stored,
+        "ratio": nbytes / stored if stored else None,
+        "mb_per_s": nbytes / 2**20 / elapsed if elapsed else None,
+    }
+    root.attrs["multiscales"] = multiscales
+    root.attrs["mesofield_export"] = stats
+    logger.info(
+        "wrote %d layer(s) to %s: %.1f MB in %.2f s (%.1f MB/s, %.2fx)",
+        len(data),
+        path,
+        nbytes / 2**20,
+        elapsed,
+        stats["mb_per_s"] or 0,
+        stats["ratio"] or 0,
+    )
 
     # return path to any file(s) that were successfully written
     return [path]
+
+
+def _chunk_shape(data: Any, chunk_bytes: int) -> Tuple[int, ...]:
+    """Chunk whole planes together, up to ``chunk_bytes`` per chunk."""
+    if not data.shape:
+        return ()
+    block = next(iter_blocks(data.shape, data.dtype, chunk_bytes))
+    return (block.stop - block.start,) + tuple(data.shape[1:])
+
+
+def _write_block(arr: Any, data: Any, block: Any) -> None:
+    arr[block] = np.asarray(data[block])
+
+
+def _unique_name(name: str, seen: Dict[str, int]) -> str:
+    """A Zarr-safe version of ``name`` that hasn't been used yet."""
+    name = re.sub(r"[^\w\-.]+", "_", name).strip("._") or "layer"
+    count = seen.get(name, 0)
+    seen[name] = count + 1
+    return name if not count else f"{name}_{count}"
+
+
+def _jsonable(meta: dict) -> dict:
+    """Keep the layer metadata entries that survive a JSON round trip."""
+    out = {}
+    for key, value in meta.items():
+        if isinstance(value, np.ndarray) and value.size <= 1024:
+            value = value.tolist()
+        elif isinstance(value, np.generic):
+            value = value.item()
+        elif isinstance(value, tuple):
+            value = list(value)
+        if _is_json_scalar(value) or (
+            isinstance(value, list) and _is_json_list(value)
+        ):
+            out[key] = value
+        elif isinstance(value, dict):
+            out[key] = _jsonable(value)
+    return out
+
+
+def _is_json_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, bool, int, float))
+
+
+def _is_json_list(values: list) -> bool:
+    return all(
+        _is_json_scalar(v) or (isinstance(v, list) and _is_json_list(v))
+        for v in values
+    )
+
+
+def _stored_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
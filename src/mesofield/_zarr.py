@@ -0,0 +1,58 @@
+"""
+Small helpers that paper over the zarr 2 / zarr 3 API differences.
+
+Everything mesofield writes uses the Zarr v2 on-disk format, which both
+library versions read and write, and which OME-Zarr 0.4 viewers expect.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Tuple
+
+
+def blosc(clevel: int = 3, cname: str = "zstd", shuffle: bool = True):
+    """A numcodecs Blosc compressor with byte-shuffle enabled by default."""
+    from numcodecs import Blosc
+
+    return Blosc(
+        cname=cname,
+        clevel=clevel,
+        shuffle=Blosc.SHUFFLE if shuffle else Blosc.NOSHUFFLE,
+    )
+
+
+def open_group(path: str, mode: str = "r"):
+    """Open a Zarr v2 format group at ``path``."""
+    import zarr
+
+    if zarr.__version__.startswith("2."):
+        return zarr.open_group(path, mode=mode)
+    return zarr.open_group(path, mode=mode, zarr_format=2)
+
+
+def create_array(
+    group,
+    name: str,
+    shape: Tuple[int, ...],
+    chunks: Tuple[int, ...],
+    dtype: Any,
+    compressor=None,
+):
+    """Create an (overwritable) array in ``group`` under ``name``."""
+    if hasattr(group, "create_array"):
+        return group.create_array(
+            name,
+            shape=shape,
+            chunks=chunks,
+            dtype=dtype,
+            compressors=compressor,
+            overwrite=True,
+        )
+    return group.create_dataset(
+        name,
+        shape=shape,
+        chunks=chunks,
+        dtype=dtype,
+        compressor=compressor,
+        overwrite=True,
+    )